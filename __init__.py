@@ -0,0 +1,52 @@
+'''
+A small elevator system.
+
+The engine, Elevator and MultipleElevatorController with the constants
+and exceptions they use, only needs the standard library. Nothing is
+imported until it is first used, so importing MultipleElevatorController
+from here only loads the engine, never tkinter, NumPy or
+multiprocessing, and is quick for short lived worker processes. The
+visual monitor, benchmarks and other front ends (see __main__.py) only
+load when they are asked for.
+'''
+from importlib import import_module
+
+# name: the module it lives in
+_EXPORTS = {
+    "Elevator": "elevator",
+    "MultipleElevatorController": "multiple_elevator_controller",
+    "ElevatorCommand": "constants",
+    "ElevatorDirection": "constants",
+    "ElevatorDoorStatus": "constants",
+    "ElevatorStatus": "constants",
+    "ElevatorOutOfBoundsException": "exceptions",
+    "TimingModel": "timing",
+    "EtaCache": "eta_cache",
+    "FleetSnapshot": "fleet_snapshot",
+    "MetricsCollector": "metrics",
+    "PlanStream": "plan_stream",
+    "AsyncElevatorService": "async_controller",
+    "ShardedController": "sharded_controller",
+    "TrajectoryLog": "trajectory_log",
+    "TrajectoryRecorder": "trajectory_log",
+    "FleetSimulator": "fleet_simulator",
+    "ElevatorRenderer": "elevator_monitor",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name:str):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(import_module(f".{module}", __name__), name)
+    # Only look it up once
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,48 @@
+'''
+Command line entry point, the `elevators` command once installed
+(`pip install .`, see pyproject.toml) or `python3 -m elevators` eg.
+  elevators monitor
+  elevators bench --floors 5 60 --cars 1 8
+  elevators evaluate --seeds 20
+  elevators replay trace.jsonl --levels 16 --cars 3
+Everything after the command goes to that front end (see --help on
+each). Only the front end asked for is imported.
+'''
+import argparse
+import os
+import sys
+from importlib import import_module
+
+# command: (module, what it does)
+COMMANDS = {
+    "monitor": ("elevator_monitor", "show lifts moving in a window"),
+    "bench": ("benchmark", "time the hot paths, see benchmark.py"),
+    "evaluate": ("policy_evaluator", "compare dispatch policies"),
+    "replay": ("trace_replay", "replay a JSON lines log of calls"),
+}
+
+
+def main(argv=None):
+    prog = os.path.basename(sys.argv[0])
+    if prog == "__main__.py":
+        prog = f"python3 -m {__package__}"
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=__doc__.split("\n\n")[0].strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(f"  {command:10}{help}" for command, (_, help)
+                         in COMMANDS.items()))
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    module = import_module(f".{COMMANDS[args.command][0]}", __package__)
+    # So the front end's own --help shows how it was run
+    sys.argv[0] = f"{prog} {args.command}"
+    if args.command == "monitor":
+        return module.main()
+    return module.main(args.args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
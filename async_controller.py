@@ -0,0 +1,131 @@
+'''
+Runs a MultipleElevatorController headless on asyncio.
+
+Any number of producers can call lifts / select levels at the same time
+through a request queue, the controller ticks on a monotonic clock and
+anyone interested can subscribe to the state after every tick.
+'''
+import asyncio
+import time
+from collections import deque
+from .constants import ElevatorDirection
+
+
+class AsyncElevatorService(object):
+    '''
+    Ticks a controller every tick_interval seconds.
+    Ticks are scheduled from when we started (not from when the last
+    tick finished) so they don't drift. If we fall more than a whole
+    tick behind those ticks are skipped rather than run in a burst.
+
+    Requests are only applied at the start of a tick, in the order
+    they were made, so results don't depend on how producers interleave.
+
+    Attributes:
+      controller (MultipleElevatorController): what we are running
+      tick_interval (float): seconds between ticks
+      clock (callable): monotonic seconds, time.monotonic by default
+      sleep (coroutine function): asyncio.sleep by default, both can be
+             swapped for fakes in tests
+      skipped_ticks (int): ticks skipped because we fell behind
+    '''
+
+    def __init__(self, controller, tick_interval:float=0.8,
+                 clock=time.monotonic, sleep=asyncio.sleep):
+        super().__init__()
+        self.controller = controller
+        self.tick_interval = tick_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.skipped_ticks = 0
+        # Only ever used from the event loop so a deque is enough
+        self._requests = deque()
+        self._subscribers = []
+        self._running = False
+
+    def call_elevator(self, from_level:int, direction:ElevatorDirection):
+        '''
+        Call a lift, applied at the start of the next tick.
+        Returns a future for the index of the lift that's coming
+        '''
+        future = asyncio.get_running_loop().create_future()
+        self._requests.append(("call", from_level, direction, future))
+        return future
+
+    def select_level(self, index:int, level_no:int):
+        '''
+        Select a level inside lift number index, applied at the start of
+        the next tick. Returns a future that's done once it has been
+        '''
+        future = asyncio.get_running_loop().create_future()
+        self._requests.append(("select", index, level_no, future))
+        return future
+
+    def subscribe(self, max_queued:int=16):
+        '''
+        An asyncio.Queue that gets (tick, [(level, direction, door_status)
+        for each lift]) after every tick. If the subscriber doesn't keep
+        up the oldest states are dropped, we never wait for them.
+        '''
+        queue = asyncio.Queue(max_queued)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.remove(queue)
+
+    def _apply_requests(self):
+        while self._requests:
+            kind, first, second, future = self._requests.popleft()
+            try:
+                if kind == "call":
+                    elevator = self.controller.call_elevator(first, second)
+                    result = self.controller.elevators.index(elevator)
+                else:
+                    self.controller.select_level(first, second)
+                    result = None
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    def _publish(self):
+        state = (self.controller.tick,
+                 [(e.current_level, e.direction, e.door_status)
+                  for e in self.controller.elevators])
+        for queue in self._subscribers:
+            if queue.full():
+                # Slow subscriber, drop their oldest state
+                queue.get_nowait()
+            queue.put_nowait(state)
+
+    def tick(self):
+        ''' Apply waiting requests, step forward and publish '''
+        self._apply_requests()
+        self.controller.step_forward()
+        self._publish()
+
+    async def run(self, num_ticks:int=None):
+        ''' Tick until stop() is called, or num_ticks have run '''
+        self._running = True
+        start = self.clock()
+        scheduled = 0
+        ticks_run = 0
+        while self._running and (num_ticks is None or ticks_run < num_ticks):
+            self.tick()
+            ticks_run += 1
+            scheduled += 1
+            behind = self.clock() - (start + scheduled * self.tick_interval)
+            if behind > self.tick_interval:
+                # Too far behind to catch up, skip those ticks
+                skip = int(behind // self.tick_interval)
+                self.skipped_ticks += skip
+                scheduled += skip
+            await self.sleep(max(0, start + scheduled * self.tick_interval
+                                 - self.clock()))
+        self._running = False
+
+    def stop(self):
+        self._running = False
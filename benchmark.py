@@ -0,0 +1,656 @@
+'''
+Benchmarks for the elevator system hot paths, eg. generate_commands,
+step_forward, reset_direction and steps_to_get_to_level as the
+building, the fleet and the queue of calls grow.
+
+Every workload is built from a seeded random.Random so the same
+arguments always benchmark the same lifts and calls. Results are
+printed (or written) as JSON so they can be compared over time.
+
+HOW to RUN
+`python3 benchmark.py --floors 5 60 200 --cars 1 8 64 --output out.json`
+`python3 benchmark.py --parallel` to find where a process pool wins
+`python3 benchmark.py --destination` to compare destination dispatch
+with calling the nearest lift
+`python3 benchmark.py --batch` to compare batch calls with calling
+lifts one at a time
+`python3 benchmark.py --sharded` to see how banks scale over processes
+`python3 benchmark.py --eta-cache` to see how much caching ETAs saves
+`python3 benchmark.py --plan-stream` to compare streaming plan diffs
+with resending every plan every tick
+`python3 benchmark.py --tick-cost` to see what recording trajectories
+and publishing fleet snapshots add to every tick
+`python3 benchmark.py --import-time` to time importing the package
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+if not __package__:
+    # Run as a script, see script_support.py
+    from script_support import as_package
+    __package__ = as_package()
+from .constants import ElevatorDirection
+from .elevator import Elevator
+from .eta_cache import EtaCache
+from .metrics import MetricsCollector
+from .multiple_elevator_controller import MultipleElevatorController
+from .plan_stream import plan_segments, stream_plans
+from .sharded_controller import ShardedController
+from .trajectory_log import TrajectoryRecorder
+
+
+def random_call(rng, num_levels:int):
+    ''' A random (from_level, direction) that a lift can be called to '''
+    from_level = rng.randrange(num_levels)
+    if from_level == 0:
+        return from_level, ElevatorDirection.UP
+    elif from_level == num_levels - 1:
+        return from_level, ElevatorDirection.DOWN
+    return from_level, rng.choice(list(ElevatorDirection))
+
+
+def random_fleet(rng, num_levels:int, num_elevators:int, queue_depth:int):
+    ''' Lifts spread around the building each with queue_depth
+    random calls / selections waiting '''
+    levels = [str(level_no) for level_no in range(num_levels)]
+    elevators = []
+    for i in range(num_elevators):
+        elevator = Elevator(levels, current_level=rng.randrange(num_levels))
+        for j in range(queue_depth):
+            if rng.random() < 0.5:
+                elevator.select_level(rng.randrange(num_levels))
+            else:
+                elevator.call_elevator(*random_call(rng, num_levels))
+        elevators.append(elevator)
+    return elevators
+
+
+def best_time(function, repeats:int):
+    ''' Fastest of repeats runs of function, in seconds '''
+    best = float("inf")
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_parallel_crossover(car_counts=(1, 2, 4, 8, 16, 32, 64),
+                             num_levels:int=60, queue_depth:int=8,
+                             num_calls:int=20, workers:int=None,
+                             repeats:int=3, seed:int=0):
+    '''
+    Time scoring num_calls hall calls against fleets of different
+    sizes, in this process and on a process pool, to find where
+    the pool starts winning.
+    Returns: [{"cars", "serial_s", "parallel_s"}, ...]
+    '''
+    results = []
+    with ProcessPoolExecutor(workers) as executor:
+        for num_elevators in car_counts:
+            rng = random.Random(seed)
+            elevators = random_fleet(rng, num_levels, num_elevators,
+                                     queue_depth)
+            calls = [random_call(rng, num_levels) for i in range(num_calls)]
+            serial = MultipleElevatorController(elevators)
+            parallel = MultipleElevatorController(elevators, executor)
+
+            def score_all(controller):
+                state = controller.snapshot()
+                for call in calls:
+                    controller.call_elevator(*call)
+                controller.restore(state)
+
+            # warm up the pool so starting processes isn't counted
+            score_all(parallel)
+            results.append({
+                "cars": num_elevators,
+                "serial_s": best_time(lambda: score_all(serial), repeats),
+                "parallel_s": best_time(lambda: score_all(parallel),
+                                        repeats),
+            })
+    return results
+
+
+def crossover(results:list):
+    ''' Smallest number of cars where the pool beat serial, or None '''
+    for result in results:
+        if result["parallel_s"] < result["serial_s"]:
+            return result["cars"]
+    return None
+
+
+def random_passengers(rng, num_levels:int, num_passengers:int,
+                      rate:float, lobby:float=0.0):
+    ''' (tick, origin, destination) for people turning up at random,
+    rate people per tick on average and lobby of them starting on 0 '''
+    passengers = []
+    time_now = 0.0
+    for i in range(num_passengers):
+        time_now += rng.expovariate(rate)
+        origin = 0 if rng.random() < lobby else rng.randrange(num_levels)
+        destination = rng.randrange(num_levels - 1)
+        if destination >= origin:
+            destination += 1
+        passengers.append((int(time_now), origin, destination))
+    return passengers
+
+
+def bench_destination_dispatch(num_levels:int=20, num_elevators:int=4,
+                               num_passengers:int=400, rate:float=0.5,
+                               lobby:float=0.0, seed:int=0):
+    '''
+    Run the same people through destination dispatch and through
+    calling the nearest lift (destinations selected once inside).
+    Returns: {"destination" / "nearest": {"journey", "wait", "travel",
+              "ticks", "throughput"}} mean steps and people per tick
+    '''
+    passengers = random_passengers(random.Random(seed), num_levels,
+                                   num_passengers, rate, lobby)
+    levels = [str(level_no) for level_no in range(num_levels)]
+    results = {}
+    for mode in ("destination", "nearest"):
+        controller = MultipleElevatorController(
+            [Elevator(levels) for i in range(num_elevators)])
+        metrics = MetricsCollector()
+        metrics.attach(controller)
+        for tick, origin, destination in passengers:
+            controller.advance_to(tick)
+            controller.call_destination(origin, destination,
+                                        nearest=mode == "nearest")
+        while controller.waiting or controller.riding:
+            controller.step_forward()
+        results[mode] = {
+            "journey": metrics.wait.mean + metrics.travel.mean,
+            "wait": metrics.wait.mean,
+            "travel": metrics.travel.mean,
+            "ticks": controller.tick,
+            "throughput": num_passengers / controller.tick,
+        }
+    return results
+
+
+def bench_batch(num_levels:int=60, num_elevators:int=16,
+                num_calls:int=32, queue_depth:int=4, repeats:int=3,
+                seed:int=0):
+    '''
+    Time giving out a batch of num_calls hall calls with
+    call_elevators() (greedy and joint) against calling call_elevator()
+    for each of them in turn. Only giving them out is timed, not
+    putting the lifts back afterwards.
+    Greedy batches choose the same lifts as calling them in turn so
+    should just be faster, joint ones are slower but should need fewer
+    steps in total.
+    Returns: {"sequential_s", "batch_s", "joint_s", "batch_speedup",
+              "sequential_steps", "batch_steps", "joint_steps"}
+    the steps being the total steps for the chosen lifts to arrive
+    '''
+    rng = random.Random(seed)
+    controller = MultipleElevatorController(
+        random_fleet(rng, num_levels, num_elevators, queue_depth))
+    calls = list(dict.fromkeys(random_call(rng, num_levels)
+                               for i in range(num_calls)))
+    state = controller.snapshot()
+
+    def total_steps(assigned):
+        return sum(elevator.steps_to_reach(*call)
+                   for call, elevator in assigned.items())
+
+    def timed(assign):
+        ''' (fastest time, total steps) of repeats runs of assign '''
+        best = float("inf")
+        for i in range(repeats):
+            start = time.perf_counter()
+            assigned = assign()
+            best = min(best, time.perf_counter() - start)
+            steps = total_steps(assigned)
+            controller.restore(state)
+        return best, steps
+
+    results = {}
+    results["sequential_s"], results["sequential_steps"] = timed(
+        lambda: {call: controller.call_elevator(*call) for call in calls})
+    results["batch_s"], results["batch_steps"] = timed(
+        lambda: controller.call_elevators(calls))
+    results["joint_s"], results["joint_steps"] = timed(
+        lambda: controller.call_elevators(calls, joint=True))
+    results["batch_speedup"] = results["sequential_s"] / results["batch_s"]
+    return results
+
+
+def bench_sharded(worker_counts=(1, 2, 4), num_banks:int=16,
+                  num_levels:int=60, num_elevators:int=8,
+                  calls_per_tick:int=16, num_ticks:int=100, seed:int=0):
+    '''
+    Time ticking num_banks independent banks, each tick with
+    calls_per_tick calls spread over them, with different numbers
+    of worker processes.
+    Returns: [{"workers", "ticks_per_s"}, ...]
+    '''
+    rng = random.Random(seed)
+    controllers = {bank: MultipleElevatorController(
+                       random_fleet(rng, num_levels, num_elevators, 8))
+                   for bank in range(num_banks)}
+    ticks = [[(rng.randrange(num_banks), "call",
+               random_call(rng, num_levels))
+              for i in range(calls_per_tick)]
+             for j in range(num_ticks)]
+    results = []
+    for num_workers in worker_counts:
+        with ShardedController(controllers, num_workers) as sharded:
+            start = time.perf_counter()
+            for requests in ticks:
+                sharded.tick(requests)
+            seconds = time.perf_counter() - start
+        results.append({"workers": num_workers,
+                        "ticks_per_s": num_ticks / seconds})
+    return results
+
+
+def bench_eta_cache(num_levels:int=60, num_elevators:int=16,
+                    num_idle:int=8, num_calls:int=16, num_ticks:int=200,
+                    seed:int=0):
+    '''
+    Every tick score num_calls random hall calls against the bank (as
+    a dispatcher re-scoring calls it hasn't given out yet would), give
+    1 of them out and step forward, with and without an EtaCache.
+    Calls are scored both by ranking every lift by ETA and with
+    fastest_elevator(), which only works out a few ETAs.
+    num_idle of the lifts start idle at the lobby, the rest busy.
+    Returns: {"rank_speedup", "fastest_speedup", "hits", "misses",
+              "hit_rate", "uncached_rank_s", ...}
+    '''
+    rng = random.Random(seed)
+    levels = [str(level_no) for level_no in range(num_levels)]
+    fleet = (random_fleet(rng, num_levels, num_elevators - num_idle, 8) +
+             [Elevator(levels) for i in range(num_idle)])
+    ticks = [[random_call(rng, num_levels) for i in range(num_calls)]
+             for j in range(num_ticks)]
+    results = {}
+    chosen = {}
+    for mode in ("uncached", "cached"):
+        controller = MultipleElevatorController(
+            [copy(elevator) for elevator in fleet])
+        if mode == "cached":
+            controller.eta_cache = cache = EtaCache()
+            eta = cache.eta
+        else:
+            def eta(elevator, from_level, direction):
+                return elevator.eta(from_level, direction)
+        chosen[mode] = choices = []
+        rank_seconds = fastest_seconds = 0
+        for calls in ticks:
+            start = time.perf_counter()
+            for call in calls:
+                choices.append(sorted(
+                    range(num_elevators),
+                    key=lambda i: eta(controller.elevators[i], *call)))
+            rank_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            for call in calls:
+                choices.append(controller.elevators.index(
+                    controller.fastest_elevator(*call)))
+            fastest_seconds += time.perf_counter() - start
+            controller.call_elevator(*calls[0])
+            controller.step_forward()
+        results[mode + "_rank_s"] = rank_seconds
+        results[mode + "_fastest_s"] = fastest_seconds
+    assert chosen["cached"] == chosen["uncached"]
+    for kind in ("rank", "fastest"):
+        results[kind + "_speedup"] = (results[f"uncached_{kind}_s"] /
+                                      results[f"cached_{kind}_s"])
+    results["hits"] = cache.hits
+    results["misses"] = cache.misses
+    results["hit_rate"] = cache.hits / (cache.hits + cache.misses)
+    return results
+
+
+def bench_plan_stream(num_levels:int=60, num_elevators:int=8,
+                      num_ticks:int=1000, calls_per_tick:float=0.5,
+                      seed:int=0):
+    '''
+    Keep something downstream up to date with every lift's plan for
+    num_ticks ticks of random hall calls, either by sending every
+    lift's whole plan every tick or with a PlanStream per lift.
+    Returns: {"full_segments", "stream_segments", "stream_diffs",
+              "full_s", "stream_s", ...}
+    '''
+    rng = random.Random(seed)
+    fleet = random_fleet(rng, num_levels, num_elevators, 4)
+    ticks = [[random_call(rng, num_levels)
+              for i in range(int(calls_per_tick) +
+                             (rng.random() < calls_per_tick % 1))]
+             for j in range(num_ticks)]
+    results = {}
+    for mode in ("full", "stream"):
+        controller = MultipleElevatorController(
+            [copy(elevator) for elevator in fleet])
+        num_segments = 0
+        start = time.perf_counter()
+        if mode == "stream":
+            streams = stream_plans(controller.elevators,
+                                   lambda index, diff: None)
+        for calls in ticks:
+            for call in calls:
+                controller.call_elevator(*call)
+            controller.step_forward()
+            if mode == "full":
+                for elevator in controller.elevators:
+                    num_segments += len(plan_segments(elevator))
+            else:
+                for stream in streams:
+                    stream.flush()
+        results[mode + "_s"] = time.perf_counter() - start
+        if mode == "stream":
+            num_segments = sum(stream.segments_sent for stream in streams)
+            results["stream_diffs"] = sum(stream.diffs_sent
+                                          for stream in streams)
+        results[mode + "_segments"] = num_segments
+    results["segments_ratio"] = (results["full_segments"] /
+                                 max(results["stream_segments"], 1))
+    return results
+
+
+def bench_tick_cost(num_levels:int=60, num_elevators:int=24,
+                    num_ticks:int=1000, calls_per_tick:float=0.5,
+                    repeats:int=3, seed:int=0):
+    '''
+    Time step_forward() over num_ticks ticks of random hall calls on
+    their own, with a TrajectoryRecorder attached and with
+    publish_snapshots on.
+    Returns: {"plain_tick_s", "recorded_tick_s", "recording_overhead",
+              "published_tick_s", "publishing_overhead"}
+    seconds per tick and the fraction each adds to a tick
+    '''
+    rng = random.Random(seed)
+    fleet = random_fleet(rng, num_levels, num_elevators, 4)
+    ticks = [[random_call(rng, num_levels)
+              for i in range(int(calls_per_tick) +
+                             (rng.random() < calls_per_tick % 1))]
+             for j in range(num_ticks)]
+
+    def run(mode:str):
+        controller = MultipleElevatorController(
+            [copy(elevator) for elevator in fleet],
+            publish_snapshots=mode == "published")
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = TrajectoryRecorder(
+                os.path.join(directory, "run.trj"), num_elevators,
+                capacity_ticks=num_ticks + 1)
+            if mode == "recorded":
+                recorder.attach(controller)
+            start = time.perf_counter()
+            for calls in ticks:
+                for call in calls:
+                    controller.call_elevator(*call)
+                controller.step_forward()
+            seconds = time.perf_counter() - start
+            recorder.close()
+        return seconds
+
+    # Taking turns so the machine getting busier hits both the same
+    best = dict.fromkeys(("plain", "recorded", "published"), float("inf"))
+    for i in range(repeats):
+        for mode in best:
+            best[mode] = min(best[mode], run(mode))
+    results = {mode + "_tick_s": seconds / num_ticks
+               for mode, seconds in best.items()}
+    for mode, name in (("recorded", "recording"),
+                       ("published", "publishing")):
+        results[name + "_overhead"] = (
+            results[mode + "_tick_s"] / results["plain_tick_s"] - 1)
+    return results
+
+
+# Optional heavy modules the engine should never need
+HEAVY_MODULES = ("tkinter", "numpy", "multiprocessing", "concurrent.futures")
+
+IMPORT_TIME_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(seconds, *(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def bench_import_time(names=("", "MultipleElevatorController",
+                             "ElevatorRenderer", "ShardedController"),
+                      repeats:int=5):
+    '''
+    Time importing this package in a new Python process, just the
+    package for "" otherwise importing name from it, the best of
+    repeats so it isn't thrown by the machine being busy
+    Returns: [{"import", "ms", "heavy"}, ...] heavy is every
+             HEAVY_MODULES it pulled in
+    '''
+    # Imported by the name of our folder from the folder above it, so
+    # this times this copy however we were run (unless the folder name
+    # can't be imported, then the installed package)
+    folder = os.path.dirname(os.path.abspath(__file__))
+    parent, package = os.path.split(folder)
+    if not package.isidentifier():
+        package = "elevators"
+    results = []
+    for name in names:
+        if name:
+            statement = f"from {package} import {name}"
+        else:
+            statement = f"import {package}"
+        script = IMPORT_TIME_SCRIPT.format(statement=statement,
+                                           heavy=HEAVY_MODULES)
+        best = float("inf")
+        for i in range(repeats):
+            output = subprocess.run([sys.executable, "-c", script],
+                                    cwd=parent, check=True,
+                                    capture_output=True, text=True).stdout
+            seconds, *heavy = output.split()
+            best = min(best, float(seconds))
+        results.append({"import": statement, "ms": best * 1000,
+                        "heavy": heavy})
+    return results
+
+
+def time_per_op(function, num_ops:int, repeats:int, reset=None):
+    '''
+    Best time in seconds for 1 call of function, from repeats runs
+    of num_ops calls. reset() is run (untimed) before every run
+    '''
+    best = float("inf")
+    for i in range(repeats):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        for j in range(num_ops):
+            function()
+        best = min(best, (time.perf_counter() - start) / num_ops)
+    return best
+
+
+def bench_building(num_levels:int, num_elevators:int, queue_depth:int,
+                   num_ops:int=200, repeats:int=3, seed:int=0):
+    '''
+    Benchmark the hot paths for 1 building size
+    Returns: {benchmark name: seconds per op}
+    '''
+    rng = random.Random(seed)
+    elevators = random_fleet(rng, num_levels, num_elevators, queue_depth)
+    controller = MultipleElevatorController(elevators)
+    calls = [random_call(rng, num_levels) for i in range(num_ops)]
+    state = controller.snapshot()
+    elevator = elevators[0]
+    calls_iter = iter(())
+
+    def next_call():
+        nonlocal calls_iter
+        try:
+            return next(calls_iter)
+        except StopIteration:
+            calls_iter = iter(calls)
+            return next(calls_iter)
+
+    def restore():
+        controller.restore(state)
+
+    def generate_commands():
+        # the plan is cached, so make it work it out again each time
+        elevator._plan = None
+        list(elevator.generate_commands())
+
+    def generate_command_runs():
+        elevator._plan = None
+        list(elevator.generate_command_runs())
+
+    return {
+        "generate_commands": time_per_op(
+            generate_commands, num_ops, repeats, restore),
+        "generate_command_runs": time_per_op(
+            generate_command_runs, num_ops, repeats, restore),
+        "elevator_step_forward": time_per_op(
+            elevator.step_forward, num_ops, repeats, restore),
+        "reset_direction": time_per_op(
+            elevator.reset_direction, num_ops, repeats, restore),
+        "steps_to_get_to_level": time_per_op(
+            lambda: MultipleElevatorController.steps_to_get_to_level(
+                elevator, *next_call()),
+            num_ops, repeats, restore),
+        "controller_step_forward": time_per_op(
+            controller.step_forward, num_ops, repeats, restore),
+        "call_elevator": time_per_op(
+            lambda: controller.call_elevator(*next_call()),
+            num_ops, repeats, restore),
+    }
+
+
+def run_benchmarks(floor_counts=(5, 20, 60, 200),
+                   car_counts=(1, 4, 16, 64), queue_depths=(0, 4, 16),
+                   num_ops:int=200, repeats:int=3, seed:int=0):
+    '''
+    Benchmark every combination of building size
+    Returns: [{"floors", "cars", "queue_depth", "seed", "results"}, ...]
+    '''
+    runs = []
+    for num_levels in floor_counts:
+        for num_elevators in car_counts:
+            for queue_depth in queue_depths:
+                runs.append({
+                    "floors": num_levels,
+                    "cars": num_elevators,
+                    "queue_depth": queue_depth,
+                    "seed": seed,
+                    "results": bench_building(num_levels, num_elevators,
+                                              queue_depth, num_ops,
+                                              repeats, seed),
+                })
+    return runs
+
+
+def machine_info():
+    ''' Where the benchmark ran, to make results comparable '''
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--floors", type=int, nargs="+",
+                        default=[5, 20, 60, 200])
+    parser.add_argument("--cars", type=int, nargs="+",
+                        default=[1, 4, 16, 64])
+    parser.add_argument("--queue-depth", type=int, nargs="+",
+                        default=[0, 4, 16])
+    parser.add_argument("--ops", type=int, default=200,
+                        help="calls per timed run")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parallel", action="store_true",
+                        help="find where a process pool beats serial")
+    parser.add_argument("--destination", action="store_true",
+                        help="compare destination dispatch with nearest")
+    parser.add_argument("--batch", action="store_true",
+                        help="compare call_elevators with call_elevator")
+    parser.add_argument("--sharded", action="store_true",
+                        help="time banks sharded over 1, 2, 4... workers")
+    parser.add_argument("--eta-cache", action="store_true",
+                        help="time dispatch with and without an EtaCache")
+    parser.add_argument("--plan-stream", action="store_true",
+                        help="compare streaming plan diffs with resending")
+    parser.add_argument("--tick-cost", action="store_true",
+                        help="time ticks with and without recording "
+                             "or publishing snapshots")
+    parser.add_argument("--import-time", action="store_true",
+                        help="time importing the package in a new process")
+    parser.add_argument("--output", help="write JSON here, not stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {"machine": machine_info()}
+    if args.parallel:
+        results = bench_parallel_crossover(car_counts=args.cars,
+                                           repeats=args.repeats,
+                                           seed=args.seed)
+        report["parallel"] = results
+        report["crossover_cars"] = crossover(results)
+    elif args.batch:
+        report["batch"] = [
+            dict(bench_batch(num_levels, num_elevators,
+                             repeats=args.repeats, seed=args.seed),
+                 floors=num_levels, cars=num_elevators)
+            for num_levels in args.floors for num_elevators in args.cars]
+    elif args.sharded:
+        report["sharded"] = bench_sharded(seed=args.seed)
+    elif args.import_time:
+        report["import_time"] = bench_import_time(repeats=args.repeats)
+    elif args.eta_cache:
+        report["eta_cache"] = [
+            dict(bench_eta_cache(num_levels, num_elevators,
+                                 num_elevators // 2, seed=args.seed),
+                 floors=num_levels, cars=num_elevators)
+            for num_levels in args.floors for num_elevators in args.cars]
+    elif args.plan_stream:
+        report["plan_stream"] = [
+            dict(bench_plan_stream(num_levels, num_elevators,
+                                   seed=args.seed),
+                 floors=num_levels, cars=num_elevators)
+            for num_levels in args.floors for num_elevators in args.cars]
+    elif args.tick_cost:
+        report["tick_cost"] = [
+            dict(bench_tick_cost(num_levels, num_elevators,
+                                 repeats=args.repeats, seed=args.seed),
+                 floors=num_levels, cars=num_elevators)
+            for num_levels in args.floors for num_elevators in args.cars]
+    elif args.destination:
+        report["destination"] = [
+            dict(bench_destination_dispatch(num_levels, num_elevators,
+                                             seed=args.seed),
+                 floors=num_levels, cars=num_elevators)
+            for num_levels in args.floors for num_elevators in args.cars]
+    else:
+        report["runs"] = run_benchmarks(args.floors, args.cars,
+                                        args.queue_depth, args.ops,
+                                        args.repeats, args.seed)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+'''
+Destination dispatch, people say where they're going (origin and
+destination) before a lift is chosen for them.
+
+A lift is only told about someone's destination once it opens its doors
+for them at their origin, just like if they selected it inside, so we
+can work out exactly when everyone a lift is carrying will arrive
+by walking it from stop to stop (see elevator.walk_stops) and adding
+destinations whenever it picks someone up.
+'''
+from collections import Counter
+from .constants import ElevatorDirection, ElevatorDoorStatus
+from .elevator import walk_stops
+from .levels_to_visit import sweep_tables
+from .timing import STEP_TIMING
+
+
+def travel_direction(origin:int, destination:int):
+    ''' The direction to call a lift in to get from origin to destination '''
+    if destination > origin:
+        return ElevatorDirection.UP
+    return ElevatorDirection.DOWN
+
+
+def selected_going_up(level_no:int, current_level:int, going_up:bool,
+                      num_levels:int):
+    ''' The direction Elevator.select_level(level_no) would choose,
+    as going up or not '''
+    if level_no == 0:
+        return True
+    elif level_no == num_levels - 1:
+        return False
+    elif going_up and current_level < level_no:
+        return True
+    elif not going_up and current_level > level_no:
+        return False
+    return not going_up
+
+
+def total_journey_time(elevator, waiting:dict, riding:Counter):
+    '''
+    Total steps from now until everyone a lift is looking after
+    gets out, ie. the sum of each of their arrival times. Timed with
+    the lift's timing model if it has one, like Elevator.eta, with
+    dwell for how many people are in the lift at each stop.
+
+    elevator: the Elevator, with every call for waiting already made
+    waiting: {(level_no, going_up): [(destination, request), ...]}
+             people the lift still has to pick up
+    riding: Counter of (level_no, going_up) stops that people already
+            in the lift get out at
+    Returns: None if someone would never arrive
+    '''
+    num_levels = elevator.num_levels
+    tables = sweep_tables(num_levels)
+    up_mask = elevator.visit_mask(ElevatorDirection.UP)
+    down_mask = elevator.visit_mask(ElevatorDirection.DOWN)
+    current_level = elevator.current_level
+    going_up = elevator.is_going_up
+    door_open = elevator.door_status == ElevatorDoorStatus.OPEN
+    timing = STEP_TIMING if elevator.timing is None else elevator.timing
+    load = elevator.load
+    waiting = dict(waiting)
+    riding = Counter(riding)
+    total = 0
+    offset = 0
+    while riding or waiting:
+        time_taken = offset
+        for (num_steps, start_level, level_no, was_going_up, going_up,
+             door_open) in walk_stops(current_level, going_up, door_open,
+                                      up_mask, down_mask, tables):
+            if not num_steps:
+                continue
+            elif start_level != level_no:
+                time_taken += timing.travel_time(abs(level_no - start_level))
+                continue
+            elif not door_open:
+                time_taken += timing.door_close_time
+                continue
+            time_taken += timing.door_open_time + timing.dwell(load)
+            # We just opened our doors here, in was_going_up
+            stop = (level_no, was_going_up)
+            if was_going_up:
+                up_mask &= ~(1 << level_no)
+            else:
+                down_mask &= ~(1 << level_no)
+            getting_out = riding.pop(stop, 0)
+            total += getting_out * time_taken
+            load = max(load - getting_out, 0)
+            boarding = waiting.pop(stop, None)
+            if boarding:
+                load += len(boarding)
+                for destination, _ in boarding:
+                    up = selected_going_up(destination, level_no, going_up,
+                                           num_levels)
+                    if up:
+                        up_mask |= 1 << destination
+                    else:
+                        down_mask |= 1 << destination
+                    riding[destination, up] += 1
+                # Start walking again with their destinations added
+                offset = time_taken
+                current_level = level_no
+                break
+            elif not riding and not waiting:
+                break
+        else:
+            # Nothing left to visit but people still haven't arrived
+            return None
+    return total
@@ -1,9 +1,13 @@
 #!/usr/bin/python3
-from collections import defaultdict
-from constants import (ElevatorCommand, ElevatorStatus, ElevatorDirection,
-                       ElevatorDoorStatus)
-from exceptions import ElevatorOutOfBoundsException
-from itertools import tee
+from copy import deepcopy
+from .constants import (ElevatorCommand, ElevatorStatus, ElevatorDirection,
+                        ElevatorDoorStatus)
+from .exceptions import ElevatorOutOfBoundsException
+from itertools import repeat, tee
+from .levels_to_visit import (LevelsToVisit, SweepTables, lowest_level,
+                              highest_level, iter_levels,
+                              iter_levels_reversed, sweep_tables)
+from .timing import STEP_TIMING
 
 # Helper function from https://docs.python.org/3/library/itertools.html
 def pairwise(iterable):
@@ -13,6 +17,88 @@ def pairwise(iterable):
     return zip(a, b)
 
 
+def walk_stops(current_level:int, going_up:bool, door_open:bool,
+               up_mask:int, down_mask:int, tables:SweepTables=None):
+    '''
+    Walk a lift with this state forward from stop to stop, exactly
+    like stepping it forward would, but without an Elevator and without
+    going 1 step at a time.
+
+    Between two stops the lift just travels in a straight line
+    (it can never turn around half way) so we can jump straight
+    from stop to stop and only count the floors in between.
+
+    Yields (num_steps, start_level, current_level, was_going_up, going_up,
+    door_open) first for where we start and then after every jump, where
+    was_going_up is our direction before reset_direction() runs.
+    Stops once there is nothing left to visit.
+    tables are the lift's SweepTables, looked up if not given.
+    '''
+    def should_reverse():
+        ''' Same as Elevator.reset_direction() on our local state '''
+        any_mask = up_mask | down_mask
+        if not any_mask:
+            return False
+        if going_up:
+            return (current_level >= highest_level(any_mask)
+                    and not up_mask >> current_level & 1)
+        return (current_level <= lowest_level(any_mask)
+                and not down_mask >> current_level & 1)
+
+    if tables is None:
+        tables = sweep_tables(max(current_level + 1,
+                                  (up_mask | down_mask).bit_length()))
+    bits = tables.bits
+    above = tables.above
+    below = tables.below
+    num_steps = 0
+    was_going_up = going_up
+    going_up ^= should_reverse()
+    yield (num_steps, current_level, current_level, was_going_up, going_up,
+           door_open)
+    while up_mask | down_mask:
+        start_level = current_level
+        num_steps += 1
+        here = bits[current_level]
+        if going_up and up_mask & here:
+            # Open our doors to visit this level
+            door_open = True
+            up_mask ^= here
+        elif not going_up and down_mask & here:
+            door_open = True
+            down_mask ^= here
+        elif door_open:
+            door_open = False
+        else:
+            # Find the next level we'd travel to, this matches the
+            # order of the levels in Elevator.visit_plan()
+            if going_up:
+                ahead = up_mask & above[current_level]
+                reverse = down_mask & ~here
+                if ahead:
+                    next_level = lowest_level(ahead)
+                elif reverse:
+                    next_level = highest_level(reverse)
+                else:
+                    next_level = lowest_level(up_mask)
+            else:
+                ahead = down_mask & below[current_level]
+                reverse = up_mask & ~here
+                if ahead:
+                    next_level = highest_level(ahead)
+                elif reverse:
+                    next_level = lowest_level(reverse)
+                else:
+                    next_level = highest_level(down_mask)
+            # Travelling there takes 1 step per level
+            num_steps += abs(next_level - current_level) - 1
+            current_level = next_level
+        was_going_up = going_up
+        going_up ^= should_reverse()
+        yield (num_steps, start_level, current_level, was_going_up, going_up,
+               door_open)
+
+
 class Elevator(object):
     '''
     A class representating an Elevator
@@ -23,18 +109,49 @@ class Elevator(object):
       current_level (int): integer repreenting current level.
              0 = Ground. 1,2,3 etc
              Below Ground (if exists) = -1, -2, -3 etc
-      levels_to_visit (dict):  Dictionary of levels to visit.
+      levels_to_visit (LevelsToVisit):  Dictionary of levels to visit.
              eg. {level_no: {DIRECTION_UP, DIRECTION_DOWN}}
              We want to visit this level 1 time on the way up
              and once on the way down...
+             Really stored as 2 bitmasks, 1 for UP and 1 for DOWN,
+             see levels_to_visit.py
       door_status (ElevatorDoorStatus): .OPEN or .CLOSED
       direction (ElevatorDirection): .UP or .DOWN
       current_command (ElevatorCommand): Represents the current command in use
+      observer (object): optional, told whenever we open our doors with
+             observer.door_opened(elevator, level_no, direction)
+      plan_listener (object): optional, told whenever our plan may have
+             changed with plan_listener.plan_changed(elevator) and before
+             we run every command with
+             plan_listener.command_run(elevator, command, num_steps),
+             see plan_stream.py
+      timing (StepTiming): optional, how long we take to do things eg.
+             a TimingModel, see timing.py. None counts steps
+      capacity (int): most people we can carry, None for no limit
+      load (int): how many people are inside right now, kept up to date
+             by the controller as people get in and out when we open our
+             doors (or set it from a load sensor)
+      _tables (SweepTables): masks for every level, shared by every lift
+             with as many levels, see levels_to_visit.py
+
+    The order we visit levels in is cached and only worked out again
+    when levels_to_visit or our direction changes, so only change
+    levels_to_visit through add_level / select_level / call_elevator
+    or the levels_to_visit view.
+
+    Visits that are only for a hall call (call_elevator), ie. nobody
+    inside wants to get out there, are remembered too so that once we
+    are full they can be handed to another lift, see drop_hall_calls().
     '''
+    __slots__ = ("levels", "current_level", "_up_mask", "_down_mask",
+                 "door_status", "direction", "current_command", "_plan",
+                 "observer", "plan_listener", "timing", "_tables",
+                 "capacity", "load", "_hall_up_mask", "_hall_down_mask")
 
     def __init__(self, levels:list, current_level:int=0,
                  door_status:ElevatorDoorStatus=ElevatorDoorStatus.CLOSED,
-                 direction:ElevatorDirection=ElevatorDirection.UP):
+                 direction:ElevatorDirection=ElevatorDirection.UP,
+                 capacity:int=None):
         if len(levels) <= 1:
             raise ValueError("You neeed at least 2 levels "
                              "otherwise why do you even have a lift?")
@@ -42,10 +159,149 @@ class Elevator(object):
 
         self.levels = levels
         self.current_level = current_level
-        self.levels_to_visit = defaultdict(set)
+        # Bit N set = visit level N going UP / DOWN
+        self._up_mask = 0
+        self._down_mask = 0
+        # Bit N set = the visit to level N is only for a hall call
+        self._hall_up_mask = 0
+        self._hall_down_mask = 0
         self.door_status = door_status
         self.direction = direction
         self.current_command = None
+        # Cached levels to visit in order, see visit_plan()
+        self._plan = None
+        self.observer = None
+        self.plan_listener = None
+        self.timing = None
+        self._tables = sweep_tables(len(levels))
+        self.capacity = capacity
+        self.load = 0
+
+    def snapshot(self):
+        ''' Our whole state (apart from levels) as a small tuple
+        which can be given back to restore() later '''
+        return (self.current_level, self._up_mask, self._down_mask,
+                self.door_status, self.direction, self.current_command,
+                self._plan, self._hall_up_mask, self._hall_down_mask,
+                self.load)
+
+    def restore(self, state:tuple):
+        ''' Go back to a state from snapshot() '''
+        (self.current_level, self._up_mask, self._down_mask,
+         self.door_status, self.direction, self.current_command,
+         self._plan, self._hall_up_mask, self._hall_down_mask,
+         self.load) = state
+        if self.plan_listener is not None:
+            self.plan_listener.plan_changed(self)
+
+    def __copy__(self):
+        ''' Cheap independent copy, eg. to simulate what if
+        without changing the real lift. Only levels is shared '''
+        elevator_copy = Elevator.__new__(Elevator)
+        elevator_copy.levels = self.levels
+        elevator_copy._tables = self._tables
+        elevator_copy.timing = self.timing
+        elevator_copy.capacity = self.capacity
+        # What if copies don't tell anyone what they're doing
+        elevator_copy.observer = None
+        elevator_copy.plan_listener = None
+        elevator_copy.restore(self.snapshot())
+        return elevator_copy
+
+    def __deepcopy__(self, memo):
+        elevator_copy = self.__copy__()
+        elevator_copy.levels = deepcopy(self.levels, memo)
+        return elevator_copy
+
+    @property
+    def levels_to_visit(self):
+        return LevelsToVisit(self)
+
+    def is_visiting(self, level_no:int, direction:ElevatorDirection):
+        ''' Whether we want to visit level_no going in direction '''
+        if direction == ElevatorDirection.UP:
+            return self._up_mask >> level_no & 1 == 1
+        return self._down_mask >> level_no & 1 == 1
+
+    def set_visiting(self, level_no:int, direction:ElevatorDirection,
+                     visiting:bool):
+        ''' Add or remove a visit to level_no going in direction '''
+        if not visiting and self._hall_up_mask | self._hall_down_mask:
+            self._set_hall_call(level_no, direction, False)
+        if direction == ElevatorDirection.UP:
+            mask = self._up_mask
+        else:
+            mask = self._down_mask
+        if visiting:
+            new_mask = mask | 1 << level_no
+        else:
+            new_mask = mask & ~(1 << level_no)
+        if new_mask == mask:
+            return
+        if direction == ElevatorDirection.UP:
+            self._up_mask = new_mask
+        else:
+            self._down_mask = new_mask
+        self._plan = None
+        if self.plan_listener is not None:
+            self.plan_listener.plan_changed(self)
+
+    def is_hall_call(self, level_no:int, direction:ElevatorDirection):
+        ''' Whether we are only visiting level_no going in direction
+        for a hall call, ie. nobody inside wants to get out there '''
+        if direction == ElevatorDirection.UP:
+            return self._hall_up_mask >> level_no & 1 == 1
+        return self._hall_down_mask >> level_no & 1 == 1
+
+    def _set_hall_call(self, level_no:int, direction:ElevatorDirection,
+                       hall_call:bool):
+        if direction == ElevatorDirection.UP:
+            mask = self._hall_up_mask
+        else:
+            mask = self._hall_down_mask
+        if hall_call:
+            mask |= 1 << level_no
+        else:
+            mask &= ~(1 << level_no)
+        if direction == ElevatorDirection.UP:
+            self._hall_up_mask = mask
+        else:
+            self._hall_down_mask = mask
+
+    def hall_calls(self):
+        ''' [(level_no, direction), ...] of every visit that is only
+        for a hall call '''
+        return ([(level_no, ElevatorDirection.UP)
+                 for level_no in iter_levels(self._hall_up_mask)] +
+                [(level_no, ElevatorDirection.DOWN)
+                 for level_no in iter_levels(self._hall_down_mask)])
+
+    def drop_hall_calls(self):
+        '''
+        Stop visiting anywhere we were only going for a hall call eg.
+        because we are full and nobody could get in, so we go straight
+        past. Someone else needs to answer them.
+        Returns: the dropped [(level_no, direction), ...]
+        '''
+        hall_calls = self.hall_calls()
+        for level_no, direction in hall_calls:
+            self.set_visiting(level_no, direction, False)
+        if hall_calls:
+            self.reset_direction()
+        return hall_calls
+
+    @property
+    def is_full(self):
+        return self.capacity is not None and self.load >= self.capacity
+
+    def visit_mask(self, direction:ElevatorDirection=None):
+        ''' Bitmask of levels to visit in direction, or in any
+        direction if it's None '''
+        if direction is None:
+            return self._up_mask | self._down_mask
+        if direction == ElevatorDirection.UP:
+            return self._up_mask
+        return self._down_mask
 
     @property
     def is_going_up(self):
@@ -94,56 +350,93 @@ class Elevator(object):
         eg. elevator at level 0, 1 person inside select to stop on 3,
         Returns: [UP_1, UP_1, UP_1,OPEN_DOOR, CLOSE_DOOR].
         '''
-        if self.direction in self.levels_to_visit[self.current_level]:
+        for command, count in self.generate_command_runs():
+            if count == 1:
+                yield command
+            else:
+                yield from repeat(command, count)
+
+    def generate_command_runs(self):
+        '''
+        Same commands as generate_commands() but each run of the same
+        command as 1 (command, count), so a long trip costs the same
+        as a short one.
+
+        eg. elevator at level 0, 1 person inside select to stop on 3,
+        Returns: [(UP_1, 3), (OPEN_DOOR, 1), (CLOSE_DOOR, 1)].
+        '''
+        if self.is_visiting(self.current_level, self.direction):
             # If we are due to visit this level we are currently on
-            yield ElevatorCommand.OPEN_DOOR
-            yield ElevatorCommand.CLOSE_DOOR
+            yield ElevatorCommand.OPEN_DOOR, 1
+            yield ElevatorCommand.CLOSE_DOOR, 1
         elif self.door_status == ElevatorDoorStatus.OPEN:
             # Our doors are open because we are leaving this current level
-            yield ElevatorCommand.CLOSE_DOOR
+            yield ElevatorCommand.CLOSE_DOOR, 1
 
-        # 1. First lets find ALL levels in the current direction we
-        # are going in order. Then lets remove any we aren't visiting
-        # in our current direction.
-        # eg. if we are going up, go as FAR up as possible
-        if self.is_going_up:
-            current_dir_all_levels = range(self.current_level,
-                                           self.num_levels)
-        else:
-            current_dir_all_levels = range(self.current_level, -1, -1)
-        # now filter out levels we aren't visiting in our current direction
-        current_dir_visit_levels = [lvl for lvl in current_dir_all_levels
-                            if self.direction in self.levels_to_visit[lvl]]
-
-        # 2. Now let's find all levels we'd visit on the way BACK
-        # eg. if we are going up, we just went as FAR UP as we can,
-        # now go all the way DOWN
-        if self.is_going_up:
-            reverse_dir_all_levels = range(self.num_levels - 1, -1, -1)
-        else:
-            reverse_dir_all_levels = range(0, self.num_levels)
-        reverse_dir_visit_levels = [lvl for lvl in reverse_dir_all_levels
-          if ElevatorDirection(-self.direction) in self.levels_to_visit[lvl]]
+        # Now lets connect all the commands joining all these visits
+        levels = [self.current_level] + self.visit_plan()
+        for level1, level2 in pairwise(levels):
+            if level1 == level2:
+                continue
+            elif level1 < level2:
+                yield ElevatorCommand.UP, level2 - level1
+            else:
+                yield ElevatorCommand.DOWN, level1 - level2
+            yield ElevatorCommand.OPEN_DOOR, 1
+            yield ElevatorCommand.CLOSE_DOOR, 1
+
+    def visit_plan(self):
+        '''
+        All the levels we are going to visit IN ORDER.
+        Worked out once and then cached until levels_to_visit or our
+        direction changes. While we are travelling between 2 levels
+        the plan stays the same since there is nothing to visit
+        in between.
+        '''
+        if self._plan is not None:
+            return self._plan
 
-        # 3. NOW let's find all levels if we flipped around AGAIN
-        # and came back to out current level, after doing #1 and #2
+        current_dir_mask = self.visit_mask(self.direction)
+        reverse_dir_mask = self.visit_mask(ElevatorDirection(-self.direction))
+        tables = self._tables
+        current_and_above = tables.at_or_above[self.current_level]
+        below = tables.below[self.current_level]
         if self.is_going_up:
-            passed_current_dir_all_levels = range(0, self.current_level)
+            # 1. First lets find ALL levels we are visiting in the
+            # current direction we are going in order.
+            # eg. if we are going up, go as FAR up as possible
+            plan = list(iter_levels(current_dir_mask & current_and_above))
+            # 2. Now let's find all levels we'd visit on the way BACK
+            # eg. if we are going up, we just went as FAR UP as we can,
+            # now go all the way DOWN
+            plan.extend(iter_levels_reversed(reverse_dir_mask))
+            # 3. NOW let's find all levels if we flipped around AGAIN
+            # and came back to out current level, after doing #1 and #2
+            plan.extend(iter_levels(current_dir_mask & below))
         else:
-            passed_current_dir_all_levels = range(self.num_levels,
-                                                  self.current_level, -1)
-        final_return_visit_levels = [
-            lvl for lvl in passed_current_dir_all_levels
-            if self.direction in self.levels_to_visit[lvl]
-        ]
+            plan = list(iter_levels_reversed(
+                current_dir_mask & tables.at_or_below[self.current_level]))
+            plan.extend(iter_levels(reverse_dir_mask))
+            plan.extend(iter_levels_reversed(
+                current_dir_mask & tables.above[self.current_level]))
 
-        # Now lets put all the levels we want to visit IN ORDER together
-        levels = ([self.current_level] + current_dir_visit_levels +
-                  reverse_dir_visit_levels + final_return_visit_levels)
+        self._plan = plan
+        return self._plan
 
-        # Now lets connect all the commands joining all these visits
-        for level1, level2 in pairwise(levels):
-            yield from self.gen_commands_lvl_to_lvl(level1, level2)
+    def next_command(self):
+        ''' The first command from generate_commands() without
+        working out all the others. None if there is nothing to do '''
+        if self.is_visiting(self.current_level, self.direction):
+            return ElevatorCommand.OPEN_DOOR
+        elif self.door_status == ElevatorDoorStatus.OPEN:
+            return ElevatorCommand.CLOSE_DOOR
+        # Head towards the first level in our plan we aren't already on
+        for level_no in self.visit_plan():
+            if level_no > self.current_level:
+                return ElevatorCommand.UP
+            elif level_no < self.current_level:
+                return ElevatorCommand.DOWN
+        return None
 
     def add_level(self, level_no:int, direction):
         '''
@@ -158,11 +451,11 @@ class Elevator(object):
         # Don't add in our current levele in our current direction
         if not (level_no == self.current_level and
                 self.direction == direction):
-            self.levels_to_visit[level_no].add(direction)
+            self.set_visiting(level_no, direction, True)
 
     def select_level(self, level_no:int, direction=None):
         ''' Select a level to visit and specify in which direction
-        we want to visit it in '''
+        we want to visit it in. Returns the direction we chose '''
         if direction is None:
             # If there is no direction specified,
             # It means someone inside the lift is selecting a level
@@ -182,8 +475,11 @@ class Elevator(object):
             else:
                 direction = ElevatorDirection(-self.direction)
         self.add_level(level_no, direction)
+        # Someone inside wants to get out here, it's not just a hall call
+        self._set_hall_call(level_no, direction, False)
         # We may need to reverse our direction to reach this level
         self.reset_direction()
+        return direction
 
     def call_elevator(self, from_level:int, direction:ElevatorDirection):
         '''
@@ -191,23 +487,169 @@ class Elevator(object):
         eg. going up go as far up high as you can then as far low as you can
         and then back up again (or inversed)
         '''
+        self.check_call(from_level, direction)
+        hall_call = (self.is_hall_call(from_level, direction)
+                     or not self.is_visiting(from_level, direction))
+        self.select_level(from_level, direction)
+        if hall_call and self.is_visiting(from_level, direction):
+            self._set_hall_call(from_level, direction, True)
+
+    def check_call(self, from_level:int, direction:ElevatorDirection):
+        ''' Make sure the lift can actually be summoned to
+        from_level to go in this direction '''
         assert 0 <= from_level  < self.num_levels
         if (from_level == self.num_levels - 1
             and direction == ElevatorDirection.UP or
             from_level == 0 and direction == ElevatorDirection.DOWN):
             # We can't go Down from 0 or UP from the MAX LEVEL
             raise ElevatorOutOfBoundsException("Impossible Action")
-        self.select_level(from_level, direction)
+
+    def steps_to_reach(self, from_level:int, direction:ElevatorDirection):
+        '''
+        Calculate how many steps it would take this lift to reach
+        from_level going in direction, if it was summoned right now.
+        Gives exactly the same answer as calling the lift on a copy
+        and stepping it forward until it arrives, but without copying
+        or stepping, see walk_stops().
+        '''
+        self.check_call(from_level, direction)
+        if from_level == self.current_level and direction == self.direction:
+            # We're already here, calling us won't add anything
+            return 0
+
+        up_mask = self._up_mask
+        down_mask = self._down_mask
+        # Pretend we've been called
+        if direction == ElevatorDirection.UP:
+            up_mask |= 1 << from_level
+        else:
+            down_mask |= 1 << from_level
+        target_up = direction == ElevatorDirection.UP
+
+        for num_steps, _, current_level, _, going_up, _ in walk_stops(
+                self.current_level, self.is_going_up,
+                self.door_status == ElevatorDoorStatus.OPEN,
+                up_mask, down_mask, self._tables):
+            if current_level == from_level and going_up == target_up:
+                return num_steps
+
+    def levels_lower_bound(self, from_level:int,
+                           direction:ElevatorDirection):
+        '''
+        Fewest levels we could travel to reach from_level going in
+        direction, just from where we are and the furthest level we have
+        to visit ahead. We never turn around before that level so if
+        from_level is behind us (or we need to be going the other way)
+        we have to get there and back first.
+        '''
+        if from_level == self.current_level and direction == self.direction:
+            return 0
+        any_mask = self._up_mask | self._down_mask
+        if self.is_going_up:
+            ahead = any_mask & self._tables.above[self.current_level]
+            if from_level > self.current_level and direction == self.direction:
+                return from_level - self.current_level
+            peak = max(from_level, self.current_level,
+                       highest_level(ahead) if ahead else self.current_level)
+            return 2 * peak - self.current_level - from_level
+        ahead = any_mask & self._tables.below[self.current_level]
+        if from_level < self.current_level and direction == self.direction:
+            return self.current_level - from_level
+        trough = min(from_level, self.current_level,
+                     lowest_level(ahead) if ahead else self.current_level)
+        return self.current_level + from_level - 2 * trough
+
+    def steps_lower_bound(self, from_level:int,
+                          direction:ElevatorDirection):
+        ''' Cheap lower bound on steps_to_reach(from_level, direction),
+        see levels_lower_bound() '''
+        num_steps = self.levels_lower_bound(from_level, direction)
+        if num_steps and self.door_status == ElevatorDoorStatus.OPEN:
+            # Have to close the doors before we can go anywhere
+            num_steps += 1
+        return num_steps
+
+    def time_to_reach(self, from_level:int, direction:ElevatorDirection):
+        '''
+        Same as steps_to_reach() but timed with our timing model
+        (see timing.py), eg. in seconds. Every leg, door opening and
+        closing on the way is timed as a whole, not step by step.
+        Dwell at every stop is for the load we have now.
+        '''
+        self.check_call(from_level, direction)
+        if from_level == self.current_level and direction == self.direction:
+            return 0
+        timing = STEP_TIMING if self.timing is None else self.timing
+        up_mask = self._up_mask
+        down_mask = self._down_mask
+        if direction == ElevatorDirection.UP:
+            up_mask |= 1 << from_level
+        else:
+            down_mask |= 1 << from_level
+        target_up = direction == ElevatorDirection.UP
+        stop_time = timing.door_open_time + timing.dwell(self.load)
+
+        time_taken = 0
+        for (num_steps, start_level, current_level, _, going_up,
+             door_open) in walk_stops(
+                 self.current_level, self.is_going_up,
+                 self.door_status == ElevatorDoorStatus.OPEN,
+                 up_mask, down_mask, self._tables):
+            if not num_steps:
+                # Where we start
+                pass
+            elif start_level != current_level:
+                time_taken += timing.travel_time(
+                    abs(current_level - start_level))
+            elif door_open:
+                time_taken += stop_time
+            else:
+                time_taken += timing.door_close_time
+            if current_level == from_level and going_up == target_up:
+                return time_taken
+
+    def eta(self, from_level:int, direction:ElevatorDirection):
+        ''' steps_to_reach() or, if we have a timing model,
+        time_to_reach() '''
+        if self.timing is None:
+            return self.steps_to_reach(from_level, direction)
+        return self.time_to_reach(from_level, direction)
+
+    def eta_key(self, from_level:int, direction:ElevatorDirection):
+        ''' Everything eta(from_level, direction) depends on as a
+        hashable tuple, lifts in the same state calling for the same
+        thing give equal keys, see eta_cache.py '''
+        return (len(self.levels), self.current_level,
+                self.direction == ElevatorDirection.UP,
+                self.door_status == ElevatorDoorStatus.OPEN,
+                self._up_mask, self._down_mask, self.timing,
+                # Only timed dwell depends on it
+                0 if self.timing is None else self.load,
+                from_level, direction == ElevatorDirection.UP)
+
+    def eta_lower_bound(self, from_level:int, direction:ElevatorDirection):
+        ''' Cheap lower bound on eta(). Travelling further never takes
+        less time and 1 long trip is never slower than the same distance
+        in shorter legs, so timing the fewest levels we could travel
+        in 1 go is a lower bound '''
+        if self.timing is None:
+            return self.steps_lower_bound(from_level, direction)
+        num_levels = self.levels_lower_bound(from_level, direction)
+        if not num_levels:
+            return 0
+        time_taken = self.timing.travel_time(num_levels)
+        if self.door_status == ElevatorDoorStatus.OPEN:
+            time_taken += self.timing.door_close_time
+        return time_taken
 
     def reset_direction(self):
         ''' Check if there are no levels left in our direction
         if so then let's reverse direction '''
-        if not any(self.levels_to_visit.values()):
+        any_mask = self._up_mask | self._down_mask
+        if not any_mask:
             return
-        max_level = max(lvl for lvl in self.levels_to_visit
-                        if self.levels_to_visit[lvl])
-        min_level = min(lvl for lvl in self.levels_to_visit
-                        if self.levels_to_visit[lvl])
+        max_level = highest_level(any_mask)
+        min_level = lowest_level(any_mask)
 
         # If we are going up and above the max level we need to visit
         # or we are going down and lower than the min level we need to visit
@@ -215,27 +657,65 @@ class Elevator(object):
         # at a level we need to visit
         if ((self.is_going_up and self.current_level >= max_level or
              not self.is_going_up and self.current_level <= min_level)
-            and self.direction not in
-                self.levels_to_visit[self.current_level]):
+            and not self.is_visiting(self.current_level, self.direction)):
             self.direction = ElevatorDirection(-self.direction)
+            self._plan = None
+            if self.plan_listener is not None:
+                self.plan_listener.plan_changed(self)
+
+    def steps_until_event(self):
+        '''
+        How many steps until something other than travelling happens
+        eg. opening doors or reaching the next level to visit.
+        None if there is nothing to do at all.
+        '''
+        command = self.next_command()
+        if command is None:
+            return None
+        elif command not in (ElevatorCommand.UP, ElevatorCommand.DOWN):
+            return 1
+        for level_no in self.visit_plan():
+            if level_no != self.current_level:
+                return abs(level_no - self.current_level)
+
+    def travel(self, num_steps:int):
+        '''
+        Same as step_forward() num_steps times, as long as we are only
+        travelling, ie. num_steps <= steps_until_event().
+        We can't turn around half way between levels to visit so
+        this just moves us straight there.
+        '''
+        command = self.next_command()
+        if self.plan_listener is not None:
+            self.plan_listener.command_run(self, command, num_steps)
+        self.current_command = command
+        if command == ElevatorCommand.UP:
+            self.current_level += num_steps
+        else:
+            self.current_level -= num_steps
+        self.reset_direction()
 
     def step_forward(self):
         ''' Step forward our elevator through and run its
         next command '''
-        try:
-            self.current_command = next(self.generate_commands())
-            if self.current_command == ElevatorCommand.UP:
-                self.current_level += 1
-            elif self.current_command == ElevatorCommand.DOWN:
-                self.current_level -= 1
-            elif self.current_command == ElevatorCommand.OPEN_DOOR:
-                self.door_status = ElevatorDoorStatus.OPEN
-                # weve now visited this level in out current direction
-                self.levels_to_visit[self.current_level].discard(
-                                                      self.direction)
-            elif self.current_command == ElevatorCommand.CLOSE_DOOR:
-                self.door_status = ElevatorDoorStatus.CLOSED
-            self.reset_direction()
-        except StopIteration:
+        command = self.next_command()
+        if command is None:
             # Nothing to do right now
-            pass
+            return
+        if self.plan_listener is not None:
+            self.plan_listener.command_run(self, command, 1)
+        self.current_command = command
+        if command == ElevatorCommand.UP:
+            self.current_level += 1
+        elif command == ElevatorCommand.DOWN:
+            self.current_level -= 1
+        elif command == ElevatorCommand.OPEN_DOOR:
+            self.door_status = ElevatorDoorStatus.OPEN
+            # weve now visited this level in out current direction
+            self.set_visiting(self.current_level, self.direction, False)
+            if self.observer is not None:
+                self.observer.door_opened(self, self.current_level,
+                                          self.direction)
+        elif command == ElevatorCommand.CLOSE_DOOR:
+            self.door_status = ElevatorDoorStatus.CLOSED
+        self.reset_direction()
@@ -1,11 +1,18 @@
 '''
 Visualizes multiple elevators and their states
 and draws the ENTIRE screen with ELEVATORS from LEFT to RIGHT
+
+Nothing is shown until main() is run, and tkinter is only imported
+then, so this can be imported without a display (or tkinter at all)
+eg. to benchmark ElevatorRenderer
 '''
-import tkinter as tk
-from constants import ElevatorDoorStatus, ElevatorDirection
-from elevator import Elevator
-from multiple_elevator_controller import MultipleElevatorController
+if not __package__:
+    # Run as a script, see script_support.py
+    from script_support import as_package
+    __package__ = as_package()
+from .constants import ElevatorDoorStatus, ElevatorDirection
+from .elevator import Elevator
+from .multiple_elevator_controller import MultipleElevatorController
 
 LEVELS = "G 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15".split()
 
@@ -20,52 +27,68 @@ CANVAS_HEIGHT = ELEVATOR_HEIGHT * (len(LEVELS) + 2) + ELEVATOR_MARGIN * 2
 REFRESH_INTERVAL = 800
 
 
-class Application(tk.Frame):
+class Application(object):
+    '''
+    The monitor window, call and select buttons on top of an
+    ElevatorRenderer canvas
+
+    Attributes:
+      master (tk.Tk): the window we are in
+      frame (tk.Frame): holds our buttons
+    '''
 
-    def __init__(self, master=None):
-        super().__init__(master)
+    def __init__(self, master):
+        super().__init__()
+        import tkinter as tk
+        self.tk = tk
         self.create_elevators()
         self.master = master
-        self.pack()
+        self.frame = tk.Frame(master)
+        self.frame.pack()
         self.create_widgets()
         self.create_canvas()
         self.step_forward()
 
+    def mainloop(self):
+        self.master.mainloop()
+
     def create_widgets(self):
-        tk.Label(self, text="Current Level")
+        tk = self.tk
+        frame = self.frame
+        tk.Label(frame, text="Current Level")
 
-        self.call_level = tk.StringVar(self)
+        self.call_level = tk.StringVar(frame)
         self.call_level.set(LEVELS[0])
 
-        call_label = tk.Label(self, text="Call A Lift")
+        call_label = tk.Label(frame, text="Call A Lift")
         call_label.grid(row=0, column=0)
 
         # Dropdown of levels to seleect
-        current_level = tk.OptionMenu(self, self.call_level, *LEVELS)
+        current_level = tk.OptionMenu(frame, self.call_level, *LEVELS)
         current_level.grid(row=0, column=1)
 
         # Elevator UP / DOWN call buttons
-        up_button = tk.Button(self, text="UP", fg="black",
+        up_button = tk.Button(frame, text="UP", fg="black",
                               command=self.call_elevator_up)
         up_button.grid(row=0, column=2)
-        down_button = tk.Button(self, text="DOWN", fg="black",
+        down_button = tk.Button(frame, text="DOWN", fg="black",
                                 command=self.call_elevator_down)
         down_button.grid(row=0, column=3)
 
         # Quit Button
-        quit = tk.Button(self, text="QUIT", fg="red",
+        quit = tk.Button(frame, text="QUIT", fg="red",
                           command=self.master.destroy)
         quit.grid(row=0, column=4)
 
         # Create some quick debug controls for each visual elevator
         for i in range(len(self.controller.elevators)):
-            elevator_label = tk.Label(self, text="Elevator {0}: ".format(i))
+            elevator_label = tk.Label(frame, text="Elevator {0}: ".format(i))
             elevator_label.grid(row=i+1, column=0)
 
-            level_selection = tk.StringVar(self)
+            level_selection = tk.StringVar(frame)
             level_selection.set(LEVELS[0])
 
-            test = tk.OptionMenu(self, level_selection, *LEVELS)
+            test = tk.OptionMenu(frame, level_selection, *LEVELS)
             test.grid(row=i+1, column=1)
 
             # Function wrapper that just simulates somebody
@@ -76,17 +99,18 @@ class Application(tk.Frame):
 
             # Create a visual button to select a level
             select_button = tk.Button(
-                self, text="Select Level", fg="black",
+                frame, text="Select Level", fg="black",
                 command=activate_elevator(i, level_selection)
             )
             select_button.grid(row=i+1, column=2)
 
     def create_elevators(self):
         ''' Initialize our elevators for use in this visualisation  '''
-        self.controller = MultipleElevatorController()
+        self.controller = MultipleElevatorController(publish_snapshots=True)
         self.controller.elevators.append(Elevator(LEVELS))
         self.controller.elevators.append(Elevator(LEVELS))
         self.controller.elevators.append(Elevator(LEVELS))
+        self.controller.publish()
 
     def call_elevator_up(self):
         ''' Call any elevator to come UP to our level '''
@@ -105,90 +129,130 @@ class Application(tk.Frame):
         ''' Create our canvas to hold all our elevators visually '''
         canvas_width = len(self.controller.elevators) * ELEVATOR_FRAME_WIDTH
         canvas_height = CANVAS_HEIGHT
-        self.canvas = tk.Canvas(self.master,
+        self.canvas = self.tk.Canvas(self.master,
                                 width=canvas_width,
                                 height=canvas_height)
         self.canvas.pack()
-        self.draw_elevators()
-
-    def draw_elevators(self):
-        ''' Draw each elevator onto the canvas '''
-        for i, elevator in enumerate(self.controller.elevators):
-            self.draw_elevator(elevator, left=ELEVATOR_FRAME_WIDTH * i)
+        self.renderer = ElevatorRenderer(self.canvas)
+        self.renderer.render(self.controller.fleet_snapshot.cars)
 
     def step_forward(self):
         ''' Simulate time by stepping each elevator to its next command '''
         self.controller.step_forward()
-        self.canvas.delete("all")
-        self.draw_elevators()
+        self.renderer.render(self.controller.fleet_snapshot.cars)
         self.master.after(REFRESH_INTERVAL, self.step_forward)
 
-    def draw_elevator(self, elevator, left=0):
+
+class ElevatorRenderer(object):
+    '''
+    Draws every elevator onto a canvas, leaving the canvas items in place
+    between refreshes and only moving / changing the ones for elevators
+    whose state changed since they were last drawn.
+
+    canvas only needs create_rectangle / create_line / create_text,
+    coords and itemconfig, so any stand in for a tk.Canvas will do eg.
+    to benchmark without a display.
+
+    Attributes:
+      canvas (tk.Canvas): what we draw on
+      items (list): canvas item ids for each elevator we have drawn
+             {"car", "line", "labels"}
+      drawn (list): the CarState each elevator was last drawn in
+    '''
+
+    def __init__(self, canvas):
+        super().__init__()
+        self.canvas = canvas
+        self.items = []
+        self.drawn = []
+
+    @staticmethod
+    def labels(state):
+        return (f"Level: {state.current_level}",
+                f"Door Status: {state.door_status.value}",
+                f"Direction: {state.direction.value}",
+                f"Status: {state.status.value}")
+
+    def render(self, cars):
+        ''' Bring the canvas up to date with cars, the CarStates from
+        a FleetSnapshot, drawn from LEFT to RIGHT '''
+        for i, state in enumerate(cars):
+            if i == len(self.items):
+                self.create_elevator(i, state)
+            elif state != self.drawn[i]:
+                self.update_elevator(i, state)
+
+    def positions(self, index:int, current_level:int):
+        ''' Where the items for elevator number index go on this level
+        Returns: (car rectangle, door line, [each label]) coords '''
+        base_y = CANVAS_HEIGHT - ELEVATOR_MARGIN
+        elevator_x = ELEVATOR_MARGIN + ELEVATOR_FRAME_WIDTH * index
+        middle_x = elevator_x + ELEVATOR_WIDTH // 2
+        top = base_y - ELEVATOR_HEIGHT * (current_level + 1)
+        bottom = base_y - ELEVATOR_HEIGHT * current_level
+        gap = ELEVATOR_LABEL_VERTICAL_GAP
+        return ((elevator_x, top, elevator_x + ELEVATOR_WIDTH, bottom),
+                (middle_x, top, middle_x, bottom),
+                [(middle_x, bottom + gap * line) for line in range(1, 5)])
+
+    @staticmethod
+    def styles(door_status):
+        ''' (car fill, door line state), if the door is closed draw the
+        car GREY with a line through it, otherwise BLACK '''
+        if door_status == ElevatorDoorStatus.CLOSED:
+            return "#476042", "normal"
+        return "#000000", "hidden"
+
+    def create_elevator(self, index:int, state):
         '''
         Draw a visual representation of an elevator.
         Its just a rectangle with a line through it.
         Include our status information at the bottom
         '''
-        w = self.canvas
-        base_y = CANVAS_HEIGHT - ELEVATOR_MARGIN
-        elevator_x = ELEVATOR_MARGIN + left
-
-        # If door is closed draw GREY, otherwise BLACK
-        if elevator.door_status == ElevatorDoorStatus.CLOSED:
-            fill = "#476042"
-        else:
-            fill = "#000000"
-
-        # Create elevator rectangle
-        w.create_rectangle(
-            elevator_x,
-            base_y - ELEVATOR_HEIGHT * (elevator.current_level + 1),
-            elevator_x + ELEVATOR_WIDTH,
-            base_y - ELEVATOR_HEIGHT * (elevator.current_level),
-            fill=fill,
-        )
-
+        car, line, labels = self.positions(index, state.current_level)
+        fill, line_state = ElevatorRenderer.styles(state.door_status)
         text_font = "Times 13 bold"
         text_color = "black"
-
-        # Include our elevator STATUS info
-        gap = ELEVATOR_LABEL_VERTICAL_GAP
-        self.canvas.create_text(
-            elevator_x + ELEVATOR_WIDTH // 2,
-            base_y - ELEVATOR_HEIGHT * (elevator.current_level) + gap,
-            fill=text_color, font=text_font,
-            text=f"Level: {elevator.current_level}"
-        )
-        self.canvas.create_text(
-            elevator_x + ELEVATOR_WIDTH // 2,
-            base_y - ELEVATOR_HEIGHT * (elevator.current_level) + gap * 2,
-            fill=text_color, font=text_font,
-            text=f"Door Status: {elevator.door_status.value}"
-        )
-        self.canvas.create_text(
-            elevator_x + ELEVATOR_WIDTH // 2,
-            base_y - ELEVATOR_HEIGHT * (elevator.current_level) + gap * 3,
-            fill=text_color, font=text_font,
-            text=f"Direction: {elevator.direction.value}"
-        )
-        self.canvas.create_text(
-            elevator_x + ELEVATOR_WIDTH // 2,
-            base_y - ELEVATOR_HEIGHT * (elevator.current_level) + gap * 4,
-            fill=text_color, font=text_font,
-            text=f"Status: {elevator.status.value}"
-        )
-
-        # If the door is closed draw a line through it
-        if elevator.door_status == ElevatorDoorStatus.CLOSED:
-            LINE_WIDTH = 2
-            w.create_line(
-                elevator_x + ELEVATOR_WIDTH//2,
-                base_y - ELEVATOR_HEIGHT * (elevator.current_level + 1),
-                elevator_x+ ELEVATOR_WIDTH//2,
-                base_y - ELEVATOR_HEIGHT * (elevator.current_level),
-                fill="#111111", width=LINE_WIDTH)
-
-
-root = tk.Tk()
-app = Application(master=root)
-app.mainloop()
+        self.items.append({
+            "car": self.canvas.create_rectangle(*car, fill=fill),
+            "line": self.canvas.create_line(*line, fill="#111111", width=2,
+                                            state=line_state),
+            "labels": [self.canvas.create_text(*position, fill=text_color,
+                                               font=text_font, text=text)
+                       for position, text in
+                       zip(labels, ElevatorRenderer.labels(state))],
+        })
+        self.drawn.append(state)
+
+    def update_elevator(self, index:int, state):
+        ''' Only move / change what is different since we last drew
+        elevator number index '''
+        items = self.items[index]
+        drawn = self.drawn[index]
+        if state.current_level != drawn.current_level:
+            car, line, labels = self.positions(index, state.current_level)
+            self.canvas.coords(items["car"], *car)
+            self.canvas.coords(items["line"], *line)
+            for item, position in zip(items["labels"], labels):
+                self.canvas.coords(item, *position)
+        if state.door_status != drawn.door_status:
+            fill, line_state = ElevatorRenderer.styles(state.door_status)
+            self.canvas.itemconfig(items["car"], fill=fill)
+            self.canvas.itemconfig(items["line"], state=line_state)
+        for item, text, drawn_text in zip(
+                items["labels"], ElevatorRenderer.labels(state),
+                ElevatorRenderer.labels(drawn)):
+            if text != drawn_text:
+                self.canvas.itemconfig(item, text=text)
+        self.drawn[index] = state
+
+
+def main():
+    import tkinter as tk
+    root = tk.Tk()
+    app = Application(master=root)
+    app.mainloop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''
+Remembers ETAs so the same lift isn't scored for the same call over
+and over, eg. between ticks or for every lift of an idle bank which
+are all in exactly the same state.
+
+ETAs are stored by everything they depend on (see Elevator.eta_key) rather
+than by lift, so a lift that has moved, had a level added or opened
+its doors just has a different key and never gets an old ETA back,
+there's nothing to invalidate by hand. Keys that stop being used are
+dropped once the cache is full, least recently used first.
+
+Use it with controller.eta_cache = EtaCache()
+'''
+from collections import OrderedDict
+from .constants import ElevatorDirection
+
+
+class EtaCache(object):
+    '''
+    LRU cache of Elevator.eta() results.
+
+    Timing models are compared by identity, so change a lift's timing
+    by giving it another TimingModel rather than changing the one it has
+    (or clear() the cache).
+
+    Attributes:
+      maxsize (int): most ETAs kept, each is a 10 item tuple key and
+             a number so roughly 200 bytes
+      hits (int): ETAs we already had
+      misses (int): ETAs we had to work out
+    '''
+
+    def __init__(self, maxsize:int=4096):
+        super().__init__()
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._etas = OrderedDict()
+
+    def eta(self, elevator, from_level:int, direction:ElevatorDirection):
+        ''' elevator.eta(from_level, direction), remembered '''
+        key = elevator.eta_key(from_level, direction)
+        eta = self._etas.get(key)
+        if eta is not None:
+            self.hits += 1
+            self._etas.move_to_end(key)
+            return eta
+        self.misses += 1
+        # Impossible calls raise here and are never stored
+        eta = elevator.eta(from_level, direction)
+        self._etas[key] = eta
+        if len(self._etas) > self.maxsize:
+            self._etas.popitem(last=False)
+        return eta
+
+    def info(self):
+        ''' {"hits", "misses", "size", "maxsize"} '''
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._etas), "maxsize": self.maxsize}
+
+    def clear(self):
+        ''' Forget every ETA and reset the counters '''
+        self._etas.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._etas)
@@ -0,0 +1,226 @@
+'''
+Simulates a whole fleet of elevators at once with NumPy.
+Every lift is a row in a few arrays instead of an Elevator object,
+so one step_forward() moves every lift with a handful of array
+operations. Used for long offline simulations eg. capacity planning.
+
+Needs NumPy, which the rest of the elevator system doesn't.
+'''
+import numpy as np
+from .constants import (ElevatorCommand, ElevatorDirection,
+                        ElevatorDoorStatus)
+from .elevator import Elevator
+from .exceptions import ElevatorOutOfBoundsException
+
+# How commands are stored in FleetSimulator.current_command
+NO_COMMAND = 0
+COMMANDS = (None, ElevatorCommand.UP, ElevatorCommand.DOWN,
+            ElevatorCommand.OPEN_DOOR, ElevatorCommand.CLOSE_DOOR)
+COMMAND_CODES = {command: code for code, command in enumerate(COMMANDS)}
+UP, DOWN, OPEN_DOOR, CLOSE_DOOR = range(1, 5)
+
+
+class FleetSimulator(object):
+    '''
+    Struct of arrays version of many Elevators in the same building.
+    Gives exactly the same results as stepping each Elevator.
+
+    Attributes:
+      num_levels (int): levels in the building, same for every lift
+      current_level (np.ndarray): (num_elevators,) current level of each
+      going_up (np.ndarray): (num_elevators,) True if direction is UP
+      door_open (np.ndarray): (num_elevators,) True if doors are OPEN
+      current_command (np.ndarray): (num_elevators,) code of the last
+             command, see COMMANDS
+      visit_up (np.ndarray): (num_elevators, num_levels) levels to visit
+             going UP, like Elevator.levels_to_visit
+      visit_down (np.ndarray): (num_elevators, num_levels) same going DOWN
+    '''
+
+    def __init__(self, num_levels:int, num_elevators:int):
+        if num_levels <= 1:
+            raise ValueError("You neeed at least 2 levels "
+                             "otherwise why do you even have a lift?")
+        super().__init__()
+        self.num_levels = num_levels
+        self.current_level = np.zeros(num_elevators, dtype=np.int64)
+        self.going_up = np.ones(num_elevators, dtype=bool)
+        self.door_open = np.zeros(num_elevators, dtype=bool)
+        self.current_command = np.zeros(num_elevators, dtype=np.int8)
+        self.visit_up = np.zeros((num_elevators, num_levels), dtype=bool)
+        self.visit_down = np.zeros((num_elevators, num_levels), dtype=bool)
+        self._level_numbers = np.arange(num_levels)
+        self._rows = np.arange(num_elevators)
+
+    @property
+    def num_elevators(self):
+        return len(self.current_level)
+
+    @classmethod
+    def from_elevators(cls, elevators):
+        ''' Build a fleet with the same state as these Elevators '''
+        fleet = cls(elevators[0].num_levels, len(elevators))
+        for index, elevator in enumerate(elevators):
+            fleet.current_level[index] = elevator.current_level
+            fleet.going_up[index] = elevator.is_going_up
+            fleet.door_open[index] = (
+                elevator.door_status == ElevatorDoorStatus.OPEN)
+            fleet.current_command[index] = COMMAND_CODES[
+                elevator.current_command]
+            for level_no, directions in elevator.levels_to_visit.items():
+                fleet.visit_up[index, level_no] = (
+                    ElevatorDirection.UP in directions)
+                fleet.visit_down[index, level_no] = (
+                    ElevatorDirection.DOWN in directions)
+        return fleet
+
+    def to_elevator(self, index:int, levels:list):
+        ''' An Elevator with the same state as lift number index '''
+        elevator = Elevator(levels,
+                            current_level=int(self.current_level[index]),
+                            door_status=self.door_status(index),
+                            direction=self.direction(index))
+        elevator.current_command = COMMANDS[self.current_command[index]]
+        for level_no in np.flatnonzero(self.visit_up[index]):
+            elevator.set_visiting(int(level_no), ElevatorDirection.UP, True)
+        for level_no in np.flatnonzero(self.visit_down[index]):
+            elevator.set_visiting(int(level_no), ElevatorDirection.DOWN,
+                                  True)
+        return elevator
+
+    def direction(self, index:int):
+        if self.going_up[index]:
+            return ElevatorDirection.UP
+        return ElevatorDirection.DOWN
+
+    def door_status(self, index:int):
+        if self.door_open[index]:
+            return ElevatorDoorStatus.OPEN
+        return ElevatorDoorStatus.CLOSED
+
+    def _visits(self, direction:ElevatorDirection):
+        if direction == ElevatorDirection.UP:
+            return self.visit_up
+        return self.visit_down
+
+    def add_level(self, index:int, level_no:int,
+                  direction:ElevatorDirection):
+        ''' Same as Elevator.add_level for lift number index '''
+        if level_no < 0 or level_no >= self.num_levels:
+            raise ElevatorOutOfBoundsException("This level can't be reached!")
+        if not (level_no == self.current_level[index] and
+                self.direction(index) == direction):
+            self._visits(direction)[index, level_no] = True
+
+    def select_level(self, index:int, level_no:int, direction=None):
+        ''' Same as Elevator.select_level for lift number index '''
+        if direction is None:
+            current_level = self.current_level[index]
+            going_up = self.going_up[index]
+            if level_no == 0:
+                direction = ElevatorDirection.UP
+            elif level_no == self.num_levels - 1:
+                direction = ElevatorDirection.DOWN
+            elif (going_up and current_level < level_no
+                  or not going_up and current_level > level_no):
+                direction = self.direction(index)
+            else:
+                direction = ElevatorDirection(-self.direction(index))
+        self.add_level(index, level_no, direction)
+        self.reset_direction(self._rows[index:index + 1])
+
+    def call_elevator(self, index:int, from_level:int,
+                      direction:ElevatorDirection):
+        ''' Same as Elevator.call_elevator for lift number index '''
+        assert 0 <= from_level < self.num_levels
+        if (from_level == self.num_levels - 1
+            and direction == ElevatorDirection.UP or
+            from_level == 0 and direction == ElevatorDirection.DOWN):
+            raise ElevatorOutOfBoundsException("Impossible Action")
+        self.select_level(index, from_level, direction)
+
+    def _visiting_here(self, rows):
+        ''' Whether each lift in rows is due to stop at its current
+        level in its current direction '''
+        levels = self.current_level[rows]
+        return np.where(self.going_up[rows],
+                        self.visit_up[rows, levels],
+                        self.visit_down[rows, levels])
+
+    def reset_direction(self, rows=None):
+        ''' Same as Elevator.reset_direction for every lift in rows '''
+        if rows is None:
+            rows = self._rows
+        visits = self.visit_up[rows] | self.visit_down[rows]
+        has_visits = visits.any(axis=1)
+        max_level = self.num_levels - 1 - visits[:, ::-1].argmax(axis=1)
+        min_level = visits.argmax(axis=1)
+        levels = self.current_level[rows]
+        going_up = self.going_up[rows]
+        reverse = (has_visits &
+                   np.where(going_up, levels >= max_level,
+                            levels <= min_level) &
+                   ~self._visiting_here(rows))
+        self.going_up[rows] = going_up ^ reverse
+
+    def step_forward(self):
+        ''' Step every lift forward by running its next command,
+        same as calling Elevator.step_forward on each of them '''
+        rows = self._rows
+        levels = self.current_level
+        going_up = self.going_up
+        level_numbers = self._level_numbers[np.newaxis, :]
+        here = level_numbers == levels[:, np.newaxis]
+        above = level_numbers > levels[:, np.newaxis]
+        below = level_numbers < levels[:, np.newaxis]
+
+        open_door = self._visiting_here(rows)
+        close_door = ~open_door & self.door_open
+        moving = ~open_door & ~self.door_open
+
+        # Which way we'd travel, matching the order in visit_plan()
+        # 1. levels ahead of us in our direction
+        current_dir = np.where(going_up[:, np.newaxis],
+                               self.visit_up, self.visit_down)
+        reverse_dir = np.where(going_up[:, np.newaxis],
+                               self.visit_down, self.visit_up)
+        ahead = (current_dir & np.where(going_up[:, np.newaxis],
+                                        above, below)).any(axis=1)
+        # 2. the furthest level we'd visit on the way back
+        reverse = reverse_dir & ~here
+        has_reverse = reverse.any(axis=1)
+        reverse_level = np.where(
+            going_up, self.num_levels - 1 - reverse[:, ::-1].argmax(axis=1),
+            reverse.argmax(axis=1))
+        # 3. levels we've already passed in our direction
+        passed = (current_dir & np.where(going_up[:, np.newaxis],
+                                         below, above)).any(axis=1)
+
+        reverse_up = has_reverse & (reverse_level > levels)
+        reverse_down = has_reverse & (reverse_level < levels)
+        passed_only = ~ahead & ~has_reverse & passed
+        move_up = moving & np.where(
+            going_up, ahead | ~ahead & reverse_up,
+            ~ahead & reverse_up | passed_only)
+        move_down = moving & np.where(
+            going_up, ~ahead & reverse_down | passed_only,
+            ahead | ~ahead & reverse_down)
+
+        command = np.zeros(len(rows), dtype=np.int8)
+        command[move_up] = UP
+        command[move_down] = DOWN
+        command[open_door] = OPEN_DOOR
+        command[close_door] = CLOSE_DOOR
+        acted = command != NO_COMMAND
+
+        self.current_level += move_up
+        self.current_level -= move_down
+        opened = rows[open_door]
+        opened_levels = levels[opened]
+        self.visit_up[opened, opened_levels] &= ~going_up[opened]
+        self.visit_down[opened, opened_levels] &= going_up[opened]
+        self.door_open |= open_door
+        self.door_open &= ~close_door
+        self.current_command[acted] = command[acted]
+        # Lifts with nothing to do don't reset their direction
+        self.reset_direction(rows[acted])
@@ -0,0 +1,39 @@
+'''
+Immutable snapshots of what every lift is doing, for readers
+(dashboards, metrics, logging...) that shouldn't touch live Elevators.
+
+With publish_snapshots on, the controller builds a new FleetSnapshot
+after every tick and swaps it in with a single attribute assignment,
+so a reader that grabs controller.fleet_snapshot always gets a whole
+tick's worth of state without any locks, however long it holds on to it.
+'''
+from collections import namedtuple
+
+
+class CarState(namedtuple("CarState", "current_level door_status "
+                                      "direction status")):
+    ''' What one lift looked like, see Elevator for each field '''
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, elevator):
+        return cls(elevator.current_level, elevator.door_status,
+                   elevator.direction, elevator.status)
+
+
+class FleetSnapshot(namedtuple("FleetSnapshot", "version tick cars")):
+    '''
+    Every lift at one point in time
+
+    Attributes:
+      version (int): goes up by 1 every snapshot published, so readers
+             can tell if anything has happened since they last looked
+      tick (int): the controller's tick
+      cars (tuple): a CarState for each lift, in the controller's order
+    '''
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, version:int, tick:int, elevators):
+        return cls(version, tick,
+                   tuple(CarState.of(elevator) for elevator in elevators))
@@ -0,0 +1,141 @@
+'''
+Compact storage for the levels an Elevator has left to visit.
+
+Each direction gets one integer bitmask where bit N is set if we
+want to visit level N in that direction. eg. 0b1010 means levels 1
+and 3. Finding the highest or lowest level to visit is then just a
+bit operation instead of scanning every level.
+'''
+from collections.abc import Mapping, MutableSet
+from functools import lru_cache
+from .constants import ElevatorDirection
+
+
+def lowest_level(mask:int):
+    ''' Lowest level set in mask, mask must not be 0 '''
+    return (mask & -mask).bit_length() - 1
+
+
+def highest_level(mask:int):
+    ''' Highest level set in mask, mask must not be 0 '''
+    return mask.bit_length() - 1
+
+
+def levels_below(level_no:int):
+    ''' Mask of every level below level_no '''
+    return (1 << level_no) - 1
+
+
+class SweepTables(object):
+    '''
+    The masks a lift needs for every level of a building, worked out
+    once per building size and shared by every lift in buildings that
+    size (see sweep_tables()) so they are just looked up, not shifted
+    again on every call.
+
+    Attributes:
+      num_levels (int): levels in the building
+      bits (tuple): bits[N] is the mask of just level N
+      above (tuple): above[N] is every level above N
+      below (tuple): below[N] is every level below N
+      at_or_above (tuple): at_or_above[N] is level N and every level above
+      at_or_below (tuple): at_or_below[N] is level N and every level below
+    '''
+    __slots__ = ("num_levels", "bits", "above", "below", "at_or_above",
+                 "at_or_below")
+
+    def __init__(self, num_levels:int):
+        super().__init__()
+        every_level = (1 << num_levels) - 1
+        self.num_levels = num_levels
+        self.bits = tuple(1 << level_no for level_no in range(num_levels))
+        self.below = tuple(levels_below(level_no)
+                           for level_no in range(num_levels))
+        self.at_or_below = tuple(levels_below(level_no + 1)
+                                 for level_no in range(num_levels))
+        self.above = tuple(every_level & ~at_or_below
+                           for at_or_below in self.at_or_below)
+        self.at_or_above = tuple(every_level & ~below
+                                 for below in self.below)
+
+    def __reduce__(self):
+        # Still shared after being sent to another process
+        return sweep_tables, (self.num_levels,)
+
+
+@lru_cache(maxsize=None)
+def sweep_tables(num_levels:int):
+    ''' The shared SweepTables for buildings with num_levels levels '''
+    return SweepTables(num_levels)
+
+
+def iter_levels(mask:int):
+    ''' All levels set in mask from lowest to highest '''
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def iter_levels_reversed(mask:int):
+    ''' All levels set in mask from highest to lowest '''
+    while mask:
+        level_no = mask.bit_length() - 1
+        yield level_no
+        mask ^= 1 << level_no
+
+
+class LevelDirections(MutableSet):
+    '''
+    The directions we want to visit one level in eg. {UP, DOWN}
+    Works like a set but reads and writes the elevators bitmasks
+    '''
+
+    def __init__(self, elevator, level_no:int):
+        self.elevator = elevator
+        self.level_no = level_no
+
+    def __contains__(self, direction):
+        return self.elevator.is_visiting(self.level_no, direction)
+
+    def __iter__(self):
+        for direction in ElevatorDirection:
+            if self.elevator.is_visiting(self.level_no, direction):
+                yield direction
+
+    def __len__(self):
+        return sum(1 for direction in self)
+
+    def __repr__(self):
+        return repr(set(self))
+
+    def add(self, direction):
+        self.elevator.set_visiting(self.level_no, direction, True)
+
+    def discard(self, direction):
+        self.elevator.set_visiting(self.level_no, direction, False)
+
+
+class LevelsToVisit(Mapping):
+    '''
+    Read / write view of an elevators bitmasks that looks like the old
+    {level_no: {DIRECTION_UP, DIRECTION_DOWN}} dictionary.
+    Like a defaultdict any level can be looked up, only levels we
+    are actually visiting are iterated over.
+    '''
+
+    def __init__(self, elevator):
+        self.elevator = elevator
+
+    def __getitem__(self, level_no:int):
+        return LevelDirections(self.elevator, level_no)
+
+    def __iter__(self):
+        return iter_levels(self.elevator.visit_mask())
+
+    def __len__(self):
+        return bin(self.elevator.visit_mask()).count("1")
+
+    def __repr__(self):
+        return repr({level_no: set(directions)
+                     for level_no, directions in self.items()})
@@ -0,0 +1,188 @@
+'''
+Passenger wait time, travel (ride) time and throughput metrics.
+
+Attach a MetricsCollector to a MultipleElevatorController and every
+call / selection made through the controller is timestamped and
+matched with the tick a lift opened its doors for it.
+When no collector is attached nothing is recorded at all.
+'''
+from collections import Counter, defaultdict, deque
+
+
+class StreamingHistogram(object):
+    '''
+    Histogram of whole numbers (eg. ticks) built up 1 value at a time.
+    Only keeps a count for each distinct value so memory stays small
+    however many values are added.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0
+
+    def add(self, value:int, times:int=1):
+        self.counts[value] += times
+        self.count += times
+        self.total += value * times
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def max(self):
+        return max(self.counts) if self.counts else None
+
+    def percentile(self, percent:float):
+        ''' Smallest value that percent % of values are <= to,
+        None if there are no values '''
+        if not self.count:
+            return None
+        needed = self.count * percent / 100
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= needed:
+                return value
+        return value
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class MetricsCollector(object):
+    '''
+    Matches requests with the door opening that serves them.
+
+    Attributes:
+      controller (MultipleElevatorController): what we are attached to
+      wait (StreamingHistogram): ticks from calling a lift to it opening
+             its doors for us
+      travel (StreamingHistogram): ticks from selecting a level inside
+             the lift to arriving there, ie. ride time
+      trips (StreamingHistogram): requests served in each tick
+      pending (dict): {(car, level_no, direction): deque of requests}
+      on_served (callable): optional, given every request dict once it
+             has been served
+    '''
+
+    def __init__(self, on_served=None):
+        super().__init__()
+        self.controller = None
+        self.wait = StreamingHistogram()
+        self.travel = StreamingHistogram()
+        self.trips = StreamingHistogram()
+        self.pending = defaultdict(deque)
+        self.on_served = on_served
+        self._served_this_tick = 0
+        self._car_index = {}
+
+    def attach(self, controller):
+        ''' Start recording everything controller does '''
+        self.controller = controller
+        controller.metrics = self
+        self._car_index = {id(e): i for i, e in
+                           enumerate(controller.elevators)}
+        for elevator in controller.elevators:
+            elevator.observer = self
+
+    def detach(self):
+        ''' Stop recording, back to no overhead at all '''
+        self.controller.metrics = None
+        for elevator in self.controller.elevators:
+            elevator.observer = None
+
+    def requested(self, elevator, level_no:int, direction, kind:str,
+                  request:dict=None):
+        '''
+        Called by the controller when a lift has been called
+        (kind = "call") or a level selected inside it (kind = "select").
+        request is any extra info to keep with it eg. an id
+        '''
+        if request is None:
+            request = {}
+        car = self._car_index[id(elevator)]
+        request.update(type=kind, tick=self.controller.tick, car=car,
+                       level=level_no, direction=direction.name)
+        if elevator.is_visiting(level_no, direction):
+            self.pending[car, level_no, direction].append(request)
+        else:
+            # The lift was already here going our way
+            self._serve(request)
+
+    def passed_on(self, elevator, new_elevator, level_no:int, direction,
+                  num_requests:int=None):
+        ''' Called by the controller when a full lift hands its hall call
+        on level_no to new_elevator, the requests keep waiting for it.
+        Only the last num_requests to call if some of them still get in,
+        all of them if None '''
+        key = (self._car_index[id(elevator)], level_no, direction)
+        if num_requests is None:
+            requests = self.pending.pop(key, None)
+        else:
+            waiting = self.pending.get(key)
+            if not waiting or not num_requests:
+                return
+            requests = [waiting.pop()
+                        for i in range(min(num_requests, len(waiting)))]
+            requests.reverse()
+            if not waiting:
+                del self.pending[key]
+        if not requests:
+            return
+        car = self._car_index[id(new_elevator)]
+        for request in requests:
+            request["car"] = car
+        if new_elevator.is_visiting(level_no, direction):
+            self.pending[car, level_no, direction].extend(requests)
+        else:
+            # It was already here going their way
+            for request in requests:
+                self._serve(request)
+
+    def door_opened(self, elevator, level_no:int, direction):
+        ''' Called by the Elevator, serve everyone waiting for this '''
+        requests = self.pending.pop(
+            (self._car_index[id(elevator)], level_no, direction), None)
+        if requests:
+            for request in requests:
+                self._serve(request)
+
+    def ticked(self, num_ticks:int=1):
+        ''' Called by the controller after every step forward, or
+        after jumping num_ticks where nobody could have been served '''
+        self.trips.add(self._served_this_tick)
+        if num_ticks > 1:
+            self.trips.add(0, num_ticks - 1)
+        self._served_this_tick = 0
+
+    def _serve(self, request:dict):
+        waited = self.controller.tick - request["tick"]
+        request["served_tick"] = self.controller.tick
+        if request["type"] == "call":
+            request["wait"] = waited
+            self.wait.add(waited)
+        else:
+            request["travel"] = waited
+            self.travel.add(waited)
+        self._served_this_tick += 1
+        if self.on_served is not None:
+            self.on_served(request)
+
+    def summary(self):
+        return {
+            "wait": self.wait.summary(),
+            "travel": self.travel.summary(),
+            "trips_per_tick": self.trips.summary(),
+            "waiting": sum(len(requests)
+                           for requests in self.pending.values()),
+        }
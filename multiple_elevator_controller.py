@@ -1,6 +1,15 @@
 ''' Controlls and handles MULTIPLE elevators '''
-from constants import ElevatorDirection
-from copy import deepcopy
+import heapq
+from collections import Counter
+from copy import copy
+from .constants import ElevatorCommand, ElevatorDirection
+from .destination_dispatch import total_journey_time, travel_direction
+from .elevator import Elevator
+from .exceptions import ElevatorOutOfBoundsException
+from .fleet_snapshot import FleetSnapshot
+from .parallel_scoring import pack, score_elevators, simulate_scenario
+from .sweep_profile import (SweepProfile, bound_state, steps_ahead,
+                            steps_lower_bounds)
 
 
 class MultipleElevatorController(object):
@@ -8,31 +17,629 @@ class MultipleElevatorController(object):
     Controlls MULTIPLE elevators and summons the best one
     for the people in the buildings based off a simulation of which
     elevator will get there in the least steps
+
+    Attributes:
+      elevators (list): the Elevators we control
+      executor (concurrent.futures.Executor): optional eg. a
+             ProcessPoolExecutor to score lifts and run what if
+             simulations in parallel. None does everything in this process
+      tick (int): how many times we have stepped forward
+      metrics (MetricsCollector): optional, records every request
+             see metrics.py. None records nothing
+      recorder (TrajectoryRecorder): optional, logs every lift after
+             every tick see trajectory_log.py. None logs nothing
+      waiting (dict): for destination dispatch, {car index:
+             {(level_no, going_up): [(destination, request), ...]}}
+             people each lift still has to pick up
+      riding (dict): {car index: Counter of (level_no, going_up)} where
+             destination dispatch people in each lift get out
+      hall_callers (Counter): {(car index, level_no, going_up): people}
+             who called a lift that has a capacity with call_elevator()
+             and are waiting for it
+      getting_out (Counter): {(car index, level_no, going_up): people}
+             who selected level_no with select_level() in a lift that has
+             a capacity
+      publish_snapshots (bool): whether to publish a fleet_snapshot
+             after every tick. Off by default, building them is a big
+             part of a quiet tick
+      fleet_snapshot (FleetSnapshot): every lift as of the last tick,
+             replaced (never changed) after every tick so other threads
+             can read it safely, see fleet_snapshot.py. None until
+             published
+      eta_cache (EtaCache): optional, remembers ETAs for lifts in
+             states we've already scored, see eta_cache.py.
+             None works every ETA out again
+
+    Lifts with a capacity (see Elevator) are skipped when we choose a
+    lift unless they all are full. People are counted in and out of
+    them (their load) when they open their doors, 1 in for every hall
+    call and 1 out for every level selected (or destination dispatch
+    person). Anyone who won't fit is handed to a lift with room before
+    the doors open, and once a lift is full it goes straight past its
+    hall calls, which are handed on too.
     '''
 
-    def __init__(self, elevators=None):
+    def __init__(self, elevators=None, executor=None,
+                 publish_snapshots:bool=False):
         super().__init__()
         if elevators is None:
             elevators = []
         self.elevators = elevators
+        self.executor = executor
+        self.tick = 0
+        self.metrics = None
+        self.recorder = None
+        self.waiting = {}
+        self.riding = {}
+        self.hall_callers = Counter()
+        self.getting_out = Counter()
+        self.publish_snapshots = publish_snapshots
+        self.fleet_snapshot = None
+        self.eta_cache = None
+        if publish_snapshots:
+            self.publish()
+
+    def publish(self):
+        ''' Replace fleet_snapshot with how every lift is right now,
+        called after every tick if publish_snapshots is on '''
+        version = (0 if self.fleet_snapshot is None
+                   else self.fleet_snapshot.version + 1)
+        # A single assignment, readers see the old or new one never half
+        self.fleet_snapshot = FleetSnapshot.of(version, self.tick,
+                                               self.elevators)
+
+    def snapshot(self):
+        ''' Snapshot every elevator so we can try out what if and
+        then go back with restore() '''
+        return tuple(elevator.snapshot() for elevator in self.elevators)
+
+    def restore(self, state:tuple):
+        ''' Go back to a state from snapshot() '''
+        for elevator, elevator_state in zip(self.elevators, state):
+            elevator.restore(elevator_state)
 
     def step_forward(self):
-        for elevator in self.elevators:
-            elevator.step_forward()
+        for index, elevator in enumerate(self.elevators):
+            if (elevator.capacity is not None or index in self.waiting
+                    or index in self.riding):
+                # Someone's destination may need selecting or people
+                # counting in and out once we open
+                direction = elevator.direction
+                command = elevator.next_command()
+                if (command == ElevatorCommand.OPEN_DOOR
+                        and elevator.capacity is not None):
+                    self.leave_behind(index, elevator.current_level,
+                                      direction)
+                elevator.step_forward()
+                if command == ElevatorCommand.OPEN_DOOR:
+                    self.doors_opened(index, elevator.current_level,
+                                      direction)
+            else:
+                elevator.step_forward()
+            if (elevator.is_full and
+                    elevator.current_command == ElevatorCommand.CLOSE_DOOR):
+                self.bypass_hall_calls(index)
+        self.tick += 1
+        if self.metrics is not None:
+            self.metrics.ticked()
+        if self.recorder is not None:
+            self.recorder.record(self.tick, self.elevators)
+        if self.publish_snapshots:
+            self.publish()
+
+    def advance(self, num_steps:int):
+        '''
+        Same as step_forward() num_steps times, but instead of going
+        1 step at a time jump straight to the next time any lift does
+        something other than travel (or has nothing to do at all).
+        '''
+        end = self.tick + num_steps
+        while self.tick < end:
+            if self.recorder is not None:
+                # The recorder needs every tick
+                self.step_forward()
+                continue
+            next_events = [elevator.steps_until_event()
+                           for elevator in self.elevators]
+            busy = [steps for steps in next_events if steps is not None]
+            jump = min(busy + [end - self.tick])
+            if jump == 1:
+                self.step_forward()
+                continue
+            for elevator, steps in zip(self.elevators, next_events):
+                if steps is not None:
+                    elevator.travel(jump)
+            self.tick += jump
+            if self.metrics is not None:
+                self.metrics.ticked(jump)
+            if self.publish_snapshots:
+                self.publish()
+
+    def advance_to(self, tick:int):
+        ''' advance() until our tick is tick '''
+        if tick > self.tick:
+            self.advance(tick - self.tick)
 
-    def call_elevator(self, from_level:int, direction:ElevatorDirection):
+    def select_level(self, index:int, level_no:int, direction=None,
+                     request:dict=None):
+        ''' Someone inside elevator number index selects a level.
+        request is any extra info for our metrics to keep with it '''
+        elevator = self.elevators[index]
+        direction = elevator.select_level(level_no, direction)
+        if self.metrics is not None:
+            self.metrics.requested(elevator, level_no, direction, "select",
+                                   request)
+        if elevator.capacity is not None:
+            if elevator.is_visiting(level_no, direction):
+                self.getting_out[index, level_no,
+                                 direction == ElevatorDirection.UP] += 1
+            else:
+                # Already here, straight out
+                elevator.load = max(elevator.load - 1, 0)
+        return elevator
+
+    def call_elevator(self, from_level:int, direction:ElevatorDirection,
+                      request:dict=None):
         ''' Find the closest elevator either ALREADY on its way
         or not... based off how many STEPS it will take to REACH this level
         It can ONLY STOP and OPEN its doors for us if it is going in the
-        SAME direction '''
-        fastest_elevator = min(
-            self.elevators,
-            key=lambda e: MultipleElevatorController.steps_to_get_to_level(
-                                        e, from_level, direction)
-        )
+        SAME direction. request is any extra info for our metrics
+        to keep with this call '''
+        if self.executor is not None:
+            room = self.with_room()
+            self.check_timing(room)
+            [scores] = score_elevators(self.executor, self.elevators,
+                                       [(from_level, direction)])
+            # min() keeps the first of equal lifts
+            fastest_elevator = self.elevators[
+                min(room, key=scores.__getitem__)]
+        else:
+            fastest_elevator = self.fastest_elevator(from_level, direction)
         fastest_elevator.call_elevator(from_level, direction)
+        if self.metrics is not None:
+            self.metrics.requested(fastest_elevator, from_level, direction,
+                                   "call", request)
+        if fastest_elevator.capacity is not None:
+            self.count_in(self.elevators.index(fastest_elevator),
+                          from_level, direction)
         return fastest_elevator
 
+    def count_in(self, index:int, level_no:int,
+                 direction:ElevatorDirection, num_people:int=1):
+        ''' num_people called lift number index, which has a capacity,
+        to level_no going in direction. They get in when it opens its
+        doors there '''
+        elevator = self.elevators[index]
+        if elevator.is_visiting(level_no, direction):
+            self.hall_callers[index, level_no,
+                              direction == ElevatorDirection.UP] += num_people
+        else:
+            # Already here going their way, straight in
+            elevator.load += num_people
+
+    def call_destination(self, origin:int, destination:int,
+                         request:dict=None, nearest:bool=False):
+        '''
+        Destination dispatch, someone on origin wants to go to destination.
+        Choose the lift that adds the least to the total journey time
+        (waiting + riding) of everyone, them and the people each lift is
+        already looking after, so people going to the same stops end up
+        together. Their destination is selected for them when the lift
+        opens its doors on origin.
+        nearest=True just calls the closest lift like call_elevator()
+        request is any extra info for our metrics to keep with them
+        Returns: the elevator
+        '''
+        if origin == destination:
+            raise ElevatorOutOfBoundsException("Already there")
+        direction = travel_direction(origin, destination)
+        if nearest:
+            index = self.elevators.index(
+                self.fastest_elevator(origin, direction))
+        else:
+            room = self.with_room()
+            self.check_timing(room)
+            costs = [self.journey_cost(i, origin, destination)
+                     if i in room else float("inf")
+                     for i in range(len(self.elevators))]
+            index = costs.index(min(costs))
+        return self.assign_destination(index, origin, destination, request)
+
+    def assign_destination(self, index:int, origin:int, destination:int,
+                           request:dict=None):
+        ''' Send lift number index for someone on origin going to
+        destination, eg. when some other policy has chosen the lift.
+        See call_destination() '''
+        if origin == destination:
+            raise ElevatorOutOfBoundsException("Already there")
+        direction = travel_direction(origin, destination)
+        elevator = self.elevators[index]
+        elevator.call_elevator(origin, direction)
+        # metrics fills in request, keep what we were given for when
+        # their destination is selected
+        extra = None if request is None else dict(request)
+        if self.metrics is not None:
+            self.metrics.requested(elevator, origin, direction, "call",
+                                   request)
+        if elevator.is_visiting(origin, direction):
+            self.waiting.setdefault(index, {}).setdefault(
+                (origin, direction == ElevatorDirection.UP), []).append(
+                    (destination, extra))
+        else:
+            # It's already here going our way, get straight in
+            self.board(index, destination, extra)
+        return elevator
+
+    def journey_cost(self, index:int, origin:int, destination:int):
+        ''' How many steps (or how long, see total_journey_time) giving
+        someone going from origin to destination to lift number index adds
+        to everyones journeys, worked out on a what if copy of the lift '''
+        elevator = self.elevators[index]
+        waiting = self.waiting.get(index, {})
+        riding = self.riding.get(index, Counter())
+        before = total_journey_time(elevator, waiting, riding)
+        direction = travel_direction(origin, destination)
+        state = elevator.snapshot()
+        elevator.call_elevator(origin, direction)
+        if elevator.is_visiting(origin, direction):
+            stop = (origin, direction == ElevatorDirection.UP)
+            waiting = dict(waiting)
+            waiting[stop] = waiting.get(stop, []) + [(destination, None)]
+        else:
+            riding = riding + Counter(
+                [(destination,
+                  elevator.select_level(destination) == ElevatorDirection.UP)])
+        after = total_journey_time(elevator, waiting, riding)
+        elevator.restore(state)
+        if before is None or after is None:
+            return float("inf")
+        return after - before
+
+    def board(self, index:int, destination:int, request:dict=None):
+        ''' Someone getting into lift number index, select their
+        destination for them '''
+        elevator = self.elevators[index]
+        direction = elevator.select_level(destination)
+        if self.metrics is not None:
+            self.metrics.requested(elevator, destination, direction,
+                                   "select", request)
+        self.riding.setdefault(index, Counter())[
+            destination, direction == ElevatorDirection.UP] += 1
+        elevator.load += 1
+
+    def doors_opened(self, index:int, level_no:int,
+                     direction:ElevatorDirection):
+        ''' Lift number index just opened its doors on level_no going in
+        direction, let people out and get waiting people in '''
+        elevator = self.elevators[index]
+        stop = (level_no, direction == ElevatorDirection.UP)
+        key = (index,) + stop
+        if elevator.capacity is not None:
+            elevator.load = max(
+                elevator.load - self.getting_out.pop(key, 0), 0)
+        riding = self.riding.get(index)
+        if riding and stop in riding:
+            elevator.load = max(elevator.load - riding.pop(stop), 0)
+            if not riding:
+                del self.riding[index]
+        if elevator.capacity is not None:
+            # Anyone who wouldn't fit was already left behind
+            elevator.load += self.hall_callers.pop(key, 0)
+        waiting = self.waiting.get(index)
+        if waiting and stop in waiting:
+            boarding = waiting.pop(stop)
+            if not waiting:
+                del self.waiting[index]
+            for destination, request in boarding:
+                self.board(index, destination, request)
+
+    def leave_behind(self, index:int, level_no:int,
+                     direction:ElevatorDirection):
+        ''' Lift number index, which has a capacity, is about to open its
+        doors on level_no going in direction. Give anyone waiting there
+        who won't fit to a lift with room, destination dispatch people
+        get in first '''
+        others = self.others_with_room(index)
+        if not others:
+            # Every other lift is full too, squeeze in
+            return
+        elevator = self.elevators[index]
+        stop = (level_no, direction == ElevatorDirection.UP)
+        key = (index,) + stop
+        getting_out = (self.getting_out[key] +
+                       self.riding.get(index, Counter())[stop])
+        room = max(elevator.capacity - max(elevator.load - getting_out, 0),
+                   0)
+        waiting = self.waiting.get(index, {})
+        people = waiting.get(stop, [])
+        callers = self.hall_callers[key]
+        if len(people) + callers <= room:
+            return
+        people, left_behind = people[:room], people[room:]
+        callers_left = callers - max(room - len(people), 0)
+        if people:
+            waiting[stop] = people
+        elif stop in waiting:
+            del waiting[stop]
+            if not waiting:
+                del self.waiting[index]
+        if callers_left:
+            self.hall_callers[key] -= callers_left
+            if not self.hall_callers[key]:
+                del self.hall_callers[key]
+        self.pass_on_call(index, level_no, direction, others, left_behind,
+                          callers_left)
+
+    def others_with_room(self, index:int):
+        ''' Indexes of every lift that isn't full apart from
+        lift number index '''
+        return [i for i, elevator in enumerate(self.elevators)
+                if i != index and not elevator.is_full]
+
+    def with_room(self):
+        ''' Indexes of the lifts that aren't full, or of every lift if
+        they all are (one of them still has to come) '''
+        room = [i for i, elevator in enumerate(self.elevators)
+                if not elevator.is_full]
+        return room or list(range(len(self.elevators)))
+
+    def bypass_hall_calls(self, index:int):
+        ''' Lift number index is full so nobody else can get in, give
+        its hall calls to the lifts with room and go straight past '''
+        elevator = self.elevators[index]
+        others = self.others_with_room(index)
+        if not others or not elevator.hall_calls():
+            # Nobody else could take them, we'll have to
+            return
+        waiting = self.waiting.get(index, {})
+        for level_no, direction in elevator.drop_hall_calls():
+            people = waiting.pop((level_no,
+                                  direction == ElevatorDirection.UP), [])
+            self.pass_on_call(index, level_no, direction, others, people)
+        if index in self.waiting and not waiting:
+            del self.waiting[index]
+
+    def pass_on_call(self, index:int, level_no:int,
+                     direction:ElevatorDirection, indexes:list,
+                     people:list=(), num_callers:int=None):
+        ''' Give lift number index's hall call on level_no going in
+        direction to the fastest lift of indexes, with the destination
+        dispatch people waiting for it [(destination, request), ...]
+        and num_callers of the people who called it with call_elevator(),
+        None for all of them (and every request our metrics has for it)
+        '''
+        elevator = self.fastest_elevator(level_no, direction, indexes)
+        new_index = self.elevators.index(elevator)
+        elevator.call_elevator(level_no, direction)
+        key = (index, level_no, direction == ElevatorDirection.UP)
+        if num_callers is None:
+            num_requests = None
+            num_callers = self.hall_callers.pop(key, 0)
+        else:
+            num_requests = len(people) + num_callers
+        if num_callers and elevator.capacity is not None:
+            self.count_in(new_index, level_no, direction, num_callers)
+        if self.metrics is not None:
+            self.metrics.passed_on(self.elevators[index], elevator,
+                                   level_no, direction, num_requests)
+        if elevator.is_visiting(level_no, direction):
+            if people:
+                self.waiting.setdefault(new_index, {}).setdefault(
+                    (level_no, direction == ElevatorDirection.UP),
+                    []).extend(people)
+        else:
+            # It's already here going our way, get straight in
+            for destination, request in people:
+                self.board(new_index, destination, request)
+
+    def fastest_elevator(self, from_level:int,
+                         direction:ElevatorDirection, indexes:list=None):
+        '''
+        The lift that would get to from_level going in direction the
+        soonest, the first one if some are equal, just like min().
+        Soonest is in steps, or timed by a lift's timing model if it has
+        one (see Elevator.eta).
+        Only the lifts at indexes are looked at, by default every lift
+        that isn't full (see with_room).
+        Lifts are scored in order of a cheap lower bound on their ETA
+        (see Elevator.eta_lower_bound) and we stop as soon as none of
+        the rest could possibly beat the best so far. ETAs come from
+        our eta_cache if we have one.
+        '''
+        if indexes is None:
+            indexes = self.with_room()
+        self.check_timing(indexes)
+        candidates = [(self.elevators[i].eta_lower_bound(from_level,
+                                                         direction), i)
+                      for i in indexes]
+        if not candidates:
+            raise ValueError("No elevators to call")
+        heapq.heapify(candidates)
+        eta_of = self.eta_function()
+        best = None
+        # (eta, index) so a lift with an equal eta only wins
+        # if it comes first
+        while candidates and (best is None or candidates[0] < best):
+            _, index = heapq.heappop(candidates)
+            eta = eta_of(self.elevators[index], from_level, direction)
+            if best is None or (eta, index) < best:
+                best = (eta, index)
+        return self.elevators[best[1]]
+
+    def check_timing(self, indexes:list):
+        ''' Lifts with a timing model have ETAs in seconds (or whatever
+        it uses) and the rest in steps, which can't be compared, so
+        raise a ValueError if the lifts at indexes are a mix '''
+        timings = [self.elevators[i].timing for i in indexes]
+        if 0 < timings.count(None) < len(timings):
+            raise ValueError("Some lifts have a timing model and some "
+                             "don't, give them all one or none")
+
+    def eta_function(self):
+        ''' Elevator.eta as a function of (elevator, from_level,
+        direction), through our eta_cache if we have one '''
+        if self.eta_cache is None:
+            return Elevator.eta
+        return self.eta_cache.eta
+
+    def call_elevators(self, calls, joint:bool=False):
+        '''
+        Call elevators for a whole batch of (from_level, direction) at once
+        eg. after a fire drill when everyone is calling lifts.
+        The same call twice only summons one lift.
+
+        By default calls are given out in order, each to the lift that
+        would get there soonest (the first lift if some are equal), so
+        we end up exactly where calling call_elevator() for each one
+        would. Only faster, what fastest_elevator() needs to know about
+        each lift is worked out once for the whole batch (see
+        sweep_profile.bound_state) and only again for the lift that was
+        just given a call. Calls ahead of a lift going their way don't
+        need it walked at all (see sweep_profile.steps_ahead). Lifts
+        with a timing model are just given calls one at a time with
+        fastest_elevator().
+
+        joint=True is for a better assignment, not a faster one. Each
+        call goes to the lift that adds the least to the total ETA of
+        the whole batch, its own ETA plus how much later that lift now
+        gets to the calls it was already given in this batch, instead
+        of just the soonest for the caller. Working out how much later
+        means simulating the lift with the call, a lot more work than
+        giving calls out one at a time (see benchmark.bench_batch).
+
+        Returns: {(from_level, direction): elevator}
+        '''
+        calls = [(from_level, ElevatorDirection(direction))
+                 for from_level, direction in calls]
+        pending = list(dict.fromkeys(calls))
+        # Full lifts aren't given any
+        room = self.with_room()
+        self.check_timing(room)
+        if joint:
+            assigned = self.assign_jointly(pending, room)
+        else:
+            assigned = self.assign_greedily(pending, room)
+        if self.metrics is not None:
+            # Everyone who called counts, even if someone else already had
+            for from_level, direction in calls:
+                self.metrics.requested(assigned[from_level, direction],
+                                       from_level, direction, "call")
+        for from_level, direction in calls:
+            elevator = assigned[from_level, direction]
+            if elevator.capacity is not None:
+                self.count_in(self.elevators.index(elevator), from_level,
+                              direction)
+        return assigned
+
+    def assign_greedily(self, pending:list, indexes:list):
+        ''' call_elevators() giving out calls in order, only to lifts at
+        indexes '''
+        assigned = {}
+        if not indexes or self.elevators[indexes[0]].timing is not None:
+            for call in pending:
+                elevator = self.fastest_elevator(*call, indexes=indexes)
+                elevator.call_elevator(*call)
+                assigned[call] = elevator
+            return assigned
+
+        def state(elevator):
+            return (elevator.current_level, elevator.direction,
+                    elevator.door_status,
+                    elevator.visit_mask(ElevatorDirection.UP),
+                    elevator.visit_mask(ElevatorDirection.DOWN))
+
+        elevators = [self.elevators[index] for index in indexes]
+        states = [bound_state(elevator) for elevator in elevators]
+        for call in pending:
+            from_level, direction = call
+            going_up = direction == ElevatorDirection.UP
+            bounds = steps_lower_bounds(states, from_level, going_up)
+            best = None
+            # Like fastest_elevator(), in (bound, index) order until
+            # none of the rest could beat the best so far
+            for i in sorted(range(len(elevators)), key=bounds.__getitem__):
+                if best is not None and (bounds[i], i) >= best:
+                    break
+                num_steps = steps_ahead(states[i], from_level, going_up)
+                if num_steps is None:
+                    num_steps = elevators[i].steps_to_reach(from_level,
+                                                            direction)
+                if best is None or (num_steps, i) < best:
+                    best = (num_steps, i)
+            elevator = elevators[best[1]]
+            before = state(elevator)
+            elevator.call_elevator(from_level, direction)
+            assigned[call] = elevator
+            if state(elevator) != before:
+                # The only lift we have to look at again
+                states[best[1]] = bound_state(elevator)
+        return assigned
+
+    def assign_jointly(self, pending:list, indexes:list):
+        ''' call_elevators() with joint=True, only to lifts at
+        indexes '''
+        eta_of = self.eta_function()
+        # Calls given to each lift in this batch, and their total ETA
+        given = {index: [] for index in indexes}
+        totals = dict.fromkeys(indexes, 0)
+        assigned = {}
+
+        def total_with(index, call):
+            ''' Total ETA of everything lift number index has been
+            given if it was given call too '''
+            elevator = self.elevators[index]
+            if not given[index]:
+                return eta_of(elevator, *call)
+            trial = copy(elevator)
+            trial.call_elevator(*call)
+            if trial.timing is not None:
+                return sum(eta_of(trial, *other)
+                           for other in given[index] + [call])
+            # Steps are the eta, and 1 walk scores all of them
+            profile = SweepProfile(trial)
+            return sum(profile.steps_to_reach(*other)
+                       for other in given[index] + [call])
+
+        for call in pending:
+            # Another stop never gets a lift anywhere sooner so the cost
+            # is at least the caller's ETA, and we can stop like
+            # fastest_elevator() once no lift could beat the best so far
+            candidates = sorted((self.elevators[index].eta_lower_bound(
+                                    *call), index) for index in indexes)
+            if not candidates:
+                raise ValueError("No elevators to call")
+            best = None
+            for bound, index in candidates:
+                if best is not None and (bound, index) >= best[:2]:
+                    break
+                total = total_with(index, call)
+                if best is None or (total - totals[index], index) < best[:2]:
+                    best = (total - totals[index], index, total)
+            _, index, totals[index] = best
+            self.elevators[index].call_elevator(*call)
+            given[index].append(call)
+            assigned[call] = self.elevators[index]
+        return assigned
+
+    def simulate_scenarios(self, scenarios:list, num_steps:int):
+        '''
+        What if simulations starting from our current state without
+        changing it. Each scenario is a list of (step, from_level, direction)
+        calls, see parallel_scoring.simulate_scenario.
+        Runs on our executor if we have one.
+
+        Returns: [(index of the lift given each call,
+                   packed lifts at the end) for each scenario]
+        '''
+        states = [pack(e) for e in self.elevators]
+        if self.executor is None:
+            return [simulate_scenario(states, scenario, num_steps)
+                    for scenario in scenarios]
+        futures = [self.executor.submit(simulate_scenario, states,
+                                        scenario, num_steps)
+                   for scenario in scenarios]
+        return [future.result() for future in futures]
+
     @staticmethod
     def steps_to_get_to_level(elevator, from_level:int,
                               direction:ElevatorDirection):
@@ -41,17 +648,8 @@ class MultipleElevatorController(object):
         when summoning a lift to be able to compare lifts from a summoning
         perspective and know which one will be faster for us.
 
-        Simulate each lift and see how long it would take in steps
-        which include open / close door because that takes time too
+        This is worked out straight from the lifts state, see
+        Elevator.steps_to_reach, which counts open / close door as
+        steps too because that takes time too
         '''
-        num_steps = 0
-        elevator_copy = deepcopy(elevator)
-        elevator_copy.call_elevator(from_level, direction)
-
-        while True:
-            if (elevator_copy.direction == direction and
-                    elevator_copy.current_level == from_level):
-                # we made it to our level! in simulated (num_steps)
-                return num_steps
-            num_steps += 1
-            elevator_copy.step_forward()
+        return elevator.steps_to_reach(from_level, direction)
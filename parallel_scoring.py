@@ -0,0 +1,110 @@
+'''
+Score lifts and run what if simulations in other processes.
+Lifts are sent as small tuples of ints (see pack), along with their
+timing model, so they are cheap to pickle, and results always come
+back in the same order so they are the same as working everything out
+in this process.
+'''
+from .constants import ElevatorDirection, ElevatorDoorStatus
+from .elevator import Elevator
+
+
+def pack(elevator):
+    '''
+    A lift as a small picklable tuple
+    (num_levels, current_level, up_mask, down_mask, door_open, going_up,
+     hall_up_mask, hall_down_mask, capacity, load, timing)
+    '''
+    return (elevator.num_levels, elevator.current_level,
+            elevator.visit_mask(ElevatorDirection.UP),
+            elevator.visit_mask(ElevatorDirection.DOWN),
+            elevator.door_status == ElevatorDoorStatus.OPEN,
+            elevator.is_going_up, elevator._hall_up_mask,
+            elevator._hall_down_mask, elevator.capacity, elevator.load,
+            elevator.timing)
+
+
+def unpack(state:tuple):
+    ''' Build an Elevator back from pack() '''
+    (num_levels, current_level, up_mask, down_mask, door_open, going_up,
+     hall_up_mask, hall_down_mask, capacity, load, timing) = state
+    elevator = Elevator(
+        list(range(num_levels)), current_level=current_level,
+        door_status=(ElevatorDoorStatus.OPEN if door_open
+                     else ElevatorDoorStatus.CLOSED),
+        direction=(ElevatorDirection.UP if going_up
+                   else ElevatorDirection.DOWN),
+        capacity=capacity)
+    elevator.timing = timing
+    elevator.restore((current_level, up_mask, down_mask,
+                      elevator.door_status, elevator.direction, None, None,
+                      hall_up_mask, hall_down_mask, load))
+    return elevator
+
+
+def score_chunk(states:list, calls:list):
+    '''
+    eta (see Elevator.eta) for every packed lift in states, for every
+    (from_level, direction) in calls
+    Returns: [[eta for each lift] for each call]
+    '''
+    elevators = [unpack(state) for state in states]
+    return [[elevator.eta(from_level, ElevatorDirection(direction))
+             for elevator in elevators]
+            for from_level, direction in calls]
+
+
+def chunks(items:list, num_chunks:int):
+    ''' Split items into num_chunks pieces keeping their order '''
+    size, extra = divmod(len(items), num_chunks)
+    start = 0
+    for i in range(num_chunks):
+        end = start + size + (i < extra)
+        if end > start:
+            yield items[start:end]
+        start = end
+
+
+def score_elevators(executor, elevators:list, calls:list,
+                    num_chunks:int=None):
+    '''
+    Same as score_chunk for Elevators, spread over the executor.
+    Returns: [[eta for each lift] for each call]
+    '''
+    if num_chunks is None:
+        num_chunks = getattr(executor, "_max_workers", 1)
+    calls = [(from_level, int(direction)) for from_level, direction in calls]
+    futures = [executor.submit(score_chunk, chunk, calls)
+               for chunk in chunks([pack(e) for e in elevators], num_chunks)]
+    scores = [[] for call in calls]
+    # Always put the chunks back together in order
+    for future in futures:
+        for call_scores, chunk_scores in zip(scores, future.result()):
+            call_scores.extend(chunk_scores)
+    return scores
+
+
+def simulate_scenario(states:list, scenario:list, num_steps:int):
+    '''
+    Run a what if simulation of a whole controller starting from
+    packed lift states. scenario is a list of
+    (step, from_level, direction) calls made at that step.
+
+    Returns: (index of the lift given each call, packed lifts at the end)
+    '''
+    # Imported here to avoid a circular import with the controller
+    from .multiple_elevator_controller import MultipleElevatorController
+    controller = MultipleElevatorController(
+        [unpack(state) for state in states])
+    calls = sorted(scenario, key=lambda call: call[0])
+    chosen = []
+    next_call = 0
+    for step in range(num_steps):
+        while next_call < len(calls) and calls[next_call][0] <= step:
+            _, from_level, direction = calls[next_call]
+            elevator = controller.call_elevator(
+                from_level, ElevatorDirection(direction))
+            chosen.append(controller.elevators.index(elevator))
+            next_call += 1
+        controller.step_forward()
+    return chosen, [pack(e) for e in controller.elevators]
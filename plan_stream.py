@@ -0,0 +1,247 @@
+'''
+Streams a lift's plan, every command it is going to run exactly as
+stepping runs them (see command_runs), to something downstream eg. a
+motor controller or a hall display, run length encoded eg.
+  UP x12, OPEN_DOOR, CLOSE_DOOR, DOWN x3, OPEN_DOOR, CLOSE_DOOR
+
+The whole plan is sent once to start with. After that the receiver
+drops commands off the front of its copy as the lift runs them, the
+plan is exactly what stepping does so that never needs sending, and
+only when the plan changes some other way, eg. add_level / select_level
+/ call_elevator add a level to visit, is a PlanDiff sent with just the
+part of the plan that changed.
+
+Changes are sent just before the lift runs its next command (or on
+flush()), so several calls in the same tick cost 1 diff, and a what if
+that is undone again before then (see
+MultipleElevatorController.journey_cost) costs nothing.
+
+Use it with PlanStream(elevator, send) or, for a whole bank,
+stream_plans(controller.elevators, send)
+'''
+from collections import namedtuple
+from functools import partial
+from .constants import ElevatorCommand, ElevatorDoorStatus
+from .elevator import pairwise
+
+# Commands that run for a number of steps in a row, doors are
+# opened and closed 1 at a time even on the same level
+TRAVEL = (ElevatorCommand.UP, ElevatorCommand.DOWN)
+
+
+class PlanSegment(namedtuple("PlanSegment", "command count")):
+    ''' command run count times in a row '''
+    __slots__ = ()
+
+    def __str__(self):
+        if self.count == 1:
+            return self.command.name
+        return f"{self.command.name} x{self.count}"
+
+
+class PlanDiff(namedtuple("PlanDiff", "start stop segments")):
+    '''
+    Replace commands start up to (not including) stop of the plan with
+    segments. Both count commands, not segments, from the next command
+    the lift will run eg. PlanDiff(0, 0, ...) goes in front of the
+    whole plan
+    '''
+    __slots__ = ()
+
+    def __str__(self):
+        return (f"[{self.start}:{self.stop}] "
+                + ", ".join(str(segment) for segment in self.segments))
+
+
+def command_runs(elevator):
+    '''
+    Every command elevator will run as (command, count), the same as
+    Elevator.generate_command_runs apart from a level it visits going
+    both ways. There the lift really opens its doors for the 2nd visit
+    while they're still open, and closes them once
+      OPEN_DOOR, OPEN_DOOR, CLOSE_DOOR
+    where generate_command_runs gives OPEN_DOOR, CLOSE_DOOR
+    '''
+    plan = elevator.visit_plan()
+    if elevator.is_visiting(elevator.current_level, elevator.direction):
+        # Due to visit the level we are on, it's first in our plan
+        yield ElevatorCommand.OPEN_DOOR, 1
+        plan = plan[1:]
+        just_opened = True
+    else:
+        just_opened = False
+    closing = (just_opened or
+               elevator.door_status == ElevatorDoorStatus.OPEN)
+    for level1, level2 in pairwise([elevator.current_level] + plan):
+        if level1 == level2:
+            if just_opened:
+                # Visiting the same level again the other way, the
+                # doors are still open and get opened again for it
+                yield ElevatorCommand.OPEN_DOOR, 1
+            continue
+        if closing:
+            yield ElevatorCommand.CLOSE_DOOR, 1
+        if level1 < level2:
+            yield ElevatorCommand.UP, level2 - level1
+        else:
+            yield ElevatorCommand.DOWN, level1 - level2
+        yield ElevatorCommand.OPEN_DOOR, 1
+        just_opened = closing = True
+    if closing:
+        yield ElevatorCommand.CLOSE_DOOR, 1
+
+
+def plan_segments(elevator):
+    ''' elevator's plan as a list of PlanSegments '''
+    return [PlanSegment(command, count)
+            for command, count in command_runs(elevator)]
+
+
+def num_commands(segments):
+    return sum(segment.count for segment in segments)
+
+
+def split_plan(segments, num:int):
+    ''' (the first num commands, the rest) of segments, splitting a run
+    in 2 if need be '''
+    head = []
+    for index, segment in enumerate(segments):
+        if num <= 0:
+            return head, list(segments[index:])
+        if segment.count <= num:
+            head.append(segment)
+            num -= segment.count
+        else:
+            head.append(PlanSegment(segment.command, num))
+            return head, ([PlanSegment(segment.command, segment.count - num)]
+                          + list(segments[index + 1:]))
+    return head, []
+
+
+def join_plans(*plans):
+    ''' plans 1 after the other, joining runs where they meet '''
+    joined = []
+    for segments in plans:
+        for segment in segments:
+            if (joined and segment.command == joined[-1].command
+                    and segment.command in TRAVEL):
+                joined[-1] = PlanSegment(segment.command,
+                                         joined[-1].count + segment.count)
+            else:
+                joined.append(segment)
+    return joined
+
+
+def common_commands(old, new):
+    ''' How many commands old and new start with that are the same '''
+    num = 0
+    for segment1, segment2 in zip(old, new):
+        if segment1.command != segment2.command:
+            break
+        num += min(segment1.count, segment2.count)
+        if segment1.count != segment2.count:
+            break
+    return num
+
+
+def diff_plans(old, new):
+    '''
+    The PlanDiff that turns plan old into plan new (lists of
+    PlanSegments), only covering what's between the commands they start
+    and end with that are the same. None if they are the same.
+    '''
+    num_old = num_commands(old)
+    num_new = num_commands(new)
+    start = common_commands(old, new)
+    if start == num_old == num_new:
+        return None
+    same_end = min(common_commands(old[::-1], new[::-1]),
+                   num_old - start, num_new - start)
+    _, rest = split_plan(new, start)
+    segments, _ = split_plan(rest, num_new - start - same_end)
+    return PlanDiff(start, num_old - same_end, tuple(segments))
+
+
+def apply_diff(segments, diff:PlanDiff):
+    ''' What the receiver does with a diff, returns the new plan '''
+    head, rest = split_plan(segments, diff.start)
+    _, tail = split_plan(rest, diff.stop - diff.start)
+    return join_plans(head, diff.segments, tail)
+
+
+class PlanStream(object):
+    '''
+    Sends 1 lift's plan and then only what changes in it.
+    Becomes the lift's plan_listener until close()
+
+    Attributes:
+      elevator (Elevator): the lift
+      send (callable): send(diff) with every PlanDiff
+      plan (list): PlanSegments the receiver should have right now,
+             ie. everything sent less the commands run since
+      diffs_sent (int): how many diffs were sent
+      segments_sent (int): how many PlanSegments were in them
+    '''
+
+    def __init__(self, elevator, send):
+        super().__init__()
+        self.elevator = elevator
+        self.send = send
+        self.plan = []
+        self.diffs_sent = 0
+        self.segments_sent = 0
+        self._changed = True
+        elevator.plan_listener = self
+        # The whole plan, unless there's nothing to do
+        self.flush()
+
+    def plan_changed(self, elevator):
+        ''' Told by the lift, see what actually changed later '''
+        self._changed = True
+
+    def command_run(self, elevator, command, num_steps:int):
+        ''' Told by the lift just before it runs command num_steps
+        times, the receiver drops them from its plan '''
+        plan = self.plan
+        if not (plan and plan[0].command == command
+                and plan[0].count >= num_steps):
+            # Our plan was changed some way we weren't told about eg.
+            # current_level set by hand, catch up before the lift runs it
+            self._changed = True
+        if self._changed:
+            self.flush()
+            plan = self.plan
+        if plan[0].count == num_steps:
+            del plan[0]
+        else:
+            plan[0] = PlanSegment(command, plan[0].count - num_steps)
+        if command in TRAVEL and ((command == ElevatorCommand.UP)
+                                  != elevator.is_going_up):
+            # Only after add_level, which doesn't turn us around, our
+            # plan from before this command may not be what we do next
+            self._changed = True
+
+    def flush(self):
+        ''' Send what has changed in the plan right now, if anything '''
+        if not self._changed:
+            return
+        self._changed = False
+        new_plan = plan_segments(self.elevator)
+        diff = diff_plans(self.plan, new_plan)
+        self.plan = new_plan
+        if diff is not None:
+            self.diffs_sent += 1
+            self.segments_sent += len(diff.segments)
+            self.send(diff)
+
+    def close(self):
+        ''' Stop listening to the lift '''
+        if self.elevator.plan_listener is self:
+            self.elevator.plan_listener = None
+
+
+def stream_plans(elevators, send):
+    ''' A PlanStream for every lift, sending send(index, diff) where
+    index is the lift's place in elevators '''
+    return [PlanStream(elevator, partial(send, index))
+            for index, elevator in enumerate(elevators)]
@@ -0,0 +1,251 @@
+'''
+Compare dispatch policies under random traffic.
+
+Every run takes a seed, a traffic pattern (who goes from where to where)
+and a policy (how a lift is chosen for them). Passengers turn up at
+random (a Poisson process) and pick their origin and destination from
+the pattern's origin / destination matrix. The same seed gives the same
+passengers for every policy so policies are compared on the same
+traffic. Runs for different seeds are independent so they are spread
+over a process pool, and the results are the same however many
+processes are used.
+
+HOW to RUN
+`python3 policy_evaluator.py --seeds 20 --floors 16 --cars 4`
+prints the mean wait / ride time of each policy for each pattern
+with 95% confidence intervals, as JSON.
+'''
+import argparse
+import json
+import random
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+if not __package__:
+    # Run as a script, see script_support.py
+    from script_support import as_package
+    __package__ = as_package()
+from .elevator import Elevator
+from .metrics import MetricsCollector
+from .multiple_elevator_controller import MultipleElevatorController
+
+# Share of passengers starting / ending on the lobby (level 0)
+PEAK_SHARE = 0.85
+LUNCH_SHARE = 0.45
+
+# Student's t for 95% two sided intervals, by degrees of freedom
+T_95 = (None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306,
+        2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110,
+        2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056,
+        2.052, 2.048, 2.045, 2.042)
+
+
+def od_matrix(pattern:str, num_levels:int):
+    '''
+    How likely each trip is for a traffic pattern.
+    Returns: {(origin, destination): weight}
+
+    up-peak: mostly from the lobby up, eg. the morning
+    down-peak: mostly down to the lobby, eg. the evening
+    interfloor: between any 2 levels equally
+    lunch: out to the lobby and back again at the same time
+    '''
+    lobby = {}
+    to_lobby = {}
+    interfloor = {}
+    for origin in range(num_levels):
+        for destination in range(num_levels):
+            if origin == destination:
+                continue
+            elif origin == 0:
+                lobby[origin, destination] = 1
+            elif destination == 0:
+                to_lobby[origin, destination] = 1
+            else:
+                interfloor[origin, destination] = 1
+    if pattern == "interfloor":
+        return {**lobby, **to_lobby, **interfloor}
+    elif pattern == "up-peak":
+        shares = (PEAK_SHARE, 0, 1 - PEAK_SHARE)
+    elif pattern == "down-peak":
+        shares = (0, PEAK_SHARE, 1 - PEAK_SHARE)
+    elif pattern == "lunch":
+        shares = (LUNCH_SHARE, LUNCH_SHARE, 1 - 2 * LUNCH_SHARE)
+    else:
+        raise ValueError(f"Unknown traffic pattern {pattern}")
+    matrix = {}
+    for trips, share in zip((lobby, to_lobby, interfloor), shares):
+        for trip in trips:
+            matrix[trip] = share / len(trips)
+    return matrix
+
+
+PATTERNS = ("up-peak", "down-peak", "interfloor", "lunch")
+
+
+def generate_passengers(rng, matrix:dict, rate:float, duration:int):
+    '''
+    People turning up at random, rate people per tick on average, until
+    duration ticks have passed, trips picked from matrix (see od_matrix)
+    Returns: [(tick, origin, destination), ...] in tick order
+    '''
+    trips = list(matrix)
+    cum_weights = []
+    total = 0
+    for trip in trips:
+        total += matrix[trip]
+        cum_weights.append(total)
+    passengers = []
+    time_now = rng.expovariate(rate)
+    while time_now < duration:
+        [(origin, destination)] = rng.choices(trips,
+                                              cum_weights=cum_weights)
+        passengers.append((int(time_now), origin, destination))
+        time_now += rng.expovariate(rate)
+    return passengers
+
+
+def zone_of(origin:int, destination:int, num_levels:int, num_zones:int):
+    ''' Which lift serves a trip when every lift serves its own band of
+    levels, by the end of the trip that isn't the lobby '''
+    level_no = destination if origin == 0 else origin
+    return (level_no - 1) * num_zones // (num_levels - 1)
+
+
+def dispatch(controller, policy:str, origin:int, destination:int):
+    ''' Send a lift for someone going from origin to destination '''
+    if policy == "nearest":
+        controller.call_destination(origin, destination, nearest=True)
+    elif policy == "destination":
+        controller.call_destination(origin, destination)
+    elif policy == "zoning":
+        controller.assign_destination(
+            zone_of(origin, destination, controller.elevators[0].num_levels,
+                    len(controller.elevators)),
+            origin, destination)
+    else:
+        raise ValueError(f"Unknown policy {policy}")
+
+
+POLICIES = ("nearest", "zoning", "destination")
+
+
+def run_scenario(policy:str, pattern:str, seed:int, num_levels:int=16,
+                 num_elevators:int=4, rate:float=0.3, duration:int=2000,
+                 drain_ticks:int=10000):
+    '''
+    Run 1 seed of 1 pattern with 1 policy
+    Returns: {"policy", "pattern", "seed", "passengers", "wait", "ride",
+              "unserved"} wait and ride are means in steps
+    '''
+    rng = random.Random(seed)
+    passengers = generate_passengers(rng, od_matrix(pattern, num_levels),
+                                     rate, duration)
+    levels = [str(level_no) for level_no in range(num_levels)]
+    controller = MultipleElevatorController(
+        [Elevator(levels) for i in range(num_elevators)])
+    metrics = MetricsCollector()
+    metrics.attach(controller)
+    for tick, origin, destination in passengers:
+        controller.advance_to(tick)
+        dispatch(controller, policy, origin, destination)
+    for i in range(drain_ticks):
+        if not controller.waiting and not controller.riding:
+            break
+        controller.step_forward()
+    return {
+        "policy": policy,
+        "pattern": pattern,
+        "seed": seed,
+        "passengers": len(passengers),
+        "wait": metrics.wait.mean,
+        "ride": metrics.travel.mean,
+        "unserved": metrics.summary()["waiting"],
+    }
+
+
+def confidence_interval(values:list):
+    '''
+    Mean and half width of its 95% confidence interval (Student's t)
+    Returns: (mean, half width), half width is None for 1 value
+    '''
+    mean = statistics.mean(values)
+    if len(values) < 2:
+        return mean, None
+    dof = len(values) - 1
+    t = T_95[dof] if dof < len(T_95) else 1.96
+    return mean, t * statistics.stdev(values) / len(values) ** 0.5
+
+
+def summarise(runs:list):
+    '''
+    Combine runs for the same policy and pattern across seeds
+    Returns: [{"policy", "pattern", "seeds", "wait", "wait_ci", "ride",
+               "ride_ci"}, ...]
+    '''
+    grouped = {}
+    for run in runs:
+        grouped.setdefault((run["policy"], run["pattern"]), []).append(run)
+    results = []
+    for (policy, pattern), group in grouped.items():
+        result = {"policy": policy, "pattern": pattern, "seeds": len(group)}
+        for key in ("wait", "ride"):
+            values = [run[key] for run in group if run[key] is not None]
+            if values:
+                result[key], result[key + "_ci"] = confidence_interval(values)
+            else:
+                result[key] = result[key + "_ci"] = None
+        results.append(result)
+    return results
+
+
+def evaluate(policies=POLICIES, patterns=PATTERNS, seeds=range(10),
+             executor=None, **options):
+    '''
+    Run every policy on every pattern for every seed, on executor
+    (eg. a ProcessPoolExecutor) if given. options go to run_scenario()
+    Returns: (summarise() of the runs, every run)
+    '''
+    tasks = [(policy, pattern, seed) for pattern in patterns
+             for seed in seeds for policy in policies]
+    run = partial(run_scenario, **options)
+    if executor is None:
+        runs = [run(*task) for task in tasks]
+    else:
+        runs = list(executor.map(run, *zip(*tasks),
+                                 chunksize=max(1, len(tasks) // 64)))
+    return summarise(runs), runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES),
+                        choices=POLICIES)
+    parser.add_argument("--patterns", nargs="+", default=list(PATTERNS),
+                        choices=PATTERNS)
+    parser.add_argument("--seeds", type=int, default=10,
+                        help="number of seeds, 0 to this - 1")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--floors", type=int, default=16)
+    parser.add_argument("--cars", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0.3,
+                        help="passengers per tick")
+    parser.add_argument("--duration", type=int, default=2000,
+                        help="ticks passengers turn up for")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes, every core by default")
+    args = parser.parse_args(argv)
+
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    with ProcessPoolExecutor(args.workers) as executor:
+        results, runs = evaluate(args.policies, args.patterns, seeds,
+                                 executor, num_levels=args.floors,
+                                 num_elevators=args.cars, rate=args.rate,
+                                 duration=args.duration)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+'''
+Lets the modules with a command line still be run as scripts straight
+from this folder, eg. `python3 tests.py` or `python3 elevator_monitor.py`,
+even though they import the rest of the package relatively.
+
+Every one of them starts with
+  if not __package__:
+      from script_support import as_package
+      __package__ = as_package()
+which only does anything when run as a script. Installed, use the
+`elevators` command instead (see pyproject.toml and __main__.py).
+'''
+import importlib.util
+import os
+import sys
+
+PACKAGE = "elevators"
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def as_package():
+    '''
+    Import this folder as the PACKAGE package, whatever the folder is
+    called, so the script's relative imports work.
+    Returns: the name to set the script's __package__ to
+    '''
+    # Our modules are only meant to be imported as part of the package,
+    # eg. elevator.py would hide a folder called elevator
+    while FOLDER in sys.path:
+        sys.path.remove(FOLDER)
+    if PACKAGE not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE, os.path.join(FOLDER, "__init__.py"),
+            submodule_search_locations=[FOLDER])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE] = package
+        spec.loader.exec_module(package)
+    return PACKAGE
@@ -0,0 +1,159 @@
+'''
+Runs lots of independent elevator banks (eg. across many buildings),
+each with its own MultipleElevatorController, spread across worker
+processes so banks don't wait on each other's ticks.
+
+Every bank lives in exactly one worker (its shard) for good, calls and
+selections for it are routed there over a pipe. tick() sends every
+shard all of its requests for the tick in one message and they all
+step their banks at the same time, so throughput goes up with the
+number of cores rather than the number of round trips.
+'''
+import multiprocessing
+import os
+from itertools import cycle
+
+
+def _serve(connection, controllers:dict):
+    '''
+    Worker process loop, handles messages until told to stop
+    Messages are (command, args) and every one gets 1 reply
+    '''
+    def apply(request):
+        bank, kind, args = request
+        controller = controllers[bank]
+        try:
+            if kind == "call":
+                elevator = controller.call_elevator(*args)
+                return controller.elevators.index(elevator)
+            elif kind == "select":
+                controller.select_level(*args)
+                return None
+            raise ValueError(f"Unknown request {kind}")
+        except Exception as e:
+            return e
+
+    while True:
+        command, args = connection.recv()
+        if command == "tick":
+            requests, num_steps = args
+            results = [apply(request) for request in requests]
+            for controller in controllers.values():
+                controller.advance(num_steps)
+            connection.send(results)
+        elif command == "snapshots":
+            for controller in controllers.values():
+                if not controller.publish_snapshots:
+                    # Nothing else reads them here, only build them
+                    # when asked
+                    controller.publish()
+            connection.send({bank: controller.fleet_snapshot
+                             for bank, controller in controllers.items()})
+        elif command == "stop":
+            connection.send(None)
+            connection.close()
+            return
+
+
+class ShardedController(object):
+    '''
+    Many MultipleElevatorControllers, 1 per bank, sharded over worker
+    processes.
+
+    The controllers given are sent to the workers, from then on they
+    only change there (the ones given are left as they were).
+
+    Attributes:
+      shards (dict): {bank: which worker it lives in}
+      num_workers (int): worker processes
+    '''
+
+    def __init__(self, controllers:dict, num_workers:int=None):
+        super().__init__()
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = max(1, min(num_workers, len(controllers)))
+        self.num_workers = num_workers
+        self.shards = dict(zip(controllers, cycle(range(num_workers))))
+        self._connections = []
+        self._workers = []
+        for shard in range(num_workers):
+            ours, theirs = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_serve, daemon=True,
+                args=(theirs, {bank: controller for bank, controller
+                               in controllers.items()
+                               if self.shards[bank] == shard}))
+            worker.start()
+            theirs.close()
+            self._connections.append(ours)
+            self._workers.append(worker)
+
+    def tick(self, requests=(), num_steps:int=1):
+        '''
+        Apply requests then step every bank forward num_steps, every
+        shard at the same time.
+        requests: [(bank, "call", (from_level, direction)) or
+                   (bank, "select", (index, level_no)), ...]
+        Returns: a result for each request in order, the index of the
+          lift called, None for selections, or the exception raised
+        '''
+        per_shard = [[] for i in range(self.num_workers)]
+        positions = [[] for i in range(self.num_workers)]
+        for position, request in enumerate(requests):
+            shard = self.shards[request[0]]
+            per_shard[shard].append(request)
+            positions[shard].append(position)
+        for connection, shard_requests in zip(self._connections, per_shard):
+            connection.send(("tick", (shard_requests, num_steps)))
+        results = [None] * len(requests)
+        for connection, shard_positions in zip(self._connections,
+                                               positions):
+            for position, result in zip(shard_positions, connection.recv()):
+                results[position] = result
+        return results
+
+    def _request(self, bank, kind:str, args:tuple):
+        ''' 1 request on its own without stepping '''
+        [result] = self.tick([(bank, kind, args)], 0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def call_elevator(self, bank, from_level:int, direction):
+        ''' Call a lift in bank, returns the index of the lift sent '''
+        return self._request(bank, "call", (from_level, direction))
+
+    def select_level(self, bank, index:int, level_no:int, direction=None):
+        ''' Select a level inside lift number index of bank '''
+        self._request(bank, "select", (index, level_no, direction))
+
+    def step_forward(self, num_steps:int=1):
+        ''' Step every bank forward '''
+        self.tick((), num_steps)
+
+    def fleet_snapshots(self):
+        ''' {bank: FleetSnapshot} of every bank as of their last tick '''
+        for connection in self._connections:
+            connection.send(("snapshots", None))
+        snapshots = {}
+        for connection in self._connections:
+            snapshots.update(connection.recv())
+        return snapshots
+
+    def close(self):
+        ''' Stop every worker '''
+        for connection in self._connections:
+            connection.send(("stop", None))
+        for connection, worker in zip(self._connections, self._workers):
+            connection.recv()
+            connection.close()
+            worker.join()
+        self._connections = []
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
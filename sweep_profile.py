@@ -0,0 +1,149 @@
+''' Precomputed sweeps of a lift so lots of calls can be scored at once '''
+from .constants import ElevatorDirection, ElevatorDoorStatus
+from .elevator import walk_stops
+from .levels_to_visit import highest_level, lowest_level, sweep_tables
+
+
+def bound_state(elevator):
+    '''
+    What steps_lower_bounds() and steps_ahead() need to know about a
+    lift, as (current_level, going_up, door_open, furthest, stops)
+    where furthest is the furthest level ahead of the lift it has to go
+    to (or current_level if there isn't one) and stops are the levels
+    it visits going the way it is going now, as a mask
+    '''
+    current_level = elevator.current_level
+    tables = sweep_tables(elevator.num_levels)
+    any_mask = (elevator.visit_mask(ElevatorDirection.UP)
+                | elevator.visit_mask(ElevatorDirection.DOWN))
+    if elevator.is_going_up:
+        ahead = any_mask & tables.above[current_level]
+        furthest = highest_level(ahead) if ahead else current_level
+    else:
+        ahead = any_mask & tables.below[current_level]
+        furthest = lowest_level(ahead) if ahead else current_level
+    return (current_level, elevator.is_going_up,
+            elevator.door_status == ElevatorDoorStatus.OPEN, furthest,
+            elevator.visit_mask(elevator.direction))
+
+
+def steps_lower_bounds(states:list, from_level:int, going_up:bool):
+    ''' Elevator.steps_lower_bound() for a call to from_level for every
+    lift in states (see bound_state), without going through the lifts '''
+    bounds = []
+    for current_level, lift_going_up, door_open, furthest, _ in states:
+        if lift_going_up:
+            if going_up and from_level >= current_level:
+                num_steps = from_level - current_level
+            else:
+                # Up to the furthest we have to go and back
+                num_steps = (2 * max(from_level, furthest)
+                             - current_level - from_level)
+        elif not going_up and from_level <= current_level:
+            num_steps = current_level - from_level
+        else:
+            num_steps = (current_level + from_level
+                         - 2 * min(from_level, furthest))
+        # Have to close the doors before we can go anywhere
+        bounds.append(num_steps + door_open if num_steps else 0)
+    return bounds
+
+
+def steps_ahead(state:tuple, from_level:int, going_up:bool):
+    '''
+    Elevator.steps_to_reach() for a call the lift (in state, see
+    bound_state) will pass going the way it's already going, without
+    walking it. Every stop on the way there is 1 step to open the doors
+    and 1 to close them again.
+    Returns: None if the call isn't ahead of the lift
+    '''
+    current_level, lift_going_up, door_open, _, stops = state
+    if going_up != lift_going_up:
+        return None
+    elif from_level == current_level:
+        return 0
+    if going_up and from_level > current_level:
+        distance = from_level - current_level
+        between = stops >> (current_level + 1)
+    elif not going_up and from_level < current_level:
+        distance = current_level - from_level
+        between = stops >> (from_level + 1)
+    else:
+        return None
+    between &= (1 << (distance - 1)) - 1
+    # Visiting where we are now opens our doors first
+    leaving = 2 if stops >> current_level & 1 else door_open
+    return distance + 2 * bin(between).count("1") + leaving
+
+
+class SweepProfile(object):
+    '''
+    Where a lift will be and which way it will be going at every step
+    until it has nothing left to do, worked out once so that
+    scoring many calls against the same lift is just a lookup.
+
+    If the lift would already pass a level in the direction we want
+    then calling it there can't change anything before it gets there,
+    so the steps it takes is just when it first passes that level.
+    Otherwise the level must be further than the lift was going to go,
+    so it keeps going instead of turning around the first time it
+    would have turned around before reaching it.
+
+    Attributes:
+      elevator (Elevator): the lift this profile is for
+      first_passed (dict): {(level_no, going_up): num_steps}
+      turns (list): (num_steps, level_no, was_going_up, door_open)
+             every time the lift turns around
+      end (tuple): (num_steps, level_no, going_up, door_open)
+             when the lift has nothing left to do
+    '''
+
+    def __init__(self, elevator):
+        super().__init__()
+        self.elevator = elevator
+        self.tables = sweep_tables(elevator.num_levels)
+        self.first_passed = {}
+        self.turns = []
+        first_passed = self.first_passed
+        for (num_steps, start_level, current_level, was_going_up, going_up,
+             door_open) in walk_stops(
+                 elevator.current_level, elevator.is_going_up,
+                 elevator.door_status == ElevatorDoorStatus.OPEN,
+                 elevator.visit_mask(ElevatorDirection.UP),
+                 elevator.visit_mask(ElevatorDirection.DOWN), self.tables):
+            # Every level we passed on the way here
+            distance = abs(current_level - start_level)
+            step = 1 if current_level > start_level else -1
+            for i in range(1, distance):
+                first_passed.setdefault((start_level + step * i,
+                                         was_going_up),
+                                        num_steps - distance + i)
+            first_passed.setdefault((current_level, was_going_up), num_steps)
+            first_passed.setdefault((current_level, going_up), num_steps)
+            if going_up != was_going_up:
+                self.turns.append((num_steps, current_level, was_going_up,
+                                   door_open))
+        self.end = (num_steps, current_level, going_up, door_open)
+
+    def steps_to_reach(self, from_level:int, direction:ElevatorDirection):
+        ''' Same as Elevator.steps_to_reach but using our profile '''
+        self.elevator.check_call(from_level, direction)
+        going_up = direction == ElevatorDirection.UP
+        num_steps = self.first_passed.get((from_level, going_up))
+        if num_steps is not None:
+            return num_steps
+
+        for num_steps, level_no, was_going_up, door_open in self.turns:
+            if (was_going_up and from_level > level_no or
+                    not was_going_up and from_level < level_no):
+                # Instead of turning around here keep going, after
+                # closing our doors, then turn around at from_level
+                # if we need to
+                return num_steps + door_open + abs(from_level - level_no)
+
+        # We'd have nothing else to do by the time we get there, so go
+        # straight there, after closing our doors if we have to leave.
+        # With only 1 place to go we turn around there without a step
+        num_steps, level_no, _, door_open = self.end
+        return (num_steps + (door_open and from_level != level_no)
+                + abs(from_level - level_no))
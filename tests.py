@@ -1,9 +1,107 @@
+import asyncio
+import gc
+import importlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
-import elevator
-from constants import (ElevatorCommand, ElevatorStatus, ElevatorDoorStatus,
-                       ElevatorDirection)
-from exceptions import ElevatorOutOfBoundsException
-from multiple_elevator_controller import MultipleElevatorController
+import unittest.mock
+import warnings
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy, deepcopy
+if not __package__:
+    # Run as a script, see script_support.py
+    from script_support import as_package
+    __package__ = as_package()
+from . import elevator, trajectory_log
+from .constants import (ElevatorCommand, ElevatorStatus, ElevatorDoorStatus,
+                        ElevatorDirection)
+from .exceptions import ElevatorOutOfBoundsException
+from .async_controller import AsyncElevatorService
+from .benchmark import (bench_batch, bench_destination_dispatch,
+                        bench_import_time, bench_tick_cost, run_benchmarks)
+from .destination_dispatch import total_journey_time
+from .elevator_monitor import ElevatorRenderer
+from .eta_cache import EtaCache
+from .metrics import MetricsCollector, StreamingHistogram
+from .multiple_elevator_controller import MultipleElevatorController
+from .parallel_scoring import pack, unpack
+from .plan_stream import (PlanDiff, PlanSegment, PlanStream, apply_diff,
+                          command_runs, plan_segments, split_plan,
+                          stream_plans)
+from .policy_evaluator import (PATTERNS, confidence_interval, evaluate,
+                               generate_passengers, od_matrix)
+from .sharded_controller import ShardedController
+from .sweep_profile import (SweepProfile, bound_state, steps_ahead,
+                            steps_lower_bounds)
+from .timing import StepTiming, TimingModel
+from .trace_replay import TraceReplay, read_trace
+from .trajectory_log import COMMANDS, TrajectoryLog, TrajectoryRecorder
+
+try:
+    import numpy
+    from .fleet_simulator import FleetSimulator
+except ImportError:
+    numpy = None
+
+
+def simulate_steps_to_get_to_level(elevator1, from_level, direction):
+    ''' The original simulation, call the lift on a copy and step it
+    forward until it arrives. Used to check the worked out answers '''
+    if (from_level == elevator1.current_level and
+            direction == elevator1.direction):
+        # The simulation never finishes if calling us here flips our
+        # direction, we're already here though
+        return 0
+    num_steps = 0
+    elevator_copy = deepcopy(elevator1)
+    elevator_copy.call_elevator(from_level, direction)
+    while True:
+        if (elevator_copy.direction == direction and
+                elevator_copy.current_level == from_level):
+            return num_steps
+        num_steps += 1
+        elevator_copy.step_forward()
+
+
+def random_elevator(rng, levels):
+    ''' Build a lift in some random state by randomly calling it,
+    selecting levels inside and stepping it forward '''
+    elevator1 = elevator.Elevator(
+        levels, current_level=rng.randrange(len(levels)),
+        door_status=rng.choice(list(ElevatorDoorStatus)),
+        direction=rng.choice(list(ElevatorDirection)))
+    for i in range(rng.randrange(12)):
+        action = rng.random()
+        level_no = rng.randrange(len(levels))
+        if action < 0.3:
+            elevator1.select_level(level_no)
+        elif action < 0.6:
+            direction = rng.choice(list(ElevatorDirection))
+            try:
+                elevator1.call_elevator(level_no, direction)
+            except ElevatorOutOfBoundsException:
+                pass
+        elif action < 0.7:
+            # add a level without resetting our direction
+            elevator1.add_level(level_no,
+                                rng.choice(list(ElevatorDirection)))
+        else:
+            for j in range(rng.randrange(6)):
+                elevator1.step_forward()
+    return elevator1
+
+
+def valid_calls(levels):
+    ''' Every (level, direction) a lift can be called to '''
+    for level_no in range(len(levels)):
+        if level_no != len(levels) - 1:
+            yield level_no, ElevatorDirection.UP
+        if level_no != 0:
+            yield level_no, ElevatorDirection.DOWN
 
 
 class TestElevatorSelections(unittest.TestCase):
@@ -537,5 +635,1537 @@ class TestMultipleElevators(unittest.TestCase):
                          elevator1)
 
 
+class TestStepsToReach(unittest.TestCase):
+    ''' Make sure the worked out steps match simulating the lift '''
+
+    def test_idle_elevator(self):
+        elevator1 = elevator.Elevator("G 1 2 3 4".split())
+        self.assertEqual(elevator1.steps_to_reach(0, ElevatorDirection.UP), 0)
+        self.assertEqual(elevator1.steps_to_reach(3, ElevatorDirection.UP), 3)
+        # Go all the way to 4 then come back down to 3
+        self.assertEqual(
+            elevator1.steps_to_reach(3, ElevatorDirection.DOWN), 3)
+        with self.assertRaises(ElevatorOutOfBoundsException):
+            elevator1.steps_to_reach(4, ElevatorDirection.UP)
+
+    def test_does_not_change_elevator(self):
+        elevator1 = elevator.Elevator("G 1 2 3 4".split())
+        elevator1.select_level(3)
+        elevator1.step_forward()
+        elevator1.steps_to_reach(2, ElevatorDirection.DOWN)
+        self.assertEqual(elevator1.current_level, 1)
+        self.assertEqual(elevator1.direction, ElevatorDirection.UP)
+        self.assertEqual(
+            list(elevator1.generate_commands()),
+            [ElevatorCommand.UP, ElevatorCommand.UP,
+             ElevatorCommand.OPEN_DOOR, ElevatorCommand.CLOSE_DOOR],
+        )
+
+    def test_matches_simulation(self):
+        rng = random.Random(1234)
+        for i in range(400):
+            levels = [str(lvl) for lvl in range(rng.randrange(2, 12))]
+            elevator1 = random_elevator(rng, levels)
+            for from_level, direction in valid_calls(levels):
+                self.assertEqual(
+                    elevator1.steps_to_reach(from_level, direction),
+                    simulate_steps_to_get_to_level(elevator1, from_level,
+                                                   direction),
+                )
+
+
+class TestVisitPlanCache(unittest.TestCase):
+    ''' Make sure the cached plan always matches working it out again '''
+
+    def test_cached_commands_match(self):
+        rng = random.Random(4321)
+        for i in range(200):
+            levels = [str(lvl) for lvl in range(rng.randrange(2, 12))]
+            elevator1 = random_elevator(rng, levels)
+            for j in range(30):
+                if rng.random() < 0.2:
+                    elevator1.select_level(rng.randrange(len(levels)))
+                cached = list(elevator1.generate_commands())
+                elevator1._plan = None
+                self.assertEqual(cached, list(elevator1.generate_commands()))
+                self.assertEqual(elevator1.next_command(),
+                                 next(iter(cached), None))
+                elevator1.step_forward()
+
+
+class TestLevelsToVisit(unittest.TestCase):
+    ''' The bitmask backed levels_to_visit still works like a dict '''
+
+    def test_dict_view(self):
+        elevator1 = elevator.Elevator("G 1 2 3 4".split())
+        elevator1.call_elevator(3, ElevatorDirection.DOWN)
+        elevator1.select_level(2)
+        self.assertEqual(dict(elevator1.levels_to_visit),
+                         {2: {ElevatorDirection.UP},
+                          3: {ElevatorDirection.DOWN}})
+        self.assertEqual(elevator1.levels_to_visit[4], set())
+        self.assertIn(ElevatorDirection.UP, elevator1.levels_to_visit[2])
+        self.assertEqual(elevator1.visit_mask(ElevatorDirection.UP), 0b100)
+        self.assertEqual(elevator1.visit_mask(), 0b1100)
+
+    def test_view_writes_update_plan(self):
+        elevator1 = elevator.Elevator("G 1 2 3 4".split())
+        elevator1.select_level(2)
+        self.assertEqual(elevator1.visit_plan(), [2])
+        elevator1.levels_to_visit[1].add(ElevatorDirection.UP)
+        self.assertEqual(elevator1.visit_plan(), [1, 2])
+        elevator1.levels_to_visit[2].discard(ElevatorDirection.UP)
+        self.assertEqual(elevator1.visit_plan(), [1])
+
+
+class TestSnapshots(unittest.TestCase):
+    ''' Copying and snapshotting lifts for what if simulations '''
+
+    def test_copy_is_independent(self):
+        elevator1 = elevator.Elevator("G 1 2 3 4".split())
+        elevator1.select_level(3)
+        elevator1.step_forward()
+        elevator_copy = copy(elevator1)
+        self.assertIs(elevator_copy.levels, elevator1.levels)
+        elevator_copy.select_level(0)
+        for i in range(4):
+            elevator_copy.step_forward()
+        self.assertEqual(elevator1.current_level, 1)
+        self.assertEqual(list(elevator1.generate_commands()),
+                         [ElevatorCommand.UP, ElevatorCommand.UP,
+                          ElevatorCommand.OPEN_DOOR,
+                          ElevatorCommand.CLOSE_DOOR])
+        self.assertEqual(elevator_copy.current_level, 3)
+
+    def test_controller_snapshot_restore(self):
+        LEVELS = "G 1 2 3 4 5".split()
+        elevator1 = elevator.Elevator(LEVELS)
+        elevator2 = elevator.Elevator(LEVELS)
+        controller = MultipleElevatorController([elevator1, elevator2])
+        controller.call_elevator(4, ElevatorDirection.DOWN)
+        before = [list(e.generate_commands()) for e in controller.elevators]
+
+        state = controller.snapshot()
+        controller.call_elevator(2, ElevatorDirection.UP)
+        for i in range(6):
+            controller.step_forward()
+        controller.restore(state)
+
+        self.assertEqual(
+            [list(e.generate_commands()) for e in controller.elevators],
+            before)
+        self.assertEqual(elevator1.current_level, 0)
+        self.assertEqual(elevator2.current_level, 0)
+
+
+class TestTiming(unittest.TestCase):
+
+    def test_step_timing_counts_steps(self):
+        rng = random.Random(19)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        for i in range(300):
+            elevator1 = random_elevator(rng, LEVELS)
+            elevator1.timing = StepTiming()
+            for from_level, direction in valid_calls(LEVELS):
+                self.assertEqual(
+                    elevator1.eta(from_level, direction),
+                    elevator1.steps_to_reach(from_level, direction))
+
+    def test_travel_time(self):
+        timing = TimingModel(floor_height=4, max_speed=2, acceleration=1)
+        # 4m never gets up to full speed
+        self.assertAlmostEqual(timing.travel_time(1), 4)
+        # 8m just does, 20m cruises for 6 seconds
+        self.assertAlmostEqual(timing.travel_time(2), 6)
+        self.assertAlmostEqual(timing.travel_time(5), 12)
+
+    def test_lower_bound(self):
+        rng = random.Random(19)
+        LEVELS = [str(lvl) for lvl in range(15)]
+        for i in range(300):
+            elevator1 = random_elevator(rng, LEVELS)
+            elevator1.timing = TimingModel()
+            for from_level, direction in valid_calls(LEVELS):
+                self.assertLessEqual(
+                    elevator1.eta_lower_bound(from_level, direction),
+                    elevator1.eta(from_level, direction) + 1e-9)
+
+    def test_dispatch_uses_timing(self):
+        LEVELS = [str(lvl) for lvl in range(16)]
+        idle = elevator.Elevator(LEVELS)
+        # Closer but stopping twice on the way
+        busy = elevator.Elevator(LEVELS, current_level=14,
+                                 direction=ElevatorDirection.DOWN)
+        busy.add_level(13, ElevatorDirection.DOWN)
+        busy.add_level(12, ElevatorDirection.DOWN)
+        controller = MultipleElevatorController([idle, busy])
+        state = controller.snapshot()
+        self.assertIs(controller.fastest_elevator(10, ElevatorDirection.DOWN),
+                      busy)
+        for elevator1 in controller.elevators:
+            elevator1.timing = TimingModel()
+        controller.restore(state)
+        self.assertIs(controller.fastest_elevator(10, ElevatorDirection.DOWN),
+                      idle)
+        self.assertIs(
+            controller.call_elevator(10, ElevatorDirection.DOWN), idle)
+        # Batches and destination dispatch too
+        call = (10, ElevatorDirection.DOWN)
+        for joint in (False, True):
+            controller.restore(state)
+            self.assertIs(
+                controller.call_elevators([call], joint=joint)[call], idle)
+        controller.restore(state)
+        self.assertIs(controller.call_destination(10, 2), idle)
+
+    def test_mixed_fleet_rejected(self):
+        LEVELS = [str(lvl) for lvl in range(8)]
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS), elevator.Elevator(LEVELS)])
+        controller.elevators[1].timing = TimingModel()
+        call = (5, ElevatorDirection.DOWN)
+        with self.assertRaises(ValueError):
+            controller.call_elevator(*call)
+        with self.assertRaises(ValueError):
+            controller.call_elevators([call])
+        with self.assertRaises(ValueError):
+            controller.call_destination(5, 2)
+        # Fine once they all have one
+        controller.elevators[0].timing = TimingModel(max_speed=1)
+        self.assertIs(controller.call_elevator(*call),
+                      controller.elevators[1])
+
+    def test_dwell_grows_with_load(self):
+        timing = TimingModel(dwell_time=3, per_passenger_dwell=0.5)
+        self.assertEqual(timing.dwell(0), 3)
+        self.assertEqual(timing.dwell(4), 5)
+        self.assertEqual(StepTiming().dwell(10), 0)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        elevator1 = elevator.Elevator(LEVELS, capacity=8)
+        elevator1.timing = timing
+        # Stopping at 3 and 6 on the way
+        elevator1.select_level(3)
+        elevator1.select_level(6)
+        empty = elevator1.eta(8, ElevatorDirection.DOWN)
+        elevator1.load = 4
+        self.assertAlmostEqual(elevator1.eta(8, ElevatorDirection.DOWN),
+                               empty + 2 * 2)
+        # Cached ETAs know about load too
+        cache = EtaCache()
+        self.assertEqual(cache.eta(elevator1, 8, ElevatorDirection.DOWN),
+                         empty + 2 * 2)
+        elevator1.load = 0
+        self.assertEqual(cache.eta(elevator1, 8, ElevatorDirection.DOWN),
+                         empty)
+
+    def test_journey_time_dwell(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS)])
+        elevator1 = controller.elevators[0]
+        elevator1.timing = TimingModel(dwell_time=0, per_passenger_dwell=1)
+        # 2 people from 0 to 5, 1 more from 2 to 5
+        controller.assign_destination(0, 0, 5)
+        controller.assign_destination(0, 0, 5)
+        controller.assign_destination(0, 2, 5)
+        without_dwell = copy(elevator1)
+        without_dwell.timing = TimingModel(dwell_time=0)
+        args = (controller.waiting.get(0, {}),
+                controller.riding.get(0, Counter()))
+        # 2 people in the lift stopping on 2, then 3 of them stopping on 5
+        self.assertAlmostEqual(
+            total_journey_time(elevator1, *args),
+            total_journey_time(without_dwell, *args) + 3 * (2 + 3))
+
+    def test_journey_time_with_step_timing(self):
+        rng = random.Random(21)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        for i in range(200):
+            controller = MultipleElevatorController(
+                [random_elevator(rng, LEVELS) for j in range(2)])
+            for j in range(rng.randrange(1, 5)):
+                origin, destination = rng.sample(range(len(LEVELS)), 2)
+                controller.call_destination(origin, destination)
+                controller.step_forward()
+            args = (controller.elevators[0], controller.waiting.get(0, {}),
+                    controller.riding.get(0, Counter()))
+            expected = total_journey_time(*args)
+            controller.elevators[0].timing = StepTiming()
+            self.assertEqual(total_journey_time(*args), expected)
+
+
+class TestCommandRuns(unittest.TestCase):
+
+    def test_same_as_per_floor_commands(self):
+        rng = random.Random(18)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        for i in range(300):
+            elevator1 = random_elevator(rng, LEVELS)
+            # The per floor commands as they were built before runs
+            expected = []
+            if elevator1.is_visiting(elevator1.current_level,
+                                     elevator1.direction):
+                expected += [ElevatorCommand.OPEN_DOOR,
+                             ElevatorCommand.CLOSE_DOOR]
+            elif elevator1.door_status == ElevatorDoorStatus.OPEN:
+                expected.append(ElevatorCommand.CLOSE_DOOR)
+            levels = [elevator1.current_level] + elevator1.visit_plan()
+            for level1, level2 in elevator.pairwise(levels):
+                expected += elevator1.gen_commands_lvl_to_lvl(level1, level2)
+            self.assertEqual(list(elevator1.generate_commands()), expected)
+            runs = list(elevator1.generate_command_runs())
+            self.assertEqual(
+                [command for command, count in runs for j in range(count)],
+                expected)
+
+    def test_visiting_both_ways_on_the_same_level(self):
+        elevator1 = elevator.Elevator([str(lvl) for lvl in range(5)])
+        elevator1.call_elevator(2, ElevatorDirection.UP)
+        elevator1.call_elevator(2, ElevatorDirection.DOWN)
+        self.assertEqual(list(elevator1.generate_commands()),
+                         [ElevatorCommand.UP, ElevatorCommand.UP,
+                          ElevatorCommand.OPEN_DOOR,
+                          ElevatorCommand.CLOSE_DOOR])
+        # What the lift really runs, see plan_stream.command_runs
+        self.assertEqual(list(command_runs(elevator1)),
+                         [(ElevatorCommand.UP, 2),
+                          (ElevatorCommand.OPEN_DOOR, 1),
+                          (ElevatorCommand.OPEN_DOOR, 1),
+                          (ElevatorCommand.CLOSE_DOOR, 1)])
+
+    def test_long_trip_is_one_run(self):
+        elevator1 = elevator.Elevator([str(lvl) for lvl in range(100)])
+        elevator1.select_level(99)
+        self.assertEqual(list(elevator1.generate_command_runs()),
+                         [(ElevatorCommand.UP, 99),
+                          (ElevatorCommand.OPEN_DOOR, 1),
+                          (ElevatorCommand.CLOSE_DOOR, 1)])
+
+    def test_tables_shared(self):
+        self.assertIs(elevator.Elevator("G 1 2".split())._tables,
+                      elevator.Elevator("P1 G 1".split())._tables)
+
+
+class TestPlanStream(unittest.TestCase):
+
+    def test_runs_same_as_stepping(self):
+        rng = random.Random(18)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        for i in range(300):
+            elevator1 = random_elevator(rng, LEVELS)
+            # What the lift really does, step by step
+            elevator2 = copy(elevator1)
+            expected = []
+            while elevator2.next_command() is not None:
+                expected.append(elevator2.next_command())
+                elevator2.step_forward()
+                self.assertLess(len(expected), 200)
+            runs = list(command_runs(elevator1))
+            self.assertEqual(
+                [command for command, count in runs for j in range(count)],
+                expected)
+
+    def test_segment_names(self):
+        self.assertEqual(str(PlanSegment(ElevatorCommand.UP, 12)), "UP x12")
+        self.assertEqual(str(PlanSegment(ElevatorCommand.OPEN_DOOR, 1)),
+                         "OPEN_DOOR")
+
+    def test_only_what_changed_is_sent(self):
+        elevator1 = elevator.Elevator([str(lvl) for lvl in range(20)])
+        elevator1.select_level(15)
+        sent = []
+        stream = PlanStream(elevator1, sent.append)
+        self.assertEqual([str(diff) for diff in sent],
+                         ["[0:0] UP x15, OPEN_DOOR, CLOSE_DOOR"])
+        for i in range(3):
+            elevator1.step_forward()
+        # Travelling as planned sends nothing
+        self.assertEqual(len(sent), 1)
+        elevator1.call_elevator(10, ElevatorDirection.UP)
+        elevator1.step_forward()
+        # Just the new stop, 7 UPs from where we were
+        self.assertEqual(sent[1], PlanDiff(7, 7, (
+            PlanSegment(ElevatorCommand.OPEN_DOOR, 1),
+            PlanSegment(ElevatorCommand.CLOSE_DOOR, 1))))
+        self.assertEqual([str(segment) for segment in stream.plan],
+                         ["UP x6", "OPEN_DOOR", "CLOSE_DOOR", "UP x5",
+                          "OPEN_DOOR", "CLOSE_DOOR"])
+        # Calling it where it's already going anyway changes nothing
+        elevator1.select_level(15)
+        stream.flush()
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(stream.segments_sent, 5)
+
+    def test_receiver_keeps_up(self):
+        rng = random.Random(24)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        for i in range(50):
+            elevator1 = random_elevator(rng, LEVELS)
+            received = []
+
+            def receive(diff):
+                received[:] = apply_diff(received, diff)
+            stream = PlanStream(elevator1, receive)
+            settled = False
+            for j in range(40):
+                action = rng.random()
+                level_no = rng.randrange(len(LEVELS))
+                direction = rng.choice(list(ElevatorDirection))
+                if action < 0.15:
+                    elevator1.select_level(level_no)
+                elif action < 0.3:
+                    try:
+                        elevator1.call_elevator(level_no, direction)
+                    except ElevatorOutOfBoundsException:
+                        pass
+                elif action < 0.35:
+                    try:
+                        elevator1.check_call(level_no, direction)
+                    except ElevatorOutOfBoundsException:
+                        continue
+                    elevator1.add_level(level_no, direction)
+                    # Until it steps we may not be going the right way
+                    settled = False
+                elif action < 0.4:
+                    # Not something the stream is told about
+                    elevator1.levels_to_visit[level_no].add(direction)
+                elif action < 0.5:
+                    # A what if, undone again
+                    state = elevator1.snapshot()
+                    elevator1.select_level(level_no)
+                    elevator1.restore(state)
+                elif action < 0.6 and settled:
+                    # Like controller.advance(), only ever travels
+                    num_steps = elevator1.steps_until_event()
+                    if elevator1.next_command() in (ElevatorCommand.UP,
+                                                    ElevatorCommand.DOWN):
+                        elevator1.travel(num_steps)
+                        received[:] = split_plan(received, num_steps)[1]
+                elif elevator1.next_command() is not None:
+                    elevator1.step_forward()
+                    received[:] = split_plan(received, 1)[1]
+                    settled = True
+                stream.flush()
+                self.assertEqual(received, plan_segments(elevator1))
+            stream.close()
+            self.assertIsNone(elevator1.plan_listener)
+
+    def test_whole_bank(self):
+        rng = random.Random(25)
+        LEVELS = [str(lvl) for lvl in range(15)]
+        controller = MultipleElevatorController(
+            [random_elevator(rng, LEVELS) for i in range(3)])
+        received = [[] for elevator1 in controller.elevators]
+
+        def receive(index, diff):
+            received[index] = apply_diff(received[index], diff)
+        streams = stream_plans(controller.elevators, receive)
+        for i in range(150):
+            origin, destination = rng.sample(range(len(LEVELS)), 2)
+            if rng.random() < 0.3:
+                # Tries each lift out on the real thing first
+                controller.call_destination(origin, destination)
+            running = [elevator1.next_command()
+                       for elevator1 in controller.elevators]
+            controller.step_forward()
+            for index, stream in enumerate(streams):
+                if running[index] is not None:
+                    # Run after any diff sent just before it
+                    received[index] = split_plan(received[index], 1)[1]
+                stream.flush()
+                self.assertEqual(
+                    received[index],
+                    plan_segments(controller.elevators[index]))
+        # Far fewer segments than sending every plan every tick
+        self.assertLess(sum(stream.segments_sent for stream in streams),
+                        150 * 3)
+
+    def test_copies_dont_stream(self):
+        elevator1 = elevator.Elevator([str(lvl) for lvl in range(5)])
+        sent = []
+        PlanStream(elevator1, sent.append)
+        self.assertEqual(sent, [])
+        elevator_copy = copy(elevator1)
+        self.assertIsNone(elevator_copy.plan_listener)
+        elevator_copy.select_level(3)
+        elevator_copy.step_forward()
+        self.assertEqual(sent, [])
+
+
+class TestFleetSnapshot(unittest.TestCase):
+
+    def test_published_every_tick(self):
+        rng = random.Random(15)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController(
+            [random_elevator(rng, LEVELS) for i in range(4)],
+            publish_snapshots=True)
+        held = controller.fleet_snapshot
+        held_cars = deepcopy(held.cars)
+        for i in range(1, 20):
+            controller.step_forward()
+            snapshot = controller.fleet_snapshot
+            self.assertEqual((snapshot.version, snapshot.tick), (i, i))
+            self.assertEqual(
+                [(car.current_level, car.door_status, car.direction,
+                  car.status) for car in snapshot.cars],
+                [(e.current_level, e.door_status, e.direction, e.status)
+                 for e in controller.elevators])
+        # Old snapshots never change under their readers
+        self.assertEqual(held.version, 0)
+        self.assertEqual(held.cars, held_cars)
+
+    def test_advance_publishes(self):
+        controller = MultipleElevatorController(
+            [elevator.Elevator("G 1 2 3".split())], publish_snapshots=True)
+        controller.select_level(0, 3)
+        controller.advance(50)
+        self.assertEqual(controller.fleet_snapshot.tick, 50)
+        self.assertEqual(controller.fleet_snapshot.cars[0].current_level, 3)
+
+    def test_off_by_default(self):
+        controller = MultipleElevatorController(
+            [elevator.Elevator("G 1 2 3".split())])
+        controller.select_level(0, 3)
+        controller.step_forward()
+        controller.advance(10)
+        self.assertIsNone(controller.fleet_snapshot)
+        # Turned on later
+        controller.publish_snapshots = True
+        controller.step_forward()
+        self.assertEqual(controller.fleet_snapshot.tick, 12)
+
+
+class TestAdvance(unittest.TestCase):
+
+    def test_same_as_stepping(self):
+        rng = random.Random(12)
+        LEVELS = [str(lvl) for lvl in range(30)]
+        for i in range(200):
+            stepped = MultipleElevatorController(
+                [random_elevator(rng, LEVELS) for j in range(3)])
+            jumped = deepcopy(stepped)
+            stepped_metrics = MetricsCollector()
+            stepped_metrics.attach(stepped)
+            jumped_metrics = MetricsCollector()
+            jumped_metrics.attach(jumped)
+            for j in range(rng.randrange(1, 4)):
+                num_steps = rng.randrange(60)
+                for k in range(num_steps):
+                    stepped.step_forward()
+                jumped.advance(num_steps)
+                self.assertEqual(jumped.tick, stepped.tick)
+                self.assertEqual(jumped.snapshot(), stepped.snapshot())
+                from_level, direction = rng.choice(list(valid_calls(LEVELS)))
+                stepped.call_elevator(from_level, direction)
+                jumped.call_elevator(from_level, direction)
+            self.assertEqual(jumped_metrics.summary(),
+                             stepped_metrics.summary())
+
+    def test_jumps_idle_ticks(self):
+        controller = MultipleElevatorController(
+            [elevator.Elevator("G 1 2 3".split())])
+        controller.advance_to(10 ** 9)
+        self.assertEqual(controller.tick, 10 ** 9)
+
+
+class TestFastestElevator(unittest.TestCase):
+
+    def test_lower_bound(self):
+        rng = random.Random(13)
+        LEVELS = [str(lvl) for lvl in range(15)]
+        for i in range(500):
+            elevator1 = random_elevator(rng, LEVELS)
+            for from_level, direction in valid_calls(LEVELS):
+                self.assertLessEqual(
+                    elevator1.steps_lower_bound(from_level, direction),
+                    elevator1.steps_to_reach(from_level, direction))
+
+    def test_same_as_scoring_every_lift(self):
+        rng = random.Random(13)
+        LEVELS = [str(lvl) for lvl in range(20)]
+        for i in range(100):
+            # Lots of lifts in few levels so there are plenty of ties
+            controller = MultipleElevatorController(
+                [random_elevator(rng, LEVELS) for j in range(12)])
+            for from_level, direction in valid_calls(LEVELS):
+                expected = min(
+                    controller.elevators,
+                    key=lambda e: simulate_steps_to_get_to_level(
+                        e, from_level, direction))
+                self.assertIs(
+                    controller.fastest_elevator(from_level, direction),
+                    expected)
+
+
+class TestEtaCache(unittest.TestCase):
+
+    def test_same_as_working_it_out(self):
+        rng = random.Random(22)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        controller = MultipleElevatorController(
+            [random_elevator(rng, LEVELS) for j in range(6)] +
+            [elevator.Elevator(LEVELS) for j in range(3)])
+        controller.eta_cache = cache = EtaCache(maxsize=64)
+        uncached = deepcopy(controller)
+        uncached.eta_cache = None
+        for tick in range(200):
+            call = rng.choice(list(valid_calls(LEVELS)))
+            for lift in controller.elevators:
+                # Lifts change every tick, the cache must keep up
+                self.assertEqual(cache.eta(lift, *call), lift.eta(*call))
+            chosen = controller.fastest_elevator(*call)
+            self.assertEqual(
+                controller.elevators.index(chosen),
+                uncached.elevators.index(uncached.fastest_elevator(*call)))
+            if tick % 3 == 0:
+                controller.call_elevator(*call)
+                uncached.call_elevator(*call)
+            controller.step_forward()
+            uncached.step_forward()
+            self.assertLessEqual(len(cache), 64)
+        self.assertGreater(cache.hits, 0)
+        self.assertGreater(cache.misses, 0)
+
+    def test_identical_lifts_share(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        lifts = [elevator.Elevator(LEVELS) for j in range(4)]
+        cache = EtaCache()
+        for lift in lifts:
+            self.assertEqual(cache.eta(lift, 5, ElevatorDirection.UP), 5)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (3, 1, 1))
+        lifts[0].select_level(2)
+        self.assertEqual(cache.eta(lifts[0], 5, ElevatorDirection.UP), 7)
+        self.assertEqual(cache.info(), {"hits": 3, "misses": 2, "size": 2,
+                                        "maxsize": 4096})
+        # A different timing model is a different ETA
+        lifts[1].timing = TimingModel()
+        self.assertEqual(cache.eta(lifts[1], 5, ElevatorDirection.UP),
+                         lifts[1].time_to_reach(5, ElevatorDirection.UP))
+        cache.clear()
+        self.assertEqual(cache.info(), {"hits": 0, "misses": 0, "size": 0,
+                                        "maxsize": 4096})
+
+    def test_bounded(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        lift = elevator.Elevator(LEVELS)
+        cache = EtaCache(maxsize=3)
+        for level_no in (1, 2, 3):
+            cache.eta(lift, level_no, ElevatorDirection.UP)
+        # 1 was used last so 2 goes first
+        cache.eta(lift, 1, ElevatorDirection.UP)
+        cache.eta(lift, 4, ElevatorDirection.UP)
+        self.assertEqual(len(cache), 3)
+        cache.eta(lift, 1, ElevatorDirection.UP)
+        cache.eta(lift, 2, ElevatorDirection.UP)
+        self.assertEqual((cache.hits, cache.misses), (2, 5))
+        with self.assertRaises(ElevatorOutOfBoundsException):
+            cache.eta(lift, 0, ElevatorDirection.DOWN)
+        self.assertEqual(len(cache), 3)
+        with self.assertRaises(ValueError):
+            EtaCache(maxsize=0)
+
+
+class TestDestinationDispatch(unittest.TestCase):
+
+    def test_total_journey_time(self):
+        ''' Worked out journeys have to match what actually happens '''
+        rng = random.Random(17)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        for i in range(300):
+            controller = MultipleElevatorController(
+                [random_elevator(rng, LEVELS) for j in range(2)])
+            served = []
+            MetricsCollector(on_served=served.append).attach(controller)
+            for j in range(rng.randrange(1, 6)):
+                origin, destination = rng.sample(range(len(LEVELS)), 2)
+                controller.call_destination(origin, destination)
+                for k in range(rng.randrange(4)):
+                    controller.step_forward()
+            expected = total_journey_time(
+                controller.elevators[0], controller.waiting.get(0, {}),
+                controller.riding.get(0, {}))
+            start = controller.tick
+            served.clear()
+            while 0 in controller.waiting or 0 in controller.riding:
+                controller.step_forward()
+            # Doors open during the step that takes tick from t to t + 1
+            self.assertEqual(
+                expected, sum(request["served_tick"] + 1 - start
+                              for request in served
+                              if request["type"] == "select" and
+                              request["car"] == 0))
+
+    def test_destination_selected_on_arrival(self):
+        LEVELS = "G 1 2 3 4 5".split()
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS), elevator.Elevator(LEVELS)])
+        served = []
+        MetricsCollector(on_served=served.append).attach(controller)
+        car = controller.call_destination(3, 1, {"id": "a"})
+        self.assertFalse(car.is_visiting(1, ElevatorDirection.DOWN))
+        controller.advance(20)
+        self.assertEqual(
+            [(r["id"], r["type"], r["level"]) for r in served],
+            [("a", "call", 3), ("a", "select", 1)])
+        self.assertFalse(controller.waiting or controller.riding)
+        with self.assertRaises(ElevatorOutOfBoundsException):
+            controller.call_destination(2, 2)
+
+    def test_shorter_journeys_than_nearest(self):
+        results = bench_destination_dispatch(num_passengers=150, seed=17)
+        self.assertLess(results["destination"]["journey"],
+                        results["nearest"]["journey"])
+
+
+class TestCapacity(unittest.TestCase):
+
+    def test_hall_calls(self):
+        elevator1 = elevator.Elevator([str(lvl) for lvl in range(10)])
+        elevator1.call_elevator(5, ElevatorDirection.UP)
+        self.assertTrue(elevator1.is_hall_call(5, ElevatorDirection.UP))
+        elevator1.select_level(7)
+        elevator1.call_elevator(7, ElevatorDirection.UP)
+        # Someone is getting out there anyway
+        self.assertFalse(elevator1.is_hall_call(7, ElevatorDirection.UP))
+        elevator1.call_elevator(3, ElevatorDirection.DOWN)
+        self.assertEqual(elevator1.hall_calls(),
+                         [(5, ElevatorDirection.UP),
+                          (3, ElevatorDirection.DOWN)])
+
+        state = elevator1.snapshot()
+        self.assertEqual(elevator1.drop_hall_calls(),
+                         [(5, ElevatorDirection.UP),
+                          (3, ElevatorDirection.DOWN)])
+        self.assertEqual(list(elevator1.generate_commands()),
+                         [ElevatorCommand.UP] * 7 +
+                         [ElevatorCommand.OPEN_DOOR,
+                          ElevatorCommand.CLOSE_DOOR])
+        elevator1.restore(state)
+        self.assertTrue(elevator1.is_hall_call(3, ElevatorDirection.DOWN))
+
+        elevator1.select_level(5, ElevatorDirection.UP)
+        self.assertFalse(elevator1.is_hall_call(5, ElevatorDirection.UP))
+        for i in range(30):
+            elevator1.step_forward()
+        self.assertEqual(elevator1.hall_calls(), [])
+
+    def test_full_lifts_are_skipped(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS, capacity=4) for i in range(2)])
+        controller.elevators[0].load = 4
+        self.assertTrue(controller.elevators[0].is_full)
+        self.assertIs(controller.call_elevator(3, ElevatorDirection.UP),
+                      controller.elevators[1])
+        self.assertEqual(controller.call_elevators(
+            [(4, ElevatorDirection.UP)]),
+            {(4, ElevatorDirection.UP): controller.elevators[1]})
+        # Somebody has to come
+        controller.elevators[1].load = 5
+        self.assertIs(controller.call_elevator(3, ElevatorDirection.DOWN),
+                      controller.elevators[0])
+
+    def test_full_lift_goes_past_hall_calls(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController([
+            elevator.Elevator(LEVELS, current_level=2, capacity=2,
+                              door_status=ElevatorDoorStatus.OPEN),
+            elevator.Elevator(LEVELS, capacity=2)])
+        metrics = MetricsCollector()
+        metrics.attach(controller)
+        self.assertIs(controller.call_elevator(5, ElevatorDirection.UP),
+                      controller.elevators[0])
+        controller.select_level(0, 8)
+        # eg. from a load sensor
+        controller.elevators[0].load = 2
+        opened = []
+        for i in range(20):
+            for index, elevator1 in enumerate(controller.elevators):
+                if elevator1.next_command() == ElevatorCommand.OPEN_DOOR:
+                    opened.append((index, elevator1.current_level))
+            controller.step_forward()
+        self.assertEqual(opened, [(1, 5), (0, 8)])
+        # Waited for lift 1 from the start
+        self.assertEqual(metrics.wait.counts, {5: 1})
+        self.assertEqual(metrics.summary()["waiting"], 0)
+
+    def test_destination_dispatch_load(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController([
+            elevator.Elevator(LEVELS, capacity=2),
+            elevator.Elevator(LEVELS, current_level=9, capacity=2)])
+        for i in range(3):
+            controller.call_destination(0, 5)
+        # The first 2 got straight in, the 3rd has to wait for lift 1
+        self.assertEqual(controller.elevators[0].load, 2)
+        self.assertEqual(controller.waiting, {1: {(0, True): [(5, None)]}})
+        for i in range(30):
+            controller.step_forward()
+        self.assertEqual([e.load for e in controller.elevators], [0, 0])
+        self.assertEqual(controller.riding, {})
+
+    def test_left_behind(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController([
+            elevator.Elevator(LEVELS, current_level=6, capacity=2),
+            elevator.Elevator(LEVELS, current_level=9, capacity=2)])
+        for i in range(3):
+            controller.assign_destination(0, 4, 0)
+        for i in range(4):
+            controller.step_forward()
+        # 2 got in, lift 1 comes for the other
+        self.assertEqual(controller.elevators[0].load, 2)
+        self.assertEqual(controller.waiting, {1: {(4, False): [(0, None)]}})
+        self.assertTrue(controller.elevators[1].is_visiting(
+            4, ElevatorDirection.DOWN))
+
+    def test_left_behind_keep_waiting(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController([
+            elevator.Elevator(LEVELS, current_level=6, capacity=2),
+            elevator.Elevator(LEVELS, current_level=9, capacity=2)])
+        served = []
+        MetricsCollector(on_served=served.append).attach(controller)
+        for i in range(3):
+            controller.assign_destination(0, 4, 0, {"id": i})
+        for i in range(4):
+            controller.step_forward()
+        # Only the 2 who got in have stopped waiting
+        self.assertEqual([(r["id"], r["car"]) for r in served
+                          if r["type"] == "call"], [(0, 0), (1, 0)])
+        self.assertEqual(
+            [r["id"] for r in
+             controller.metrics.pending[1, 4, ElevatorDirection.DOWN]], [2])
+        while controller.waiting or controller.riding:
+            controller.step_forward()
+        [left_behind] = [r for r in served
+                         if r["type"] == "call" and r["id"] == 2]
+        self.assertEqual(left_behind["car"], 1)
+        self.assertEqual(left_behind["wait"], left_behind["served_tick"])
+        self.assertGreater(left_behind["wait"], 5)
+
+    def test_load_from_calls_and_selections(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController([
+            elevator.Elevator(LEVELS, capacity=2),
+            elevator.Elevator(LEVELS, current_level=9, capacity=2)])
+        metrics = MetricsCollector()
+        metrics.attach(controller)
+        for i in range(2):
+            self.assertIs(controller.call_elevator(3, ElevatorDirection.UP),
+                          controller.elevators[0])
+        controller.advance(4)
+        # Both got in when it opened on 3
+        self.assertEqual(controller.elevators[0].load, 2)
+        self.assertTrue(controller.elevators[0].is_full)
+        # So it is skipped
+        self.assertIs(controller.call_elevator(6, ElevatorDirection.UP),
+                      controller.elevators[1])
+        for i in range(2):
+            controller.select_level(0, 8)
+        controller.advance(20)
+        self.assertEqual([e.load for e in controller.elevators], [0, 1])
+        self.assertEqual(controller.hall_callers, Counter())
+        self.assertEqual(controller.getting_out, Counter())
+        self.assertEqual(metrics.summary()["waiting"], 0)
+
+    def test_callers_left_behind(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController([
+            elevator.Elevator(LEVELS, capacity=1),
+            elevator.Elevator(LEVELS, current_level=9, capacity=1)])
+        served = []
+        MetricsCollector(on_served=served.append).attach(controller)
+        for i in range(2):
+            controller.call_elevator(3, ElevatorDirection.UP, {"id": i})
+        controller.advance(30)
+        # 1 fits in each
+        self.assertEqual([e.load for e in controller.elevators], [1, 1])
+        self.assertEqual([(r["id"], r["car"]) for r in served],
+                         [(0, 0), (1, 1)])
+        self.assertLess(served[0]["wait"], served[1]["wait"])
+
+    def test_everyone_gets_there(self):
+        rng = random.Random(25)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS, capacity=3) for i in range(3)])
+        for tick in range(400):
+            if tick < 300:
+                origin, destination = rng.sample(range(len(LEVELS)), 2)
+                controller.call_destination(origin, destination)
+            controller.step_forward()
+            for index, elevator1 in enumerate(controller.elevators):
+                self.assertEqual(
+                    elevator1.load,
+                    sum(controller.riding.get(index, Counter()).values()))
+        self.assertEqual(controller.waiting, {})
+        self.assertEqual(controller.riding, {})
+
+
+class TestBatchCalls(unittest.TestCase):
+    ''' Calling lots of lifts at once '''
+
+    def test_profile_matches_steps_to_reach(self):
+        rng = random.Random(99)
+        for i in range(300):
+            levels = [str(lvl) for lvl in range(rng.randrange(2, 12))]
+            elevator1 = random_elevator(rng, levels)
+            profile = SweepProfile(elevator1)
+            for from_level, direction in valid_calls(levels):
+                self.assertEqual(
+                    profile.steps_to_reach(from_level, direction),
+                    elevator1.steps_to_reach(from_level, direction))
+
+    def test_bounds_and_steps_ahead(self):
+        rng = random.Random(98)
+        for i in range(300):
+            levels = [str(lvl) for lvl in range(rng.randrange(2, 12))]
+            elevator1 = random_elevator(rng, levels)
+            state = bound_state(elevator1)
+            for from_level, direction in valid_calls(levels):
+                going_up = direction == ElevatorDirection.UP
+                steps = elevator1.steps_to_reach(from_level, direction)
+                self.assertEqual(
+                    steps_lower_bounds([state], from_level, going_up),
+                    [elevator1.steps_lower_bound(from_level, direction)])
+                ahead = steps_ahead(state, from_level, going_up)
+                self.assertIn(ahead, (None, steps))
+                if (going_up == elevator1.is_going_up
+                        and (from_level - elevator1.current_level)
+                        * (1 if going_up else -1) >= 0):
+                    self.assertEqual(ahead, steps)
+
+    def test_joint_counts_delay_to_other_calls(self):
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS, 2), elevator.Elevator(LEVELS, 3)])
+        state = controller.snapshot()
+        calls = [(6, ElevatorDirection.UP), (4, ElevatorDirection.UP)]
+        # Lift 1 is sooner for both, but stopping at 4 on the way
+        # makes it 2 steps later to 6
+        greedy = controller.call_elevators(calls)
+        self.assertEqual([controller.elevators.index(greedy[call])
+                          for call in calls], [1, 1])
+        controller.restore(state)
+        joint = controller.call_elevators(calls, joint=True)
+        self.assertEqual([controller.elevators.index(joint[call])
+                          for call in calls], [1, 0])
+        self.assertEqual(sum(elevator1.steps_to_reach(*call)
+                             for call, elevator1 in joint.items()), 5)
+
+    def test_single_call_matches_call_elevator(self):
+        rng = random.Random(5)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        for i in range(50):
+            elevators = [random_elevator(rng, LEVELS) for j in range(3)]
+            controller = MultipleElevatorController(elevators)
+            call = rng.choice(list(valid_calls(LEVELS)))
+            state = controller.snapshot()
+            expected = controller.call_elevator(*call)
+            controller.restore(state)
+            self.assertEqual(controller.call_elevators([call]),
+                             {call: expected})
+
+    def test_greedy_same_as_one_at_a_time(self):
+        rng = random.Random(12)
+        LEVELS = [str(lvl) for lvl in range(15)]
+        for i in range(100):
+            controller = MultipleElevatorController(
+                [random_elevator(rng, LEVELS) for j in range(4)])
+            calls = list(dict.fromkeys(rng.choice(list(valid_calls(LEVELS)))
+                                       for j in range(10)))
+            reference = deepcopy(controller)
+            expected = {call: reference.elevators.index(
+                            reference.call_elevator(*call))
+                        for call in calls}
+            assigned = controller.call_elevators(calls)
+            self.assertEqual(
+                {call: controller.elevators.index(elevator1)
+                 for call, elevator1 in assigned.items()}, expected)
+            self.assertEqual(controller.snapshot(), reference.snapshot())
+
+    def test_every_call_assigned(self):
+        rng = random.Random(11)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        for joint in (False, True):
+            elevators = [random_elevator(rng, LEVELS) for j in range(3)]
+            controller = MultipleElevatorController(elevators)
+            calls = [rng.choice(list(valid_calls(LEVELS)))
+                     for j in range(20)]
+            assigned = controller.call_elevators(calls, joint=joint)
+            self.assertEqual(set(assigned), set(calls))
+            for (from_level, direction), elevator1 in assigned.items():
+                # Either it's coming or it's already there
+                self.assertTrue(
+                    direction in elevator1.levels_to_visit[from_level] or
+                    elevator1.current_level == from_level and
+                    elevator1.direction == direction)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestFleetSimulator(unittest.TestCase):
+    ''' The NumPy fleet has to move exactly like the Elevators do '''
+
+    def assertSameState(self, fleet, elevators):
+        for index, elevator1 in enumerate(elevators):
+            copy1 = fleet.to_elevator(index, elevator1.levels)
+            self.assertEqual(
+                (copy1.current_level, copy1.direction, copy1.door_status,
+                 copy1.current_command, dict(copy1.levels_to_visit)),
+                (elevator1.current_level, elevator1.direction,
+                 elevator1.door_status, elevator1.current_command,
+                 dict(elevator1.levels_to_visit)))
+
+    def test_same_trajectories(self):
+        rng = random.Random(2020)
+        for i in range(20):
+            levels = [str(lvl) for lvl in range(rng.randrange(2, 20))]
+            elevators = [random_elevator(rng, levels) for j in range(8)]
+            fleet = FleetSimulator.from_elevators(elevators)
+            self.assertSameState(fleet, elevators)
+            for tick in range(60):
+                if rng.random() < 0.3:
+                    index = rng.randrange(len(elevators))
+                    level_no = rng.randrange(len(levels))
+                    elevators[index].select_level(level_no)
+                    fleet.select_level(index, level_no)
+                if rng.random() < 0.3:
+                    index = rng.randrange(len(elevators))
+                    from_level, direction = rng.choice(
+                        list(valid_calls(levels)))
+                    elevators[index].call_elevator(from_level, direction)
+                    fleet.call_elevator(index, from_level, direction)
+                for elevator1 in elevators:
+                    elevator1.step_forward()
+                fleet.step_forward()
+                self.assertSameState(fleet, elevators)
+
+
+class TestParallelScoring(unittest.TestCase):
+    ''' Scoring on a process pool must match doing it here '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def test_same_elevator_chosen(self):
+        rng = random.Random(17)
+        LEVELS = [str(lvl) for lvl in range(15)]
+        elevators = [random_elevator(rng, LEVELS) for i in range(5)]
+        copies = [copy(e) for e in elevators]
+        serial = MultipleElevatorController(elevators)
+        parallel = MultipleElevatorController(copies, self.executor)
+        for i in range(10):
+            call = rng.choice(list(valid_calls(LEVELS)))
+            self.assertEqual(
+                serial.elevators.index(serial.call_elevator(*call)),
+                parallel.elevators.index(parallel.call_elevator(*call)))
+            serial.step_forward()
+            parallel.step_forward()
+
+    def test_same_elevator_chosen_with_timing(self):
+        rng = random.Random(30)
+        LEVELS = [str(lvl) for lvl in range(15)]
+        elevators = [random_elevator(rng, LEVELS) for i in range(6)]
+        for elevator1 in elevators:
+            elevator1.timing = TimingModel(
+                max_speed=rng.choice((0.5, 1.0, 4.0)))
+        copies = [copy(e) for e in elevators]
+        serial = MultipleElevatorController(elevators)
+        parallel = MultipleElevatorController(copies, self.executor)
+        for i in range(10):
+            call = rng.choice(list(valid_calls(LEVELS)))
+            self.assertEqual(
+                serial.elevators.index(serial.call_elevator(*call)),
+                parallel.elevators.index(parallel.call_elevator(*call)))
+            serial.step_forward()
+            parallel.step_forward()
+
+    def test_pack_keeps_everything(self):
+        rng = random.Random(31)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        for i in range(100):
+            elevator1 = random_elevator(rng, LEVELS)
+            elevator1.timing = rng.choice((None, TimingModel()))
+            elevator1.capacity = rng.choice((None, 4))
+            elevator1.load = rng.randrange(5)
+            elevator2 = unpack(pack(elevator1))
+            self.assertEqual(elevator2.snapshot()[:5],
+                             elevator1.snapshot()[:5])
+            self.assertEqual(elevator2.snapshot()[7:],
+                             elevator1.snapshot()[7:])
+            self.assertIs(elevator2.timing, elevator1.timing)
+            self.assertEqual(elevator2.capacity, elevator1.capacity)
+
+    def test_simulate_scenarios(self):
+        rng = random.Random(23)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        elevators = [random_elevator(rng, LEVELS) for i in range(3)]
+        scenarios = [[(rng.randrange(20),) + rng.choice(
+                        list(valid_calls(LEVELS))) for j in range(8)]
+                     for i in range(4)]
+        serial = MultipleElevatorController(elevators)
+        parallel = MultipleElevatorController(elevators, self.executor)
+        state = serial.snapshot()
+        self.assertEqual(serial.simulate_scenarios(scenarios, 30),
+                         parallel.simulate_scenarios(scenarios, 30))
+        # Our real lifts didn't move
+        self.assertEqual(serial.snapshot(), state)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_batch_beats_one_at_a_time(self):
+        results = bench_batch(num_levels=60, num_elevators=24,
+                              num_calls=300, repeats=5)
+        self.assertEqual(results["batch_steps"], results["sequential_steps"])
+        self.assertGreater(results["batch_speedup"], 1.5, results)
+        self.assertLessEqual(results["joint_steps"],
+                             results["sequential_steps"])
+
+    def test_run_benchmarks(self):
+        runs = run_benchmarks(floor_counts=(5,), car_counts=(2,),
+                              queue_depths=(3,), num_ops=5, repeats=1)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(
+            set(runs[0]["results"]),
+            {"generate_commands", "generate_command_runs",
+             "elevator_step_forward", "reset_direction",
+             "steps_to_get_to_level", "controller_step_forward",
+             "call_elevator"})
+
+
+    def test_tick_cost(self):
+        results = bench_tick_cost(num_levels=10, num_elevators=2,
+                                  num_ticks=20, repeats=1)
+        self.assertEqual(set(results), {"plain_tick_s", "recorded_tick_s",
+                                        "recording_overhead",
+                                        "published_tick_s",
+                                        "publishing_overhead"})
+
+
+class TestPackage(unittest.TestCase):
+
+    def test_engine_imports_nothing_heavy(self):
+        results = bench_import_time(
+            ("MultipleElevatorController", "ElevatorRenderer"), repeats=1)
+        for result in results:
+            self.assertEqual(result["heavy"], [], result["import"])
+
+    def test_scripts_still_run(self):
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for script in ("benchmark.py", "policy_evaluator.py",
+                       "trace_replay.py"):
+            result = subprocess.run(
+                [sys.executable, os.path.join(folder, script), "--help"],
+                cwd=tempfile.gettempdir(), capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("usage:", result.stdout)
+
+    def test_lazy_exports(self):
+        package = importlib.import_module(__package__)
+        self.assertIs(package.Elevator, elevator.Elevator)
+        self.assertIs(package.MultipleElevatorController,
+                      MultipleElevatorController)
+        self.assertIn("EtaCache", dir(package))
+        with self.assertRaises(AttributeError):
+            package.NotAThing
+        for name in package.__all__:
+            if name != "FleetSimulator" or numpy is not None:
+                getattr(package, name)
+
+
+class FakeCanvas(object):
+    ''' Just enough of a tk.Canvas to check what gets drawn '''
+
+    def __init__(self):
+        self.items = {}
+        self.calls = 0
+
+    def _create(self, kind, coords, options):
+        self.calls += 1
+        item = len(self.items) + 1
+        self.items[item] = dict(options, kind=kind, coords=coords)
+        return item
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", coords, options)
+
+    def create_line(self, *coords, **options):
+        return self._create("line", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self._create("text", coords, options)
+
+    def coords(self, item, *coords):
+        self.calls += 1
+        self.items[item]["coords"] = coords
+
+    def itemconfig(self, item, **options):
+        self.calls += 1
+        self.items[item].update(options)
+
+
+class TestElevatorRenderer(unittest.TestCase):
+
+    def test_same_as_drawing_from_scratch(self):
+        rng = random.Random(14)
+        LEVELS = [str(lvl) for lvl in range(16)]
+        controller = MultipleElevatorController(
+            [random_elevator(rng, LEVELS) for i in range(8)],
+            publish_snapshots=True)
+        canvas = FakeCanvas()
+        renderer = ElevatorRenderer(canvas)
+        for i in range(40):
+            renderer.render(controller.fleet_snapshot.cars)
+            fresh = FakeCanvas()
+            ElevatorRenderer(fresh).render(
+                controller.fleet_snapshot.cars)
+            self.assertEqual(canvas.items, fresh.items)
+            controller.step_forward()
+
+    def test_only_changes_are_redrawn(self):
+        LEVELS = "G 1 2 3 4 5".split()
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS) for i in range(30)],
+            publish_snapshots=True)
+        canvas = FakeCanvas()
+        renderer = ElevatorRenderer(canvas)
+        renderer.render(controller.fleet_snapshot.cars)
+        self.assertEqual(canvas.calls, 30 * 6)
+        canvas.calls = 0
+        controller.step_forward()
+        renderer.render(controller.fleet_snapshot.cars)
+        self.assertEqual(canvas.calls, 0)
+        controller.select_level(3, 2)
+        controller.step_forward()
+        renderer.render(controller.fleet_snapshot.cars)
+        # Lift 3 moved all 6 items and changed its level / status labels
+        self.assertEqual(canvas.calls, 6 + 2)
+
+
+class TestTrajectoryLog(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "run.trj")
+
+    def test_round_trip(self):
+        rng = random.Random(16)
+        LEVELS = [str(lvl) for lvl in range(10)]
+        controller = MultipleElevatorController(
+            [random_elevator(rng, LEVELS) for i in range(3)])
+        controller.advance(5)
+        expected = []
+        with TrajectoryRecorder(self.path, 3, capacity_ticks=4) as recorder:
+            recorder.attach(controller)
+            for i in range(50):
+                if rng.random() < 0.3:
+                    controller.call_elevator(
+                        *rng.choice(list(valid_calls(LEVELS))))
+                controller.step_forward()
+                for car, e in enumerate(controller.elevators):
+                    expected.append((
+                        controller.tick, car, e.current_level, e.direction,
+                        e.door_status == ElevatorDoorStatus.OPEN,
+                        COMMANDS.index(e.current_command)))
+            # Jumping ahead still records every tick
+            controller.advance(20)
+        with TrajectoryLog(self.path) as log:
+            self.assertEqual(
+                (log.num_cars, log.first_tick, log.num_ticks), (3, 6, 70))
+            self.assertEqual(list(log.iter_ticks(0, 56)), expected)
+            # Only the ticks asked for
+            self.assertEqual(list(log.iter_ticks(10, 12)),
+                             [r for r in expected if 10 <= r[0] < 12])
+            if numpy is not None:
+                records = log.ticks(10, 12)
+                self.assertEqual([tuple(r) for r in records.tolist()],
+                                 [r for r in expected if 10 <= r[0] < 12])
+                del records
+
+    @unittest.skipIf(numpy is None, "needs NumPy")
+    def test_views_outlive_the_log(self):
+        controller = MultipleElevatorController(
+            [elevator.Elevator([str(lvl) for lvl in range(5)])
+             for i in range(2)])
+        controller.call_elevator(4, ElevatorDirection.DOWN)
+        with TrajectoryRecorder(self.path, 2) as recorder:
+            recorder.attach(controller)
+            controller.advance(10)
+        with TrajectoryLog(self.path) as log:
+            records = log.ticks(1, 11)
+            expected = records.tolist()
+        # Closing didn't raise and the view still reads the file
+        self.assertEqual(records.tolist(), expected)
+        self.assertEqual(len(expected), 20)
+        self.assertEqual(max(records["level"]), 4)
+
+    def test_header_on_growth(self):
+        controller = MultipleElevatorController(
+            [elevator.Elevator([str(lvl) for lvl in range(5)])])
+        recorder = TrajectoryRecorder(self.path, 1, capacity_ticks=4)
+        self.addCleanup(recorder.close)
+        recorder.attach(controller)
+        controller.advance(6)
+        # Grown once, the header has the ticks from before that
+        with TrajectoryLog(self.path) as log:
+            self.assertEqual((log.first_tick, log.num_ticks), (1, 4))
+
+    def test_not_a_log(self):
+        for contents in (b"\0" * 64, b""):
+            with open(self.path, "wb") as f:
+                f.write(contents)
+            # Doesn't leave the file open either
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", ResourceWarning)
+                with self.assertRaises(ValueError):
+                    TrajectoryLog(self.path)
+                gc.collect()
+            self.assertEqual(caught, [])
+
+    def test_ticks_without_numpy(self):
+        with TrajectoryRecorder(self.path, 1):
+            pass
+        with TrajectoryLog(self.path) as log:
+            with unittest.mock.patch.object(trajectory_log, "numpy", None):
+                with self.assertRaisesRegex(ImportError, "iter_ticks"):
+                    log.ticks(0, 1)
+
+
+class TestPolicyEvaluator(unittest.TestCase):
+
+    OPTIONS = dict(num_levels=8, num_elevators=2, rate=0.3, duration=150)
+
+    def test_od_matrix(self):
+        for pattern in PATTERNS:
+            matrix = od_matrix(pattern, 10)
+            self.assertAlmostEqual(sum(matrix.values()),
+                                   90 if pattern == "interfloor" else 1)
+            self.assertFalse([trip for trip in matrix if trip[0] == trip[1]])
+        up_peak = od_matrix("up-peak", 10)
+        self.assertAlmostEqual(
+            sum(weight for (origin, _), weight in up_peak.items()
+                if origin == 0), 0.85)
+
+    def test_passengers_reproducible(self):
+        matrix = od_matrix("lunch", 10)
+        passengers = generate_passengers(random.Random(20), matrix, 0.5, 400)
+        self.assertEqual(
+            passengers,
+            generate_passengers(random.Random(20), matrix, 0.5, 400))
+        ticks = [tick for tick, _, _ in passengers]
+        self.assertEqual(ticks, sorted(ticks))
+        # about rate * duration of them
+        self.assertLess(abs(len(passengers) - 200), 60)
+
+    def test_confidence_interval(self):
+        self.assertEqual(confidence_interval([3]), (3, None))
+        mean, half_width = confidence_interval([1, 2, 3])
+        self.assertEqual(mean, 2)
+        self.assertAlmostEqual(half_width, 4.303 / 3 ** 0.5)
+
+    def test_parallel_same_as_serial(self):
+        serial, runs = evaluate(seeds=range(3), **self.OPTIONS)
+        self.assertEqual(len(runs), 3 * 4 * 3)
+        self.assertFalse([run for run in runs if run["unserved"]])
+        with ProcessPoolExecutor(2) as executor:
+            parallel, _ = evaluate(seeds=range(3), executor=executor,
+                                   **self.OPTIONS)
+        self.assertEqual(parallel, serial)
+
+
+class TestShardedController(unittest.TestCase):
+
+    def test_same_as_running_banks_here(self):
+        rng = random.Random(21)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        banks = {bank: MultipleElevatorController(
+                     [random_elevator(rng, LEVELS) for i in range(3)])
+                 for bank in "abcde"}
+        local = deepcopy(banks)
+        ticks = [[(rng.choice("abcde"), "call",
+                   rng.choice(list(valid_calls(LEVELS))))
+                  for i in range(rng.randrange(4))]
+                 for j in range(30)]
+        with ShardedController(banks, num_workers=2) as sharded:
+            self.assertEqual(set(sharded.shards.values()), {0, 1})
+            for requests in ticks:
+                results = sharded.tick(requests)
+                expected = []
+                for bank, kind, args in requests:
+                    expected.append(local[bank].elevators.index(
+                        local[bank].call_elevator(*args)))
+                for controller in local.values():
+                    controller.step_forward()
+                self.assertEqual(results, expected)
+            sharded.select_level("a", 1, 7)
+            local["a"].select_level(1, 7)
+            sharded.step_forward(5)
+            for controller in local.values():
+                controller.advance(5)
+            snapshots = sharded.fleet_snapshots()
+            with self.assertRaises(ElevatorOutOfBoundsException):
+                sharded.call_elevator("b", 0, ElevatorDirection.DOWN)
+        for controller in local.values():
+            controller.publish()
+        self.assertEqual(
+            {bank: snapshot[1:] for bank, snapshot in snapshots.items()},
+            {bank: controller.fleet_snapshot[1:]
+             for bank, controller in local.items()})
+        # The controllers we gave it were left alone
+        self.assertEqual(banks["a"].tick, 0)
+
+
+class TestTraceReplay(unittest.TestCase):
+
+    def test_replay(self):
+        LEVELS = "G 1 2 3 4 5 6 7 8 9".split()
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS), elevator.Elevator(LEVELS)])
+        trace = [
+            '{"tick": 0, "call": 3, "direction": "UP"}',
+            '',
+            '{"tick": 0, "call": 0, "direction": "UP"}',
+            '{"tick": 5, "car": 0, "select": 7, "id": "to 7"}',
+        ]
+        results = list(TraceReplay(controller).replay(read_trace(trace)))
+        self.assertEqual(results, [
+            # Lift 0 was already on level 0 going up
+            {"id": 3, "type": "call", "tick": 0, "car": 0, "level": 0,
+             "direction": "UP", "served_tick": 0, "wait": 0},
+            {"id": 1, "type": "call", "tick": 0, "car": 0, "level": 3,
+             "direction": "UP", "served_tick": 3, "wait": 3},
+            {"id": "to 7", "type": "select", "tick": 5, "car": 0,
+             "level": 7, "direction": "UP", "served_tick": 9, "travel": 4},
+        ])
+        self.assertFalse(controller.elevators[0].levels_to_visit)
+
+    def test_wait_matches_steps_to_reach(self):
+        rng = random.Random(8)
+        LEVELS = [str(lvl) for lvl in range(12)]
+        for i in range(30):
+            controller = MultipleElevatorController(
+                [random_elevator(rng, LEVELS) for j in range(3)])
+            from_level, direction = rng.choice(list(valid_calls(LEVELS)))
+            expected = min(e.steps_to_reach(from_level, direction)
+                           for e in controller.elevators)
+            record = {"tick": 0, "call": from_level,
+                      "direction": direction.name, "id": 1}
+            [result] = TraceReplay(controller).replay([record])
+            self.assertEqual(result["wait"], expected)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_percentiles(self):
+        histogram = StreamingHistogram()
+        for value in range(1, 101):
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(50), 50)
+        self.assertEqual(histogram.percentile(95), 95)
+        self.assertEqual(histogram.percentile(99), 99)
+        self.assertEqual(histogram.mean, 50.5)
+        self.assertIsNone(StreamingHistogram().percentile(50))
+
+    def test_collector(self):
+        LEVELS = "G 1 2 3 4 5".split()
+        controller = MultipleElevatorController([elevator.Elevator(LEVELS)])
+        metrics = MetricsCollector()
+        metrics.attach(controller)
+        controller.call_elevator(2, ElevatorDirection.UP)
+        controller.call_elevator(2, ElevatorDirection.UP)
+        for i in range(3):
+            controller.step_forward()
+        controller.select_level(0, 5)
+        for i in range(5):
+            controller.step_forward()
+        self.assertEqual(metrics.wait.counts, {2: 2})
+        self.assertEqual(metrics.travel.counts, {4: 1})
+        # 2 people served together on tick 2 then 1 on tick 7
+        self.assertEqual(metrics.trips.counts, {0: 6, 2: 1, 1: 1})
+        self.assertEqual(metrics.summary()["waiting"], 0)
+
+        metrics.detach()
+        controller.call_elevator(0, ElevatorDirection.UP)
+        self.assertEqual(metrics.wait.count, 2)
+        self.assertIsNone(controller.elevators[0].observer)
+
+
+class FakeClock(object):
+    ''' A clock that only moves when something sleeps on it '''
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class TestAsyncElevatorService(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_producers(self):
+        LEVELS = "G 1 2 3 4 5 6 7 8 9".split()
+        controller = MultipleElevatorController(
+            [elevator.Elevator(LEVELS), elevator.Elevator(LEVELS)])
+        clock = FakeClock()
+        service = AsyncElevatorService(controller, 0.5, clock, clock.sleep)
+        states = service.subscribe()
+
+        async def producer(from_level):
+            return await service.call_elevator(from_level,
+                                               ElevatorDirection.UP)
+
+        runner = asyncio.ensure_future(service.run(num_ticks=10))
+        chosen = await asyncio.gather(producer(3), producer(5))
+        selected = await service.select_level(1, 8)
+        await runner
+        self.assertEqual(chosen, [0, 1])
+        self.assertIsNone(selected)
+        self.assertEqual(controller.tick, 10)
+        self.assertEqual(clock.sleeps, [0.5] * 10)
+        tick, cars = states.get_nowait()
+        self.assertEqual(tick, 1)
+        self.assertEqual(cars[0], (0, ElevatorDirection.UP,
+                                   ElevatorDoorStatus.CLOSED))
+
+    async def test_drift_correction_and_slow_subscribers(self):
+        LEVELS = "G 1 2 3".split()
+        controller = MultipleElevatorController([elevator.Elevator(LEVELS)])
+        clock = FakeClock()
+        service = AsyncElevatorService(controller, 1.0, clock, clock.sleep)
+        states = service.subscribe(max_queued=2)
+        real_tick = service.tick
+
+        def slow_tick():
+            real_tick()
+            # Each tick takes a while, 5th tick takes far too long
+            clock.now += 3.5 if controller.tick == 5 else 0.25
+        service.tick = slow_tick
+
+        await service.run(num_ticks=8)
+        # Still sleeping only the rest of each tick
+        self.assertEqual(clock.sleeps[:4], [0.75] * 4)
+        self.assertEqual(service.skipped_ticks, 2)
+        # Half a tick late, so go again straight away then back on time
+        self.assertEqual(clock.sleeps[4:6], [0, 0.25])
+        # Only the 2 newest states are kept
+        self.assertEqual([states.get_nowait()[0] for i in range(2)], [7, 8])
+        self.assertTrue(states.empty())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,82 @@
+'''
+How long lifts take to do things, so ETAs can be in seconds rather than
+in steps.
+
+Give a lift a timing model with elevator.timing = TimingModel(...) and
+its ETAs (and so which lift gets sent) use it. Everything is worked out
+with a formula rather than simulated, so it costs no more than counting
+steps.
+'''
+from math import sqrt
+
+
+class StepTiming(object):
+    '''
+    Every command takes 1 step, the same as counting steps.
+    Lifts without a timing model are timed with this.
+
+    Attributes:
+      door_open_time (float): opening the doors
+      door_close_time (float): closing them again
+      dwell_time (float): doors held open at every stop
+      per_passenger_dwell (float): doors held open that much longer for
+             every person in the lift
+    '''
+    door_open_time = 1
+    door_close_time = 1
+    dwell_time = 0
+    per_passenger_dwell = 0
+
+    def dwell(self, load:int):
+        ''' How long the doors are held open at a stop with load
+        people in the lift, more people take longer to get in and out '''
+        return self.dwell_time + self.per_passenger_dwell * load
+
+    def travel_time(self, num_levels:int):
+        ''' Time to travel num_levels from standing to standing '''
+        return num_levels
+
+
+class TimingModel(StepTiming):
+    '''
+    A lift that speeds up at acceleration until max_speed and slows down
+    the same way, in seconds.
+
+    Attributes:
+      floor_height (float): metres between levels
+      max_speed (float): metres per second once cruising
+      acceleration (float): metres per second per second, both speeding
+             up and slowing down
+      door_open_time (float): seconds to open the doors
+      door_close_time (float): seconds to close them
+      dwell_time (float): seconds the doors are held open at every stop
+      per_passenger_dwell (float): extra seconds they are held open for
+             every person in the lift (see Elevator.load)
+    '''
+
+    def __init__(self, floor_height:float=3.5, max_speed:float=2.5,
+                 acceleration:float=1.0, door_open_time:float=2.0,
+                 door_close_time:float=2.5, dwell_time:float=3.0,
+                 per_passenger_dwell:float=0.0):
+        super().__init__()
+        self.floor_height = floor_height
+        self.max_speed = max_speed
+        self.acceleration = acceleration
+        self.door_open_time = door_open_time
+        self.door_close_time = door_close_time
+        self.dwell_time = dwell_time
+        self.per_passenger_dwell = per_passenger_dwell
+        # Distance it takes to get up to max_speed and back down again
+        self._ramp_distance = max_speed * max_speed / acceleration
+
+    def travel_time(self, num_levels:int):
+        distance = num_levels * self.floor_height
+        if distance >= self._ramp_distance:
+            # Speed up, cruise at max_speed, slow down
+            return (distance / self.max_speed +
+                    self.max_speed / self.acceleration)
+        # Too short to get to max_speed, speed up half way then slow down
+        return 2 * sqrt(distance / self.acceleration)
+
+
+STEP_TIMING = StepTiming()
@@ -0,0 +1,125 @@
+'''
+Replay recorded calls against a MultipleElevatorController as fast
+as possible and report how long every request took.
+
+A trace is a JSON lines file, one request per line in tick order:
+  {"tick": 12, "call": 5, "direction": "UP"}   someone calls a lift
+                                              on level 5 to go UP
+  {"tick": 20, "car": 1, "select": 9}         someone inside lift 1
+                                              selects level 9
+An optional "id" names the request, otherwise its line number is used.
+
+The trace is read 1 line at a time, so the only things in memory are
+the requests still waiting for a lift.
+
+HOW to RUN
+`python3 trace_replay.py trace.jsonl --levels 16 --cars 3`
+Prints a JSON line for every request once a lift has served it,
+then a summary of wait / travel times and trips per tick.
+'''
+import argparse
+import json
+import sys
+from collections import deque
+if not __package__:
+    # Run as a script, see script_support.py
+    from script_support import as_package
+    __package__ = as_package()
+from .constants import ElevatorDirection
+from .elevator import Elevator
+from .metrics import MetricsCollector
+from .multiple_elevator_controller import MultipleElevatorController
+
+
+def read_trace(lines):
+    ''' Parse trace lines into dicts, skipping blank lines '''
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        record.setdefault("id", line_no)
+        yield record
+
+
+class TraceReplay(object):
+    '''
+    Replays trace records against a controller, using a MetricsCollector
+    to match every request with the tick its lift opened its doors for it.
+
+    Results are dicts like
+      {"id": 3, "type": "call", "tick": 12, "car": 0, "level": 5,
+       "direction": "UP", "served_tick": 19, "wait": 7}
+    where "wait" is for calls and "travel" is for in lift selections.
+
+    Attributes:
+      controller (MultipleElevatorController): what we replay against
+      metrics (MetricsCollector): wait / travel time histograms so far
+      served (deque): results ready to be handed out
+    '''
+
+    def __init__(self, controller, metrics=None):
+        super().__init__()
+        self.controller = controller
+        self.served = deque()
+        if metrics is None:
+            metrics = MetricsCollector()
+        self.metrics = metrics
+        metrics.on_served = self.served.append
+        metrics.attach(controller)
+
+    def request(self, record):
+        ''' Make the call or selection in record right now '''
+        request = {"id": record["id"]}
+        if "call" in record:
+            self.controller.call_elevator(
+                record["call"], ElevatorDirection[record["direction"]],
+                request)
+        else:
+            self.controller.select_level(record["car"], record["select"],
+                                         request=request)
+
+    def _results(self):
+        while self.served:
+            yield self.served.popleft()
+
+    def replay(self, records, drain_ticks:int=10000):
+        '''
+        Replay records in tick order, advancing the controller between
+        them, yielding results as requests get served.
+        After the last record keep going for up to drain_ticks
+        so the last requests get served too.
+        '''
+        for record in records:
+            # Jumps over ticks where lifts are only travelling or idle
+            self.controller.advance_to(record["tick"])
+            yield from self._results()
+            self.request(record)
+            yield from self._results()
+        for i in range(drain_ticks):
+            if not self.metrics.pending:
+                break
+            self.controller.step_forward()
+            yield from self._results()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("trace", help="JSON lines trace, - for stdin")
+    parser.add_argument("--levels", type=int, default=16)
+    parser.add_argument("--cars", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    levels = [str(level_no) for level_no in range(args.levels)]
+    controller = MultipleElevatorController(
+        [Elevator(levels) for i in range(args.cars)])
+    replay = TraceReplay(controller)
+    trace = sys.stdin if args.trace == "-" else open(args.trace)
+    with trace:
+        for result in replay.replay(read_trace(trace)):
+            print(json.dumps(result))
+    print(json.dumps({"summary": replay.metrics.summary()}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+'''
+Binary log of every lift's state after every tick, for working out
+afterwards what happened eg. after an incident.
+
+The file is a small header followed by fixed width records, one per lift
+per tick in lift order:
+  tick (uint32), car (uint16), level (int16), direction (int8, 1 / -1),
+  door (uint8, 1 if open), command (uint8, see COMMANDS), 1 pad byte
+Every tick has exactly one record per lift, so the records for any tick
+are at a known offset and can be read without scanning the file.
+The header is only brought up to date when the file grows and on
+close(), so a log that was never closed may not show its last ticks.
+
+Record with
+  recorder = TrajectoryRecorder("run.trj", len(controller.elevators))
+  recorder.attach(controller)
+  ...
+  recorder.close()
+and read back with
+  with TrajectoryLog("run.trj") as log:
+      log.ticks(100, 200)   # a NumPy structured array view, no copying
+'''
+import mmap
+import os
+import struct
+from .constants import ElevatorCommand, ElevatorDoorStatus
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"ELVT"
+FORMAT_VERSION = 1
+# magic, format version, record size, number of cars,
+# first tick, number of ticks recorded
+HEADER = struct.Struct("<4sHHIQQ4x")
+RECORD = struct.Struct("<IHhbBBx")
+RECORD_FIELDS = ("tick", "car", "level", "direction", "door", "command")
+
+COMMANDS = (None, ElevatorCommand.UP, ElevatorCommand.DOWN,
+            ElevatorCommand.OPEN_DOOR, ElevatorCommand.CLOSE_DOOR)
+COMMAND_CODES = {command: code for code, command in enumerate(COMMANDS)}
+# Enum hashing is done in Python, ids are much quicker to look up
+# and the commands are singletons so their ids never change
+_COMMAND_CODES_BY_ID = {id(command): code
+                        for command, code in COMMAND_CODES.items()}
+
+if numpy is not None:
+    RECORD_DTYPE = numpy.dtype({
+        "names": RECORD_FIELDS,
+        "formats": ["<u4", "<u2", "<i2", "i1", "u1", "u1"],
+        "offsets": [0, 4, 6, 8, 9, 10],
+        "itemsize": RECORD.size,
+    })
+
+
+class TrajectoryRecorder(object):
+    '''
+    Appends every lift's state to a memory mapped file after every tick.
+    The file grows (doubling) as needed and is cut down to what was
+    actually recorded, with the header up to date, on close().
+
+    Attributes:
+      path (str): the file we record to
+      num_cars (int): lifts in every tick
+      num_ticks (int): ticks recorded so far
+      first_tick (int): tick of the first record, None until then
+    '''
+
+    def __init__(self, path:str, num_cars:int, capacity_ticks:int=4096):
+        super().__init__()
+        self.path = path
+        self.num_cars = num_cars
+        self.num_ticks = 0
+        self.first_tick = None
+        self.controller = None
+        self._tick_size = num_cars * RECORD.size
+        # Every lift's record in 1 go, packing them 1 at a time costs
+        # twice as much
+        self._pack_tick = struct.Struct(
+            "<" + RECORD.format.lstrip("<") * num_cars).pack_into
+        self._file = open(path, "w+b")
+        self._map = None
+        self._resize(HEADER.size + capacity_ticks * self._tick_size)
+
+    def _resize(self, size:int):
+        if self._map is not None:
+            self._write_header()
+            self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(self._map, 0, MAGIC, FORMAT_VERSION, RECORD.size,
+                         self.num_cars, self.first_tick or 0, self.num_ticks)
+
+    def attach(self, controller):
+        ''' Record controller after every tick from now on '''
+        self.controller = controller
+        controller.recorder = self
+
+    def detach(self):
+        self.controller.recorder = None
+
+    def record(self, tick:int, elevators):
+        ''' Append the state of elevators at tick '''
+        if self.first_tick is None:
+            self.first_tick = tick
+        offset = HEADER.size + self.num_ticks * self._tick_size
+        if offset + self._tick_size > len(self._map):
+            self._resize(2 * len(self._map))
+        # This runs every tick so keep it to the bare minimum
+        opened = ElevatorDoorStatus.OPEN
+        codes = _COMMAND_CODES_BY_ID
+        values = []
+        for car, elevator in enumerate(elevators):
+            values += (tick, car, elevator.current_level, elevator.direction,
+                       elevator.door_status is opened,
+                       codes[id(elevator.current_command)])
+        self._pack_tick(self._map, offset, *values)
+        self.num_ticks += 1
+
+    def close(self):
+        if self.controller is not None:
+            self.detach()
+        self._write_header()
+        self._map.close()
+        self._file.truncate(HEADER.size + self.num_ticks * self._tick_size)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TrajectoryLog(object):
+    '''
+    Reads a file written by TrajectoryRecorder, memory mapped so only
+    the ticks looked at are ever read from disk. Arrays from ticks()
+    keep the map open after close() until they are gone too.
+
+    Attributes:
+      num_cars (int): lifts in every tick
+      first_tick (int): tick of the first record
+      num_ticks (int): ticks in the file
+    '''
+
+    def __init__(self, path:str):
+        super().__init__()
+        self._file = open(path, "rb")
+        self._map = None
+        try:
+            if os.fstat(self._file.fileno()).st_size < HEADER.size:
+                raise ValueError(f"{path} is not a trajectory log")
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            (magic, version, record_size, self.num_cars, self.first_tick,
+             self.num_ticks) = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a trajectory log")
+            if record_size != RECORD.size:
+                raise ValueError(f"{path} has {record_size} byte records")
+        except Exception:
+            self.close()
+            raise
+
+    def _span(self, start_tick:int, stop_tick:int):
+        ''' (byte offset, number of records) for ticks in
+        [start_tick, stop_tick), clipped to what was recorded '''
+        start = min(max(start_tick - self.first_tick, 0), self.num_ticks)
+        stop = min(max(stop_tick - self.first_tick, start), self.num_ticks)
+        return (HEADER.size + start * self.num_cars * RECORD.size,
+                (stop - start) * self.num_cars)
+
+    def ticks(self, start_tick:int, stop_tick:int):
+        '''
+        Records for ticks in [start_tick, stop_tick) as a NumPy
+        structured array that is a view straight onto the file,
+        fields as in RECORD_FIELDS
+        '''
+        if numpy is None:
+            raise ImportError("ticks() needs NumPy (pip install numpy), "
+                              "iter_ticks() reads the same records "
+                              "without it")
+        offset, count = self._span(start_tick, stop_tick)
+        return numpy.frombuffer(self._map, RECORD_DTYPE, count, offset)
+
+    def iter_ticks(self, start_tick:int, stop_tick:int):
+        ''' Same records as ticks() but as tuples, without needing
+        NumPy '''
+        offset, count = self._span(start_tick, stop_tick)
+        view = memoryview(self._map)[offset:offset + count * RECORD.size]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def close(self):
+        try:
+            if self._map is not None:
+                self._map.close()
+        except BufferError:
+            # Still looked at through ticks() views, which hold on to
+            # the map, it is unmapped when the last of them goes
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()